@@ -1,57 +1,97 @@
 import os
-import subprocess
 import sys
-import socket
-import atexit
-import datetime
 
-_server_process = None
+try:
+    from .grpc_server_supervisor import get_server_supervisor, private_socket_dir, start_server_supervisor
+    from .server.echo_config import ConfigError, config_port, config_workers, read_settings
+except ImportError:
+    # Fallback for when imported as a standalone module (e.g. during tests)
+    from grpc_server_supervisor import get_server_supervisor, private_socket_dir, start_server_supervisor
+    sys.path.append(os.path.join(os.path.dirname(__file__), "server"))
+    from echo_config import ConfigError, config_port, config_workers, read_settings
 
 def stop_server():
-    global _server_process
-    if _server_process:
-        _server_process.terminate()
-        try:
-            _server_process.wait(timeout=5)
-        except subprocess.TimeoutExpired:
-            _server_process.kill()
-        _server_process = None
-
-def is_port_in_use(port):
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        # Use 127.0.0.1 instead of localhost for consistency
-        return s.connect_ex(('127.0.0.1', port)) == 0
-
-# Start the server on module load, unless running tests
+    """Stop the auto-started server; it gets SIGTERM and drains in-flight RPCs first."""
+    supervisor = get_server_supervisor()
+    if supervisor is not None:
+        supervisor.stop()
+
+def restart_server():
+    """Replace the auto-started server with a fresh one without dropping calls.
+
+    The new server starts on the same port before the old one drains (see
+    ServerSupervisor.handoff). Returns False if there is no server to
+    replace or the new one did not get ready, in which case the old one
+    keeps serving.
+    """
+    supervisor = get_server_supervisor()
+    return supervisor is not None and supervisor.handoff()
+
 def start_server():
-    global _server_process
+    """Start the echo server under a supervisor; returns immediately.
+
+    The supervisor waits for the server's ready line, restarts it with
+    exponential backoff if it exits, and writes its output to
+    server/logs/echo_server.log.
+
+    The server reads its settings from COMFYUI_GRPC_SERVER_* environment
+    variables and the COMFYUI_GRPC_SERVER_CONFIG file (see
+    server/echo_config.py); the port and worker count are read here as
+    well. Port 0 lets the server pick a free one, so each ComfyUI instance
+    on a host gets its own server, which nodes reach at their default
+    localhost:50051.
+    """
     server_dir = os.path.join(os.path.dirname(__file__), "server")
+    config_path = os.environ.get("COMFYUI_GRPC_SERVER_CONFIG") or None
+    if config_path is not None:
+        # The server runs in server_dir, where a relative path would not resolve
+        config_path = os.path.abspath(config_path)
+    try:
+        settings = read_settings(config_path)
+        port, workers = config_port(settings), config_workers(settings)
+    except ConfigError as e:
+        print(f"gRPC Echo Server: Not started, invalid settings: {e}")
+        return None
+    if port == 0 and workers > 1:
+        # The server would refuse to start, and the supervisor would keep restarting it
+        print("gRPC Echo Server: Not started, invalid settings: port 0 cannot be combined with workers")
+        return None
     venv_python = os.path.join(server_dir, ".venv", "Scripts", "python.exe") if sys.platform == "win32" else os.path.join(server_dir, ".venv", "bin", "python")
-    
-    if is_port_in_use(50051):
-        return
 
-    print("gRPC Echo Server: Starting in background on port 50051 (gRPC)...")
-    try:
-        # Check if venv exists
-        if os.path.exists(venv_python):
-            cmd = [venv_python, "echo_server.py", "--parent-pid", str(os.getpid())]
-        else:
-            # Fallback to uv
-            cmd = ["uv", "run", "echo_server.py", "--parent-pid", str(os.getpid())]
-        
-        _server_process = subprocess.Popen(
-            cmd,
-            cwd=server_dir,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
-        )
-        atexit.register(stop_server)
-    except Exception as e:
-        print(f"gRPC Echo Server: Failed to start server: {e}")
-
-if "pytest" not in sys.modules and "PYTEST_CURRENT_TEST" not in os.environ:
+    # Check if venv exists
+    if os.path.exists(venv_python):
+        cmd = [venv_python, "echo_server.py", "--parent-pid", str(os.getpid())]
+    else:
+        # Fallback to uv
+        cmd = ["uv", "run", "echo_server.py", "--parent-pid", str(os.getpid())]
+    cmd += ["--port", str(port)]
+    if config_path is not None:
+        cmd += ["--config", config_path]
+
+    # Nodes reach the local server over a Unix socket without TLS; remote hosts keep TLS
+    uds_path = None
+    # Only one process can own the socket, so several workers are reached over TLS only
+    use_uds = os.name != "nt" and workers == 1 and os.environ.get("COMFYUI_GRPC_UDS", "1") != "0"
+    socket_dir = private_socket_dir() if use_uds else None
+    if socket_dir:
+        # A server on a fixed port may be shared with other ComfyUI instances; one on a picked port is not
+        uds_name = f"comfyui_grpc_echo_{port}.sock" if port else f"comfyui_grpc_echo_pid{os.getpid()}.sock"
+        uds_path = os.path.join(socket_dir, uds_name)
+        cmd += ["--uds", uds_path]
+
+    print(f"gRPC Echo Server: Starting in background on {f'port {port}' if port else 'a free port'} (gRPC)...")
+    log_name = "echo_server.log" if port else f"echo_server_pid{os.getpid()}.log"
+    return start_server_supervisor(
+        cmd, cwd=server_dir, port=port, log_path=os.path.join(server_dir, "logs", log_name),
+        uds_path=uds_path,
+    )
+
+# Start the server on module load, unless running tests or disabled
+if (
+    "pytest" not in sys.modules
+    and "PYTEST_CURRENT_TEST" not in os.environ
+    and os.environ.get("COMFYUI_GRPC_AUTOSTART", "1") != "0"
+):
     start_server()
 
 # Read version from VERSION file
@@ -62,17 +102,29 @@ if os.path.exists(version_path):
         version = f.read().strip()
 
 try:
-    from .grpc_echo_node import GRPCEchoNode
+    from .grpc_echo_node import (
+        GRPCEchoNode, GRPCEchoBatchNode, GRPCEchoStreamNode, GRPCEchoImageNode, GRPCEchoLatentNode,
+    )
 except (ImportError, ValueError):
     # Fallback for when imported as a standalone module (e.g. during tests)
-    from grpc_echo_node import GRPCEchoNode
+    from grpc_echo_node import (
+        GRPCEchoNode, GRPCEchoBatchNode, GRPCEchoStreamNode, GRPCEchoImageNode, GRPCEchoLatentNode,
+    )
 
 NODE_CLASS_MAPPINGS = {
     "GRPCEchoNode": GRPCEchoNode,
+    "GRPCEchoBatchNode": GRPCEchoBatchNode,
+    "GRPCEchoStreamNode": GRPCEchoStreamNode,
+    "GRPCEchoImageNode": GRPCEchoImageNode,
+    "GRPCEchoLatentNode": GRPCEchoLatentNode,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "GRPCEchoNode": f"gRPC Echo (v{version})",
+    "GRPCEchoBatchNode": f"gRPC Echo Batch (v{version})",
+    "GRPCEchoStreamNode": f"gRPC Echo Stream (v{version})",
+    "GRPCEchoImageNode": f"gRPC Echo Image (v{version})",
+    "GRPCEchoLatentNode": f"gRPC Echo Latent (v{version})",
 }
 
 WEB_DIRECTORY = "js"
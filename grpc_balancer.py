@@ -0,0 +1,102 @@
+import threading
+import time
+from contextlib import contextmanager
+
+ROUND_ROBIN = "round_robin"
+LEAST_OUTSTANDING = "least_outstanding"
+POLICIES = (ROUND_ROBIN, LEAST_OUTSTANDING)
+
+# How long an endpoint that failed a call or health check is skipped.
+DEFAULT_EJECTION_TIME = 10.0
+
+
+def parse_endpoints(hosts):
+    """Split a comma or newline separated host list into host:port targets.
+
+    A trailing " (gRPC)" style label on each entry is dropped, as for a single host.
+    """
+    endpoints = []
+    for entry in hosts.replace("\n", ",").split(","):
+        endpoint = entry.split(" (")[0].strip()
+        if endpoint and endpoint not in endpoints:
+            endpoints.append(endpoint)
+    return endpoints
+
+
+class EndpointBalancer:
+    """Orders endpoints for each call and tracks which ones to avoid.
+
+    Healthy endpoints come first, ordered by the balancing policy; endpoints
+    ejected after a failure follow as a last resort until their ejection
+    time runs out.
+    """
+
+    def __init__(self, ejection_time=DEFAULT_EJECTION_TIME):
+        self.ejection_time = ejection_time
+        self._lock = threading.Lock()
+        self._outstanding = {}
+        self._ejected_until = {}
+        # endpoint list -> round-robin position
+        self._positions = {}
+
+    def candidates(self, endpoints, policy=ROUND_ROBIN):
+        """Return endpoints in the order they should be tried for one call."""
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown balancing policy: {policy}")
+        now = time.monotonic()
+        key = tuple(endpoints)
+        with self._lock:
+            healthy = [e for e in endpoints if self._ejected_until.get(e, 0.0) <= now]
+            ejected = sorted((e for e in endpoints if e not in healthy), key=self._ejected_until.get)
+            # Rotate over the healthy endpoints only, so an ejection does not
+            # send the next endpoint twice its share
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            if healthy:
+                position %= len(healthy)
+                healthy = healthy[position:] + healthy[:position]
+            if policy == LEAST_OUTSTANDING:
+                # Stable sort keeps the rotation as the tie-breaker
+                healthy.sort(key=lambda e: self._outstanding.get(e, 0))
+        return healthy + ejected
+
+    @contextmanager
+    def track(self, endpoint):
+        """Count a call against endpoint for least-outstanding balancing while it runs."""
+        with self._lock:
+            self._outstanding[endpoint] = self._outstanding.get(endpoint, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._outstanding[endpoint] = max(self._outstanding.get(endpoint, 0) - 1, 0)
+
+    def outstanding(self, endpoint):
+        with self._lock:
+            return self._outstanding.get(endpoint, 0)
+
+    def mark_unhealthy(self, endpoint):
+        with self._lock:
+            self._ejected_until[endpoint] = time.monotonic() + self.ejection_time
+
+    def mark_healthy(self, endpoint):
+        with self._lock:
+            self._ejected_until.pop(endpoint, None)
+
+    def is_healthy(self, endpoint):
+        with self._lock:
+            return self._ejected_until.get(endpoint, 0.0) <= time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._outstanding.clear()
+            self._ejected_until.clear()
+            self._positions.clear()
+
+
+_balancer = EndpointBalancer()
+
+
+def get_balancer():
+    """Return the balancer shared by all nodes in this process."""
+    return _balancer
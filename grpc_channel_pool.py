@@ -0,0 +1,199 @@
+import asyncio
+import atexit
+import threading
+import time
+
+import grpc
+
+# Channels unused for this many seconds are closed on the next pool access.
+DEFAULT_IDLE_TIMEOUT = 300.0
+
+# Connectivity states after which a cached channel is replaced instead of reused.
+_UNHEALTHY_STATES = (
+    grpc.ChannelConnectivity.TRANSIENT_FAILURE,
+    grpc.ChannelConnectivity.SHUTDOWN,
+)
+
+
+class _PooledChannel:
+    """A cached channel plus the bookkeeping the pool needs to manage it."""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.state = grpc.ChannelConnectivity.IDLE
+        self.last_used = time.monotonic()
+        channel.subscribe(self._on_state_change, try_to_connect=True)
+
+    def _on_state_change(self, state):
+        self.state = state
+
+    def close(self):
+        try:
+            self.channel.unsubscribe(self._on_state_change)
+        finally:
+            self.channel.close()
+
+
+class _PooledAioChannel:
+    """A cached grpc.aio channel, bound to the event loop that created it."""
+
+    def __init__(self, channel, loop):
+        self.channel = channel
+        self.loop = loop
+        self.last_used = time.monotonic()
+        # Start connecting right away so the first call finds a warm channel
+        channel.get_state(try_to_connect=True)
+
+    @property
+    def state(self):
+        return self.channel.get_state(try_to_connect=False)
+
+    def close(self):
+        if not self.loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self.channel.close(), self.loop)
+
+
+class ChannelPool:
+    """Process-wide cache of warm HTTP/2 channels.
+
+    Channels are keyed by ``(target, cert fingerprint, options)`` so every
+    caller that talks to the same endpoint with the same settings shares one
+    connection, and the TCP+TLS handshake is paid once instead of per call.
+    """
+
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._interceptors = ()
+        self._aio_interceptors = ()
+
+    def use_interceptors(self, interceptors=(), aio_interceptors=()):
+        """Attach client interceptors to every channel the pool creates from now on.
+
+        Existing channels are closed so that all traffic goes through the
+        interceptors.
+        """
+        with self._lock:
+            self._interceptors = tuple(interceptors)
+            self._aio_interceptors = tuple(aio_interceptors)
+        self.close()
+
+    @staticmethod
+    def make_key(target, certificate, options=()):
+        """certificate is None for insecure channels."""
+        options = tuple(sorted(options, key=lambda option: option[0]))
+        return (target, certificate.fingerprint if certificate else None, options)
+
+    def get_secure_channel(self, target, certificate, options=()):
+        """Return a pooled secure channel, creating or replacing it if needed.
+
+        ``certificate`` is a ServerCertificate from grpc_credentials.
+        """
+        key = self.make_key(target, certificate, options)
+
+        def create():
+            channel = grpc.secure_channel(target, certificate.credentials, options=list(key[2]))
+            if self._interceptors:
+                channel = grpc.intercept_channel(channel, *self._interceptors)
+            return _PooledChannel(channel)
+
+        return self._get(key, create)
+
+    def get_aio_secure_channel(self, target, certificate, options=()):
+        """Return a pooled grpc.aio secure channel for the running event loop.
+
+        aio channels cannot be shared between event loops, so the loop is
+        part of the key.
+        """
+        loop = asyncio.get_running_loop()
+        key = self.make_key(target, certificate, options) + (loop,)
+
+        def create():
+            channel = grpc.aio.secure_channel(
+                target, certificate.credentials, options=list(key[2]),
+                interceptors=self._aio_interceptors or None,
+            )
+            return _PooledAioChannel(channel, loop)
+
+        return self._get(key, create)
+
+    def get_insecure_channel(self, target, options=()):
+        """Return a pooled channel without TLS, for Unix domain socket targets on this host."""
+        key = self.make_key(target, None, options)
+
+        def create():
+            channel = grpc.insecure_channel(target, options=list(key[2]))
+            if self._interceptors:
+                channel = grpc.intercept_channel(channel, *self._interceptors)
+            return _PooledChannel(channel)
+
+        return self._get(key, create)
+
+    def get_aio_insecure_channel(self, target, options=()):
+        loop = asyncio.get_running_loop()
+        key = self.make_key(target, None, options) + (loop,)
+
+        def create():
+            channel = grpc.aio.insecure_channel(
+                target, options=list(key[2]), interceptors=self._aio_interceptors or None,
+            )
+            return _PooledAioChannel(channel, loop)
+
+        return self._get(key, create)
+
+    def _get(self, key, create):
+        now = time.monotonic()
+        stale = []
+        with self._lock:
+            stale.extend(self._pop_idle(now))
+            entry = self._channels.get(key)
+            if entry is not None and entry.state in _UNHEALTHY_STATES:
+                stale.append(self._channels.pop(key))
+                entry = None
+            if entry is None:
+                entry = create()
+                self._channels[key] = entry
+            entry.last_used = now
+        for old in stale:
+            old.close()
+        return entry.channel
+
+    def _pop_idle(self, now):
+        expired = [
+            key for key, entry in self._channels.items()
+            if now - entry.last_used > self.idle_timeout
+        ]
+        return [self._channels.pop(key) for key in expired]
+
+    def discard(self, channel):
+        """Drop a channel from the pool, e.g. after the caller saw it misbehave."""
+        with self._lock:
+            for key, entry in list(self._channels.items()):
+                if entry.channel is channel:
+                    del self._channels[key]
+                    break
+            else:
+                return
+        entry.close()
+
+    def close(self):
+        """Close every pooled channel."""
+        with self._lock:
+            entries = list(self._channels.values())
+            self._channels.clear()
+        for entry in entries:
+            entry.close()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._channels)
+
+
+_pool = ChannelPool()
+atexit.register(_pool.close)
+
+
+def get_channel_pool():
+    """Return the pool shared by all nodes and HTTP routes in this process."""
+    return _pool
@@ -0,0 +1,102 @@
+import hashlib
+import threading
+import time
+from pathlib import Path
+
+import grpc
+
+# How long a loaded certificate is trusted before its file is stat()ed again.
+DEFAULT_REVALIDATE_INTERVAL = 2.0
+
+
+def resolve_cert_path(cert_path):
+    """Resolve certificate path: try given path, then path relative to this file."""
+    cert_candidate = Path(cert_path)
+    if not cert_candidate.exists():
+        candidate = Path(__file__).parent / cert_path
+        if candidate.exists():
+            cert_candidate = candidate
+
+    if not cert_candidate.exists():
+        return None
+    return cert_candidate
+
+
+class ServerCertificate:
+    """A root certificate and the channel credentials built from it."""
+
+    def __init__(self, pem):
+        self.pem = pem
+        self.fingerprint = hashlib.sha256(pem).hexdigest()
+        self.credentials = grpc.ssl_channel_credentials(root_certificates=pem)
+
+
+class _CachedCertificate:
+    def __init__(self, file_id, certificate):
+        self.file_id = file_id
+        self.certificate = certificate
+
+
+class CredentialsCache:
+    """Parsed certificates keyed by resolved path, reloaded when the file changes.
+
+    Within ``revalidate_interval`` of the last check a lookup touches no disk
+    at all. After that, the file is stat()ed and only re-read if its inode,
+    size or modification time changed, so certificate rotation is picked up
+    without paying a read per call.
+    """
+
+    def __init__(self, revalidate_interval=DEFAULT_REVALIDATE_INTERVAL):
+        self.revalidate_interval = revalidate_interval
+        self._lock = threading.Lock()
+        # cert_path as given -> (resolved path, monotonic time of last check)
+        self._resolved = {}
+        # resolved path -> _CachedCertificate
+        self._certificates = {}
+
+    def get(self, cert_path):
+        """Return the ServerCertificate for cert_path, raising FileNotFoundError if missing."""
+        now = time.monotonic()
+        with self._lock:
+            resolved = self._resolved.get(cert_path)
+            if resolved is not None and now - resolved[1] < self.revalidate_interval:
+                return self._certificates[resolved[0]].certificate
+
+        path = resolve_cert_path(cert_path)
+        if path is None:
+            self._forget(cert_path)
+            raise FileNotFoundError(f"Certificate file not found at {cert_path}")
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._forget(cert_path)
+            raise FileNotFoundError(f"Certificate file not found at {cert_path}")
+        file_id = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            cached = self._certificates.get(path)
+        if cached is None or cached.file_id != file_id:
+            with open(path, "rb") as f:
+                cached = _CachedCertificate(file_id, ServerCertificate(f.read()))
+
+        with self._lock:
+            self._certificates[path] = cached
+            self._resolved[cert_path] = (path, now)
+        return cached.certificate
+
+    def _forget(self, cert_path):
+        with self._lock:
+            self._resolved.pop(cert_path, None)
+
+    def clear(self):
+        with self._lock:
+            self._resolved.clear()
+            self._certificates.clear()
+
+
+_credentials = CredentialsCache()
+
+
+def get_credentials_cache():
+    """Return the credentials cache shared by all nodes and HTTP routes in this process."""
+    return _credentials
@@ -0,0 +1,751 @@
+"""gRPC side of the echo nodes.
+
+Importing this module loads grpc and the generated protobuf code, so
+grpc_echo_node only imports it on first execution to keep ComfyUI startup fast.
+"""
+import asyncio
+import json
+import queue
+import grpc
+import sys
+from pathlib import Path
+
+# Add the server directory to the path to import generated protobuf files
+server_dir = Path(__file__).parent / "server"
+sys.path.append(str(server_dir))
+
+import echo_pb2
+import echo_pb2_grpc
+
+try:
+    from .grpc_balancer import ROUND_ROBIN, get_balancer, parse_endpoints
+    from .grpc_channel_pool import get_channel_pool
+    from .grpc_credentials import get_credentials_cache
+    from .grpc_metrics import CLIENT_METRICS, AioMetricsClientInterceptor, MetricsClientInterceptor
+    from .grpc_readiness import DEFAULT_PROBE_TIMEOUT, EndpointNotReady, get_readiness_cache
+    from .grpc_response_cache import ResponseCache, get_response_cache
+    from .grpc_server_supervisor import STARTING, get_server_supervisor
+    from .grpc_stream_session import DEFAULT_REPLY_TIMEOUT, StreamClosed, StreamRejected, get_stream_session
+    from .grpc_tensor import tensor_from_buffer, tensor_to_buffer
+    from .grpc_tracing import NULL_TRACE, finish_trace, start_trace
+except ImportError:
+    # Fallback for when imported as a standalone module (e.g. during tests)
+    from grpc_balancer import ROUND_ROBIN, get_balancer, parse_endpoints
+    from grpc_channel_pool import get_channel_pool
+    from grpc_credentials import get_credentials_cache
+    from grpc_metrics import CLIENT_METRICS, AioMetricsClientInterceptor, MetricsClientInterceptor
+    from grpc_readiness import DEFAULT_PROBE_TIMEOUT, EndpointNotReady, get_readiness_cache
+    from grpc_response_cache import ResponseCache, get_response_cache
+    from grpc_server_supervisor import STARTING, get_server_supervisor
+    from grpc_stream_session import DEFAULT_REPLY_TIMEOUT, StreamClosed, StreamRejected, get_stream_session
+    from grpc_tensor import tensor_from_buffer, tensor_to_buffer
+    from grpc_tracing import NULL_TRACE, finish_trace, start_trace
+
+# Record client-side RPC metrics for every call made through the shared pool
+get_channel_pool().use_interceptors([MetricsClientInterceptor()], [AioMetricsClientInterceptor()])
+
+
+# How long a call to the auto-started local server waits for it to (re)start.
+SERVER_START_WAIT = 30
+
+# Keep each EchoMany request comfortably below gRPC's default 4 MB message limit.
+MAX_BATCH_BYTES = 3 * 1024 * 1024
+
+# Default limit for one message in either direction, matching the server's default.
+DEFAULT_MAX_MESSAGE_MB = 64
+
+# Room left under the message limit for the reply's own fields.
+MESSAGE_OVERHEAD_BYTES = 64 * 1024
+
+# Largest EchoChunk sent for messages over the limit; smaller under a lower limit.
+CHUNK_BYTES = 1024 * 1024
+
+COMPRESSION = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+# Seconds each call may take before it fails with DEADLINE_EXCEEDED; 0 means no deadline.
+DEFAULT_TIMEOUT = 30.0
+
+# Attempts per call, including the first, for calls failing with a transient code.
+DEFAULT_MAX_ATTEMPTS = 3
+
+# gRPC caps maxAttempts at 5.
+MAX_ATTEMPTS_LIMIT = 5
+
+RETRYABLE_STATUS_CODES = ("UNAVAILABLE",)
+
+# Keepalive pings keep pooled connections open through proxies and NAT that
+# drop idle TCP connections, and detect dead ones before a call is sent on
+# them. Off by default: a server on gRPC's default ping policy answers pings
+# more often than every 5 minutes with GOAWAY too_many_pings, dropping the
+# pooled channel. The bundled server allows one every 10 s.
+DEFAULT_KEEPALIVE_MS = 0
+DEFAULT_KEEPALIVE_TIMEOUT_MS = 20000
+
+
+def retry_service_config(max_attempts):
+    """Return a gRPC service config retrying every Echo method on transient failures."""
+    return json.dumps({
+        "methodConfig": [{
+            "name": [{"service": "echo.Echo"}],
+            "retryPolicy": {
+                "maxAttempts": max_attempts,
+                "initialBackoff": "0.1s",
+                "maxBackoff": "1s",
+                "backoffMultiplier": 2,
+                "retryableStatusCodes": list(RETRYABLE_STATUS_CODES),
+            },
+        }],
+    })
+
+
+class CallOptions:
+    """Per-node settings for how calls are made, beyond host and message."""
+
+    def __init__(self, policy=ROUND_ROBIN, compression="none", max_message_mb=DEFAULT_MAX_MESSAGE_MB,
+                 timeout=DEFAULT_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS, hedge_delay_ms=0,
+                 keepalive_ms=DEFAULT_KEEPALIVE_MS, keepalive_timeout_ms=DEFAULT_KEEPALIVE_TIMEOUT_MS,
+                 channel_args=None):
+        self.policy = policy
+        self.compression = COMPRESSION[compression]
+        self.max_message_bytes = max_message_mb * 1024 * 1024
+        # None lets a call run without a deadline
+        self.timeout = timeout or None
+        self.max_attempts = max(1, min(max_attempts, MAX_ATTEMPTS_LIMIT))
+        # Seconds to wait for a reply before sending the same request again; None disables hedging
+        self.hedge_delay = hedge_delay_ms / 1000 if hedge_delay_ms > 0 else None
+        # 0 disables keepalive pings
+        self.keepalive_ms = keepalive_ms
+        self.keepalive_timeout_ms = keepalive_timeout_ms
+        # Raw gRPC channel arguments (HTTP/2 windows, ping policy, ...), applied last
+        self.channel_args = dict(channel_args or {})
+
+    def channel_options(self):
+        options = {
+            "grpc.max_receive_message_length": self.max_message_bytes,
+            "grpc.max_send_message_length": self.max_message_bytes,
+            "grpc.enable_retries": int(self.max_attempts > 1),
+        }
+        if self.max_attempts > 1:
+            options["grpc.service_config"] = retry_service_config(self.max_attempts)
+        if self.keepalive_ms > 0:
+            options.update({
+                "grpc.keepalive_time_ms": self.keepalive_ms,
+                "grpc.keepalive_timeout_ms": self.keepalive_timeout_ms,
+                # Ping idle pooled channels too, and keep pinging while no data flows
+                "grpc.keepalive_permit_without_calls": 1,
+                "grpc.http2.max_pings_without_data": 0,
+            })
+        options.update(self.channel_args)
+        return tuple(options.items())
+
+    @property
+    def probe_timeout(self):
+        """Readiness probe timeout, never longer than the call's own deadline."""
+        return min(DEFAULT_PROBE_TIMEOUT, self.timeout or DEFAULT_PROBE_TIMEOUT)
+
+    @property
+    def max_payload_bytes(self):
+        """Largest payload sent in a single gRPC message."""
+        return self.max_message_bytes - MESSAGE_OVERHEAD_BYTES
+
+    def needs_chunking(self, message):
+        """Whether message is too large to send in a single gRPC message."""
+        # Cheap bound first: UTF-8 needs at most 4 bytes per character
+        if len(message) * 4 <= self.max_payload_bytes:
+            return False
+        return len(message.encode("utf-8")) > self.max_payload_bytes
+
+    @property
+    def chunk_bytes(self):
+        """Size of each EchoChunk, leaving room under the message limit for its framing."""
+        return min(CHUNK_BYTES, self.max_payload_bytes)
+
+    @property
+    def max_batch_bytes(self):
+        return self.max_message_bytes * 3 // 4
+
+
+DEFAULT_CALL_OPTIONS = CallOptions()
+
+
+def parse_channel_args(text):
+    """Parse a JSON object of gRPC channel arguments, as entered on a node."""
+    if not text.strip():
+        return {}
+    try:
+        args = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"channel_args is not valid JSON: {e}") from e
+    if not isinstance(args, dict):
+        raise ValueError("channel_args must be a JSON object of gRPC channel arguments")
+    for name, value in args.items():
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(f"channel_args[{name!r}] must be an integer or a string")
+    return args
+
+
+def chunk_messages(messages, max_items, max_bytes=MAX_BATCH_BYTES):
+    """Split messages into chunks bounded by item count and encoded size."""
+    chunk, size = [], 0
+    for message in messages:
+        encoded = len(message.encode("utf-8"))
+        if chunk and (len(chunk) >= max_items or size + encoded > max_bytes):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(message)
+        size += encoded
+    if chunk:
+        yield chunk
+
+
+def clean_host(host):
+    """Remove the (gRPC) suffix if present for the actual connection."""
+    return host.split(" (")[0].strip()
+
+
+def response_cache_key(host, message, cache_ttl):
+    """Return the response cache key for a request, or None when caching is off."""
+    if cache_ttl <= 0:
+        return None
+    return ResponseCache.make_key(",".join(parse_endpoints(host)), message)
+
+
+def _starting_local_server(host):
+    # Only a server actually starting is waited for; one in backoff or that failed to
+    # spawn fails the call at once instead of holding it for SERVER_START_WAIT
+    supervisor = get_server_supervisor()
+    if supervisor is None or supervisor.ready or supervisor.state != STARTING:
+        return None
+    return supervisor if supervisor.serves(clean_host(host)) else None
+
+
+def wait_for_local_server(host, trace=NULL_TRACE):
+    """If host is the supervised local server and it is (re)starting, wait until it is ready."""
+    supervisor = _starting_local_server(host)
+    if supervisor is not None:
+        with trace.phase("server_start"):
+            supervisor.wait_ready(SERVER_START_WAIT)
+
+
+async def wait_for_local_server_async(host, trace=NULL_TRACE):
+    supervisor = _starting_local_server(host)
+    if supervisor is not None:
+        with trace.phase("server_start"):
+            await asyncio.to_thread(supervisor.wait_ready, SERVER_START_WAIT)
+
+
+def connect_host(host):
+    """Return the host:port to connect to for host.
+
+    Differs from host only when host points at the supervised server and
+    that server picked its own port.
+    """
+    supervisor = get_server_supervisor()
+    return supervisor.resolve(clean_host(host)) if supervisor is not None else clean_host(host)
+
+
+def local_socket_target(host):
+    """Return the unix: target of the supervised server if host points at it, else None."""
+    supervisor = get_server_supervisor()
+    return supervisor.local_target(clean_host(host)) if supervisor is not None else None
+
+
+def get_channel(host, cert_path, options=DEFAULT_CALL_OPTIONS, trace=NULL_TRACE):
+    """Return a pooled channel for host, raising FileNotFoundError if the cert is missing.
+
+    The auto-started local server is reached over its Unix socket without
+    TLS; every other host gets a secure channel.
+    """
+    local_target = local_socket_target(host)
+    if local_target is not None:
+        return get_channel_pool().get_insecure_channel(local_target, options.channel_options())
+    with trace.phase("credentials"):
+        certificate = get_credentials_cache().get(cert_path)
+    return get_channel_pool().get_secure_channel(connect_host(host), certificate, options.channel_options())
+
+
+def get_aio_channel(host, cert_path, options=DEFAULT_CALL_OPTIONS, trace=NULL_TRACE):
+    """Return a pooled grpc.aio channel for host on the running event loop."""
+    local_target = local_socket_target(host)
+    if local_target is not None:
+        return get_channel_pool().get_aio_insecure_channel(local_target, options.channel_options())
+    with trace.phase("credentials"):
+        certificate = get_credentials_cache().get(cert_path)
+    return get_channel_pool().get_aio_secure_channel(connect_host(host), certificate, options.channel_options())
+
+
+async def run_grpc_test_async(host, cert_path):
+    """Send a test EchoOnce to host; safe to await on ComfyUI's event loop.
+
+    With several endpoints, each one is tested and the results are combined.
+    """
+    endpoints = parse_endpoints(host)
+    if len(endpoints) > 1:
+        results = await asyncio.gather(*(run_grpc_test_async(e, cert_path) for e in endpoints))
+        return {
+            "success": all(r["success"] for r in results),
+            "message": "\n".join(f"{e}: {r['message']}" for e, r in zip(endpoints, results)),
+        }
+
+    await wait_for_local_server_async(host)
+    try:
+        channel = get_aio_channel(host, cert_path)
+    except FileNotFoundError as e:
+        return {"success": False, "message": str(e)}
+
+    try:
+        stub = echo_pb2_grpc.EchoStub(channel)
+        req = echo_pb2.EchoRequest(message="ping")
+        resp = await stub.EchoOnce(req, timeout=2) # 2 second timeout for test
+        get_readiness_cache().mark_ready(clean_host(host))
+        return {"success": True, "message": f"Connected! Server echoed: {resp.message}"}
+    except grpc.RpcError as e:
+        get_readiness_cache().mark_failed(clean_host(host))
+        return {"success": False, "message": f"gRPC Error: {e.details()}"}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+
+def _candidates(host, policy):
+    endpoints = parse_endpoints(host)
+    if not endpoints:
+        raise EndpointNotReady("No gRPC host configured")
+    return get_balancer().candidates(endpoints, policy)
+
+
+def pick_endpoint(host, cert_path, options=DEFAULT_CALL_OPTIONS, trace=NULL_TRACE):
+    """Return (endpoint, channel) for the first ready endpoint of a host list.
+
+    Endpoints that cannot be reached or report NOT_SERVING are ejected from
+    balancing for a while and the next candidate is tried. Raises
+    FileNotFoundError for a missing certificate and EndpointNotReady when no
+    endpoint is ready.
+    """
+    candidates = _candidates(host, options.policy)
+    if len(candidates) == 1:
+        wait_for_local_server(candidates[0], trace)
+    balancer, readiness = get_balancer(), get_readiness_cache()
+    for endpoint in candidates:
+        channel = get_channel(endpoint, cert_path, options, trace)
+        try:
+            # Connecting, the TLS handshake and the health probe, unless the endpoint is known ready
+            with trace.phase("connect"):
+                readiness.ensure_ready(endpoint, channel, options.probe_timeout)
+        except EndpointNotReady as e:
+            balancer.mark_unhealthy(endpoint)
+            error = e
+            continue
+        balancer.mark_healthy(endpoint)
+        trace.set("endpoint", endpoint)
+        return endpoint, channel
+    raise error
+
+
+async def pick_endpoint_async(host, cert_path, options=DEFAULT_CALL_OPTIONS, trace=NULL_TRACE):
+    """Like pick_endpoint, returning a grpc.aio channel."""
+    candidates = _candidates(host, options.policy)
+    if len(candidates) == 1:
+        await wait_for_local_server_async(candidates[0], trace)
+    balancer, readiness = get_balancer(), get_readiness_cache()
+    for endpoint in candidates:
+        channel = get_aio_channel(endpoint, cert_path, options, trace)
+        try:
+            with trace.phase("connect"):
+                await readiness.ensure_ready_async(endpoint, channel, options.probe_timeout)
+        except EndpointNotReady as e:
+            balancer.mark_unhealthy(endpoint)
+            error = e
+            continue
+        balancer.mark_healthy(endpoint)
+        trace.set("endpoint", endpoint)
+        return endpoint, channel
+    raise error
+
+
+def report_failure(endpoint, error):
+    """Re-probe endpoint before its next use, and stop picking it if it was unreachable."""
+    get_readiness_cache().mark_failed(endpoint)
+    # Only grpc.Call errors carry a status code
+    code = getattr(error, "code", None)
+    if callable(code) and code() == grpc.StatusCode.UNAVAILABLE:
+        get_balancer().mark_unhealthy(endpoint)
+
+
+def cache_stamp(host, messages, cache_ttl):
+    """Latest store time of the cached replies for messages, or None if any is missing or stale."""
+    cache = get_response_cache()
+    stamps = [cache.stamp(response_cache_key(host, m, cache_ttl)) for m in messages]
+    if None in stamps:
+        return None
+    # Entries are only ever replaced by newer ones, so the latest stamp
+    # changes whenever any of the messages was re-fetched.
+    return max(stamps, default=0.0)
+
+
+def _chunk_requests(data, chunk_bytes):
+    for start in range(0, len(data), chunk_bytes):
+        yield echo_pb2.EchoChunk(data=data[start:start + chunk_bytes], last=start + chunk_bytes >= len(data))
+
+
+def _join_chunks(chunks):
+    return (b"".join(chunk.data for chunk in chunks), chunks[-1].received_at)
+
+
+def echo_chunked_bytes(channel, data, options=DEFAULT_CALL_OPTIONS, trace=NULL_TRACE):
+    """Echo data too large for one gRPC message as a stream of chunks, returning (data, received_at)."""
+    call = echo_pb2_grpc.EchoStub(channel).EchoChunked(
+        _chunk_requests(data, options.chunk_bytes), timeout=options.timeout, compression=options.compression, metadata=trace.metadata()
+    )
+    chunks = list(call)
+    if trace:
+        trace.record_reply(call.trailing_metadata())
+    return _join_chunks(chunks)
+
+
+def echo_chunked(channel, message, options=DEFAULT_CALL_OPTIONS, trace=NULL_TRACE):
+    """Echo a message too large for one gRPC message as a stream of chunks."""
+    data, received_at = echo_chunked_bytes(channel, message.encode("utf-8"), options, trace)
+    return (data.decode("utf-8"), received_at)
+
+
+async def echo_chunked_async(channel, message, options=DEFAULT_CALL_OPTIONS, trace=NULL_TRACE):
+    call = echo_pb2_grpc.EchoStub(channel).EchoChunked(
+        _chunk_requests(message.encode("utf-8"), options.chunk_bytes), timeout=options.timeout, compression=options.compression,
+        metadata=trace.metadata(),
+    )
+    data, received_at = _join_chunks([chunk async for chunk in call])
+    if trace:
+        trace.record_reply(await call.trailing_metadata())
+    return (data.decode("utf-8"), received_at)
+
+
+def echo_once_method(channel, trace=NULL_TRACE):
+    """Return the EchoOnce multicallable for channel.
+
+    Traced calls serialize and deserialize through wrappers that record
+    those steps as phases of their own.
+    """
+    if not trace:
+        return echo_pb2_grpc.EchoStub(channel).EchoOnce
+    return channel.unary_unary(
+        "/echo.Echo/EchoOnce",
+        request_serializer=trace.timed("serialize", echo_pb2.EchoRequest.SerializeToString),
+        response_deserializer=trace.timed("deserialize", echo_pb2.EchoReply.FromString),
+    )
+
+
+def hedge(endpoint, channel, send, host, cert_path, options):
+    """Make a unary call with send(channel), repeating it elsewhere if it is slow.
+
+    send must return a grpc future. If there is no reply after
+    options.hedge_delay, the same call is made on the next endpoint picked
+    for host and the first successful reply wins; the slower call is
+    cancelled. Returns (endpoint, reply). If every call fails, the first
+    call's RpcError is raised for the caller to report; a failed hedge is
+    reported here.
+    """
+    primary = send(channel)
+    done = queue.Queue()
+    primary.add_done_callback(done.put)
+    try:
+        done.get(timeout=options.hedge_delay)
+        return endpoint, primary.result()
+    except queue.Empty:
+        pass
+
+    try:
+        hedge_endpoint, hedge_channel = pick_endpoint(host, cert_path, options)
+    except (FileNotFoundError, EndpointNotReady):
+        return endpoint, primary.result()
+    with get_balancer().track(hedge_endpoint):
+        secondary = send(hedge_channel)
+        secondary.add_done_callback(done.put)
+        for _ in range(2):
+            finished = done.get()
+            if finished.exception() is None:
+                (secondary if finished is primary else primary).cancel()
+                return (endpoint if finished is primary else hedge_endpoint), finished.result()
+            if finished is secondary:
+                report_failure(hedge_endpoint, finished.exception())
+    return endpoint, primary.result()
+
+
+async def hedge_async(endpoint, channel, send, host, cert_path, options):
+    """Like hedge, with send returning a grpc.aio call."""
+    primary = send(channel)
+    primary_task = asyncio.ensure_future(primary)
+    done, _ = await asyncio.wait({primary_task}, timeout=options.hedge_delay)
+    if done:
+        return endpoint, primary_task.result()
+
+    try:
+        hedge_endpoint, hedge_channel = await pick_endpoint_async(host, cert_path, options)
+    except (FileNotFoundError, EndpointNotReady):
+        return endpoint, await primary_task
+    with get_balancer().track(hedge_endpoint):
+        secondary = send(hedge_channel)
+        calls = {primary_task: (endpoint, primary), asyncio.ensure_future(secondary): (hedge_endpoint, secondary)}
+        pending = set(calls)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task_endpoint, call = calls[task]
+                if task.exception() is None:
+                    for other in pending:
+                        calls[other][1].cancel()
+                    return task_endpoint, task.result()
+                if call is secondary:
+                    report_failure(hedge_endpoint, task.exception())
+    return endpoint, primary_task.result()
+
+
+def echo_once(host, message, cert_path, cache_ttl=0, options=DEFAULT_CALL_OPTIONS, trace=NULL_TRACE):
+    """Echo message, returning (message, received_at); phases of the call are recorded in trace."""
+    cache_key = response_cache_key(host, message, cache_ttl)
+    cached = get_response_cache().get(cache_key) if cache_key else None
+    if cached is not None:
+        trace.set("cache_hit", True)
+        return cached
+
+    # Only wait on a channel when its endpoint's cached health is stale
+    # or the last call failed; otherwise go straight to the single RPC.
+    try:
+        endpoint, channel = pick_endpoint(host, cert_path, options, trace)
+    except (FileNotFoundError, EndpointNotReady) as e:
+        trace.fail(str(e))
+        return (str(e), "Error")
+
+    try:
+        with get_balancer().track(endpoint), trace.phase("rpc"):
+            if options.needs_chunking(message):
+                result = echo_chunked(channel, message, options, trace)
+            else:
+                req = echo_pb2.EchoRequest(message=message)
+                if options.hedge_delay is None and trace:
+                    resp, call = echo_once_method(channel, trace).with_call(
+                        req, timeout=options.timeout, compression=options.compression, metadata=trace.metadata()
+                    )
+                    trace.record_reply(call.trailing_metadata())
+                elif options.hedge_delay is None:
+                    resp = echo_pb2_grpc.EchoStub(channel).EchoOnce(
+                        req, timeout=options.timeout, compression=options.compression
+                    )
+                else:
+                    send = lambda channel: echo_once_method(channel, trace).future(
+                        req, timeout=options.timeout, compression=options.compression, metadata=trace.metadata()
+                    )
+                    endpoint, resp = hedge(endpoint, channel, send, host, cert_path, options)
+                    trace.set("endpoint", endpoint)
+                result = (resp.message, resp.received_at)
+    except grpc.RpcError as e:
+        report_failure(endpoint, e)
+        trace.fail(e.details())
+        return (f"gRPC Error: {e.details()}", "Error")
+
+    get_readiness_cache().mark_ready(endpoint)
+    if cache_key:
+        get_response_cache().put(cache_key, result, cache_ttl)
+    return result
+
+
+async def echo_once_async(host, message, cert_path, cache_ttl=0, options=DEFAULT_CALL_OPTIONS, trace=NULL_TRACE):
+    cache_key = response_cache_key(host, message, cache_ttl)
+    cached = get_response_cache().get(cache_key) if cache_key else None
+    if cached is not None:
+        trace.set("cache_hit", True)
+        return cached
+
+    try:
+        endpoint, channel = await pick_endpoint_async(host, cert_path, options, trace)
+    except (FileNotFoundError, EndpointNotReady) as e:
+        trace.fail(str(e))
+        return (str(e), "Error")
+
+    try:
+        with get_balancer().track(endpoint), trace.phase("rpc"):
+            if options.needs_chunking(message):
+                result = await echo_chunked_async(channel, message, options, trace)
+            else:
+                req = echo_pb2.EchoRequest(message=message)
+                if trace:
+                    send = lambda channel: echo_once_method(channel, trace)(
+                        req, timeout=options.timeout, compression=options.compression, metadata=trace.metadata()
+                    )
+                else:
+                    send = lambda channel: echo_pb2_grpc.EchoStub(channel).EchoOnce(
+                        req, timeout=options.timeout, compression=options.compression
+                    )
+                if options.hedge_delay is None:
+                    call = send(channel)
+                    resp = await call
+                    if trace:
+                        trace.record_reply(await call.trailing_metadata())
+                else:
+                    endpoint, resp = await hedge_async(endpoint, channel, send, host, cert_path, options)
+                    trace.set("endpoint", endpoint)
+                result = (resp.message, resp.received_at)
+    except grpc.RpcError as e:
+        report_failure(endpoint, e)
+        trace.fail(e.details())
+        return (f"gRPC Error: {e.details()}", "Error")
+
+    get_readiness_cache().mark_ready(endpoint)
+    if cache_key:
+        get_response_cache().put(cache_key, result, cache_ttl)
+    return result
+
+
+def echo_many(host, messages, cert_path, batch_size, cache_ttl=0, options=DEFAULT_CALL_OPTIONS):
+    """Echo messages with batched EchoMany calls, returning (messages, received_at) lists.
+
+    Each chunk picks its own endpoint, so a large list is spread over all of
+    them. Messages over the size limit are sent on their own with EchoChunked.
+    """
+    cache = get_response_cache()
+    keys = [response_cache_key(host, m, cache_ttl) for m in messages]
+    outputs = [cache.get(key) if key else None for key in keys]
+    pending = [i for i, output in enumerate(outputs) if output is None]
+    if not pending:
+        return ([m for m, _ in outputs], [r for _, r in outputs])
+
+    oversized = {i for i in pending if options.needs_chunking(messages[i])}
+    batched = [i for i in pending if i not in oversized]
+    indices = iter(batched)
+    groups = [[i] for i in pending if i in oversized] + [
+        [next(indices) for _ in chunk]
+        for chunk in chunk_messages([messages[i] for i in batched], batch_size, options.max_batch_bytes)
+    ]
+    for n, group in enumerate(groups):
+        try:
+            endpoint, channel = pick_endpoint(host, cert_path, options)
+        except (FileNotFoundError, EndpointNotReady) as e:
+            _fail_groups(outputs, groups[n:], str(e))
+            break
+
+        try:
+            with get_balancer().track(endpoint):
+                if group[0] in oversized:
+                    replies = [(echo_chunked(channel, messages[group[0]], options), None)]
+                else:
+                    req = echo_pb2.EchoBatchRequest(
+                        requests=[echo_pb2.EchoRequest(message=messages[i]) for i in group]
+                    )
+                    resp = echo_pb2_grpc.EchoStub(channel).EchoMany(
+                        req, timeout=options.timeout, compression=options.compression
+                    )
+                    replies = [_batch_item_output(item) for item in resp.items]
+        except grpc.RpcError as e:
+            report_failure(endpoint, e)
+            # Batches already answered keep their replies; the rest get the error
+            _fail_groups(outputs, groups[n:], f"gRPC Error: {e.details()}")
+            break
+
+        get_readiness_cache().mark_ready(endpoint)
+        for i, (output, error) in zip(group, replies):
+            outputs[i] = output
+            if error is None and keys[i]:
+                cache.put(keys[i], output, cache_ttl)
+
+    return ([m for m, _ in outputs], [r for _, r in outputs])
+
+
+def _fail_groups(outputs, groups, error):
+    """Give every message of groups an error output, keeping the lists aligned with the input."""
+    for group in groups:
+        for i in group:
+            outputs[i] = (error, "Error")
+
+
+def _batch_item_output(item):
+    """Return (output, error details or None) for one EchoMany item."""
+    if item.code == grpc.StatusCode.OK.value[0]:
+        return (item.reply.message, item.reply.received_at), None
+    return (f"gRPC Error: {item.details}", "Error"), item.details
+
+
+def echo_stream(host, message, cert_path, cache_ttl=0, options=DEFAULT_CALL_OPTIONS, trace=NULL_TRACE):
+    """Echo message over the shared stream session.
+
+    The session is opened once for many calls, so the server cannot tell
+    which trace a message belongs to; only client-side phases are traced.
+    If the server has no room for another stream, EchoOnce is used instead.
+    """
+    cache_key = response_cache_key(host, message, cache_ttl)
+    cached = get_response_cache().get(cache_key) if cache_key else None
+    if cached is not None:
+        trace.set("cache_hit", True)
+        return cached
+
+    try:
+        endpoint, channel = pick_endpoint(host, cert_path, options, trace)
+    except (FileNotFoundError, EndpointNotReady) as e:
+        trace.fail(str(e))
+        return (str(e), "Error")
+
+    try:
+        with get_balancer().track(endpoint), trace.phase("rpc"):
+            if options.needs_chunking(message):
+                # Too large for a frame on the shared stream; use its own call
+                result = echo_chunked(channel, message, options, trace)
+            else:
+                req = echo_pb2.EchoRequest(message=message)
+                try:
+                    session = get_stream_session(channel, echo_pb2_grpc.EchoStub(channel).EchoStream)
+                    resp = session.echo(req, options.timeout or DEFAULT_REPLY_TIMEOUT)
+                except StreamRejected:
+                    # The server keeps its remaining workers for unary calls
+                    resp = echo_pb2.EchoStreamReply(reply=echo_pb2_grpc.EchoStub(channel).EchoOnce(
+                        req, timeout=options.timeout, compression=options.compression
+                    ))
+                if resp.code != grpc.StatusCode.OK.value[0]:
+                    get_readiness_cache().mark_ready(endpoint)
+                    trace.fail(resp.details)
+                    return (f"gRPC Error: {resp.details}", "Error")
+                result = (resp.reply.message, resp.reply.received_at)
+    except grpc.RpcError as e:
+        report_failure(endpoint, e)
+        trace.fail(e.details())
+        return (f"gRPC Error: {e.details()}", "Error")
+    except (StreamClosed, TimeoutError) as e:
+        report_failure(endpoint, e)
+        trace.fail(str(e))
+        return (f"Stream Error: {e}", "Error")
+
+    get_readiness_cache().mark_ready(endpoint)
+    if cache_key:
+        get_response_cache().put(cache_key, result, cache_ttl)
+    return result
+
+
+def echo_tensor(host, tensor, cert_path, options=DEFAULT_CALL_OPTIONS):
+    """Echo a torch tensor as one raw buffer, returning (tensor, received_at).
+
+    The reply is viewed in place with numpy.frombuffer rather than decoded.
+    Unlike the message echoes, failures raise: a tensor output cannot carry
+    the error text.
+    """
+    data, dtype, shape = tensor_to_buffer(tensor)
+    endpoint, channel = pick_endpoint(host, cert_path, options)
+
+    try:
+        with get_balancer().track(endpoint):
+            if len(data) > options.max_payload_bytes:
+                # dtype and shape stay on this side; the chunks carry only the data
+                data, received_at = echo_chunked_bytes(channel, data, options)
+            else:
+                req = echo_pb2.EchoRequest(tensor=echo_pb2.Tensor(data=data, dtype=dtype, shape=shape))
+                resp = echo_pb2_grpc.EchoStub(channel).EchoOnce(
+                    req, timeout=options.timeout, compression=options.compression
+                )
+                data, dtype, shape = resp.tensor.data, resp.tensor.dtype, list(resp.tensor.shape)
+                received_at = resp.received_at
+    except grpc.RpcError as e:
+        report_failure(endpoint, e)
+        raise RuntimeError(f"gRPC Error: {e.details()}") from e
+
+    get_readiness_cache().mark_ready(endpoint)
+    return (tensor_from_buffer(data, dtype, shape), received_at)
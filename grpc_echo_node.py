@@ -1,53 +1,50 @@
-import grpc
-import os
-import sys
-from pathlib import Path
-from unittest.mock import MagicMock
+import asyncio
+from types import SimpleNamespace
 
-# Add the server directory to the path to import generated protobuf files
-server_dir = Path(__file__).parent / "server"
-sys.path.append(str(server_dir))
+from aiohttp import web
 
-import echo_pb2
-import echo_pb2_grpc
+try:
+    from .grpc_server_supervisor import get_server_supervisor
+except ImportError:
+    # Fallback for when imported as a standalone module (e.g. during tests)
+    from grpc_server_supervisor import get_server_supervisor
 
-# This import might fail if not running inside ComfyUI, so we'll mock it if needed elsewhere
+# This import fails when not running inside ComfyUI; register routes on a
+# table nobody serves instead, so the handlers stay plain functions (tests)
 try:
     from server import PromptServer
 except ImportError:
-    PromptServer = MagicMock() # For tests
-from aiohttp import web
+    PromptServer = SimpleNamespace(instance=SimpleNamespace(routes=web.RouteTableDef()))
 
-def run_grpc_test(host, cert_path):
-    # Resolve certificate path: try given path, then path relative to this file
-    cert_candidate = Path(cert_path)
-    if not cert_candidate.exists():
-        candidate = Path(__file__).parent / cert_path
-        if candidate.exists():
-            cert_candidate = candidate
 
-    if not cert_candidate.exists():
-        return {"success": False, "message": f"Certificate file not found at {cert_path}"}
+# Default number of messages per EchoMany call in batch mode.
+DEFAULT_BATCH_SIZE = 64
 
-    try:
-        with open(cert_candidate, "rb") as f:
-            server_certificate = f.read()
+# Mirrors grpc_balancer.POLICIES, which cannot be imported without loading grpc.
+BALANCING_POLICIES = ("round_robin", "least_outstanding")
+
+# Mirror grpc_echo_client.COMPRESSION and DEFAULT_MAX_MESSAGE_MB for the same reason.
+COMPRESSION_TYPES = ("none", "gzip", "deflate")
+DEFAULT_MAX_MESSAGE_MB = 64
 
-        credentials = grpc.ssl_channel_credentials(root_certificates=server_certificate)
+# Mirror grpc_echo_client.DEFAULT_TIMEOUT and DEFAULT_MAX_ATTEMPTS.
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_MAX_ATTEMPTS = 3
 
-        # Remove the (gRPC) suffix if present for the actual connection
-        clean_host = host.split(" (")[0].strip()
+# Mirror grpc_echo_client.DEFAULT_KEEPALIVE_MS and DEFAULT_KEEPALIVE_TIMEOUT_MS.
+DEFAULT_KEEPALIVE_MS = 0
+DEFAULT_KEEPALIVE_TIMEOUT_MS = 20000
+
+
+def _client():
+    """Import the gRPC client on first use; grpc and the generated stubs are slow to load."""
+    try:
+        from . import grpc_echo_client
+    except ImportError:
+        # Fallback for when imported as a standalone module (e.g. during tests)
+        import grpc_echo_client
+    return grpc_echo_client
 
-        with grpc.secure_channel(clean_host, credentials) as channel:
-            stub = echo_pb2_grpc.EchoStub(channel)
-            # Use a tiny timeout for the test
-            req = echo_pb2.EchoRequest(message="ping")
-            resp = stub.EchoOnce(req, timeout=2) # 2 second timeout for test
-        return {"success": True, "message": f"Connected! Server echoed: {resp.message}"}
-    except grpc.RpcError as e:
-        return {"success": False, "message": f"gRPC Error: {e.details()}"}
-    except Exception as e:
-        return {"success": False, "message": str(e)}
 
 @PromptServer.instance.routes.post("/comfyui-grpc/test_connection")
 async def test_connection_api(request):
@@ -55,14 +52,63 @@ async def test_connection_api(request):
     host = json_data.get("host", "localhost:50051")
     cert_path = json_data.get("cert_path", "server/certs/certificate.pem")
     
-    result = run_grpc_test(host, cert_path)
+    # Awaiting keeps the UI/websocket server responsive while the test runs
+    result = await _client().run_grpc_test_async(host, cert_path)
     return web.json_response(result)
 
+
+@PromptServer.instance.routes.get("/comfyui-grpc/metrics")
+async def metrics_api(request):
+    return web.Response(text=_client().CLIENT_METRICS.render(), content_type="text/plain")
+
+
+@PromptServer.instance.routes.get("/comfyui-grpc/server_status")
+async def server_status_api(request):
+    supervisor = get_server_supervisor()
+    if supervisor is None:
+        return web.json_response({"state": "disabled"})
+    return web.json_response(supervisor.status())
+
+
+@PromptServer.instance.routes.post("/comfyui-grpc/restart_server")
+async def restart_server_api(request):
+    """Hand the auto-started server off to a fresh one (see ServerSupervisor.handoff)."""
+    supervisor = get_server_supervisor()
+    if supervisor is None:
+        return web.json_response({"state": "disabled", "restarted": False})
+    # Waits for the new server to get ready, so keep it off the event loop
+    restarted = await asyncio.get_running_loop().run_in_executor(None, supervisor.handoff)
+    return web.json_response({**supervisor.status(), "restarted": restarted})
+
+
+def _async_nodes_supported():
+    """Whether the running ComfyUI awaits coroutine node functions."""
+    try:
+        import execution
+    except ImportError:
+        return False
+    return hasattr(execution, "_async_map_node_over_list")
+
+
+ASYNC_NODES_SUPPORTED = _async_nodes_supported()
+
+
+def _call_options(balancing=BALANCING_POLICIES[0], compression=COMPRESSION_TYPES[0],
+                  max_message_mb=DEFAULT_MAX_MESSAGE_MB, timeout=DEFAULT_TIMEOUT,
+                  max_attempts=DEFAULT_MAX_ATTEMPTS, hedge_delay_ms=0, keepalive_ms=DEFAULT_KEEPALIVE_MS,
+                  keepalive_timeout_ms=DEFAULT_KEEPALIVE_TIMEOUT_MS, channel_args=""):
+    client = _client()
+    return client.CallOptions(
+        balancing, compression, max_message_mb, timeout, max_attempts, hedge_delay_ms,
+        keepalive_ms, keepalive_timeout_ms, client.parse_channel_args(channel_args),
+    )
+
 class GRPCEchoNode:
     @classmethod
     def INPUT_TYPES(cls):
         return {
             "required": {
+                # One host:port, or several separated by commas to balance across them
                 "host": ("STRING", {"default": "localhost:50051 (gRPC)"}),
                 "message": (
                     "STRING",
@@ -72,45 +118,161 @@ class GRPCEchoNode:
                     },
                 ),
                 "cert_path": ("STRING", {"default": "server/certs/certificate.pem"}),
-            }
+            },
+            "optional": {
+                # Seconds a successful reply is reused for identical host/message; 0 disables
+                "cache_ttl": ("INT", {"default": 0, "min": 0, "max": 86400}),
+                # How calls are spread when host lists several endpoints
+                "balancing": (list(BALANCING_POLICIES), {"default": BALANCING_POLICIES[0]}),
+                # Compression for the messages sent; replies come back the same way
+                "compression": (list(COMPRESSION_TYPES), {"default": COMPRESSION_TYPES[0]}),
+                # Largest single gRPC message; bigger messages are sent in chunks
+                "max_message_mb": ("INT", {"default": DEFAULT_MAX_MESSAGE_MB, "min": 1, "max": 2047}),
+                # Seconds before a call fails with DEADLINE_EXCEEDED; 0 waits forever
+                "timeout": ("FLOAT", {"default": DEFAULT_TIMEOUT, "min": 0.0, "max": 3600.0, "step": 0.1}),
+                # Attempts per call when the server is UNAVAILABLE; 1 disables retries
+                "max_attempts": ("INT", {"default": DEFAULT_MAX_ATTEMPTS, "min": 1, "max": 5}),
+                # Resend a unary call still unanswered after this many ms; 0 disables hedging
+                "hedge_delay_ms": ("INT", {"default": 0, "min": 0, "max": 60000}),
+                # Ping the connection after this many ms without traffic; 0 disables keepalive
+                "keepalive_ms": ("INT", {"default": DEFAULT_KEEPALIVE_MS, "min": 0, "max": 3600000}),
+                "keepalive_timeout_ms": ("INT", {"default": DEFAULT_KEEPALIVE_TIMEOUT_MS, "min": 1000, "max": 600000}),
+                # Advanced: JSON object of raw gRPC channel arguments, e.g. {"grpc.http2.lookahead_bytes": 1048576}
+                "channel_args": ("STRING", {"default": ""}),
+                # Output a per-phase timing breakdown of the call as JSON
+                "trace": ("BOOLEAN", {"default": False}),
+            },
         }
 
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("message", "received_at", "trace")
+    # Let ComfyUI await the call on its event loop when it can, so the
+    # prompt executor thread is not blocked on the network.
+    FUNCTION = "call_async" if ASYNC_NODES_SUPPORTED else "call"
+    CATEGORY = "network/grpc"
+
+    @classmethod
+    def IS_CHANGED(cls, host, message, cert_path, cache_ttl=0, **kwargs):
+        # Without the cache keep ComfyUI's default: re-run only when inputs change
+        if cache_ttl <= 0:
+            return ""
+        # Stable while the cached reply is fresh, so ComfyUI keeps its own
+        # output; NaN never compares equal, forcing a re-run once it expires.
+        stamp = _client().cache_stamp(host, [message], cache_ttl)
+        return float("nan") if stamp is None else stamp
+
+    def call(self, host, message, cert_path, cache_ttl=0, trace=False, **options):
+        client = _client()
+        trace = client.start_trace("EchoOnce", trace)
+        result = client.echo_once(host, message, cert_path, cache_ttl, _call_options(**options), trace)
+        return result + (client.finish_trace(trace),)
+
+    async def call_async(self, host, message, cert_path, cache_ttl=0, trace=False, **options):
+        client = _client()
+        trace = client.start_trace("EchoOnce", trace)
+        result = await client.echo_once_async(host, message, cert_path, cache_ttl, _call_options(**options), trace)
+        return result + (client.finish_trace(trace),)
+
+
+class GRPCEchoBatchNode(GRPCEchoNode):
+    """Echo a ComfyUI list of messages using batched EchoMany calls."""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        inputs = super().INPUT_TYPES()
+        inputs["required"]["batch_size"] = (
+            "INT",
+            {"default": DEFAULT_BATCH_SIZE, "min": 1, "max": 1000},
+        )
+        # One trace per batch would not say much about any one message
+        del inputs["optional"]["trace"]
+        return inputs
+
     RETURN_TYPES = ("STRING", "STRING")
     RETURN_NAMES = ("message", "received_at")
-    FUNCTION = "call"
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True, True)
+    FUNCTION = "call_many"
+
+    @classmethod
+    def IS_CHANGED(cls, host, message, cert_path, batch_size, cache_ttl=(0,), **kwargs):
+        if cache_ttl[0] <= 0:
+            return ""
+        stamp = _client().cache_stamp(host[0], message, cache_ttl[0])
+        return float("nan") if stamp is None else stamp
+
+    def call_many(self, host, message, cert_path, batch_size, cache_ttl=(0,), **options):
+        # With INPUT_IS_LIST every input arrives as a list; only message is per-item
+        options = _call_options(**{name: value[0] for name, value in options.items()})
+        return _client().echo_many(host[0], message, cert_path[0], batch_size[0], cache_ttl[0], options)
+
+
+class GRPCEchoStreamNode(GRPCEchoNode):
+    """Echo a message over a bidirectional stream kept open across executions."""
+
+    FUNCTION = "call_stream"
+
+    def call_stream(self, host, message, cert_path, cache_ttl=0, trace=False, **options):
+        client = _client()
+        trace = client.start_trace("EchoStream", trace)
+        result = client.echo_stream(host, message, cert_path, cache_ttl, _call_options(**options), trace)
+        return result + (client.finish_trace(trace),)
+
+
+class GRPCEchoImageNode:
+    """Echo an IMAGE as a raw tensor buffer instead of a text encoding."""
+
+    INPUT_NAME = "image"
+    INPUT_TYPE = "IMAGE"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        inputs = GRPCEchoNode.INPUT_TYPES()
+        required = inputs["required"]
+        # Tensors are not hashed for the response cache, nor traced
+        del inputs["optional"]["cache_ttl"]
+        del inputs["optional"]["trace"]
+        inputs["required"] = {
+            "host": required["host"],
+            cls.INPUT_NAME: (cls.INPUT_TYPE,),
+            "cert_path": required["cert_path"],
+        }
+        return inputs
+
+    RETURN_TYPES = ("IMAGE", "STRING")
+    RETURN_NAMES = ("image", "received_at")
+    FUNCTION = "call_tensor"
     CATEGORY = "network/grpc"
 
-    def call(self, host, message, cert_path):
-        result = run_grpc_test(host, cert_path)
-        if result["success"]:
-            # Need to do a full call here because run_grpc_test just pings
-            # (or we can modify run_grpc_test to take the message)
-            # Let's just use the logic directly here for the real call to avoid confusion
-            
-            # Resolve cert path again (or pass it back from run_grpc_test)
-            cert_candidate = Path(cert_path)
-            if not cert_candidate.exists():
-                cert_candidate = Path(__file__).parent / cert_path
-
-            with open(cert_candidate, "rb") as f:
-                server_certificate = f.read()
-            credentials = grpc.ssl_channel_credentials(root_certificates=server_certificate)
-            
-            clean_host = host.split(" (")[0].strip()
-            with grpc.secure_channel(clean_host, credentials) as channel:
-                stub = echo_pb2_grpc.EchoStub(channel)
-                req = echo_pb2.EchoRequest(message=message)
-                resp = stub.EchoOnce(req)
-            return (resp.message, resp.received_at)
-        else:
-            return (result["message"], "Error")
+    def call_tensor(self, host, image, cert_path, **options):
+        return _client().echo_tensor(host, image, cert_path, _call_options(**options))
+
+
+class GRPCEchoLatentNode(GRPCEchoImageNode):
+    """Echo a LATENT's samples as a raw tensor buffer, keeping its other entries."""
+
+    INPUT_NAME = "latent"
+    INPUT_TYPE = "LATENT"
+    RETURN_TYPES = ("LATENT", "STRING")
+    RETURN_NAMES = ("latent", "received_at")
 
+    def call_tensor(self, host, latent, cert_path, **options):
+        samples, received_at = _client().echo_tensor(host, latent["samples"], cert_path, _call_options(**options))
+        return ({**latent, "samples": samples}, received_at)
 
 
 NODE_CLASS_MAPPINGS = {
     "GRPCEchoNode": GRPCEchoNode,
+    "GRPCEchoBatchNode": GRPCEchoBatchNode,
+    "GRPCEchoStreamNode": GRPCEchoStreamNode,
+    "GRPCEchoImageNode": GRPCEchoImageNode,
+    "GRPCEchoLatentNode": GRPCEchoLatentNode,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "GRPCEchoNode": "gRPC Echo",
+    "GRPCEchoBatchNode": "gRPC Echo (Batch)",
+    "GRPCEchoStreamNode": "gRPC Echo (Stream)",
+    "GRPCEchoImageNode": "gRPC Echo (Image)",
+    "GRPCEchoLatentNode": "gRPC Echo (Latent)",
 }
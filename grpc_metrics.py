@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import grpc
+
+# Lives in the server directory so server and client share one implementation
+from echo_metrics import RpcMetrics
+
+# Client-side series for every RPC made through the shared channel pool.
+CLIENT_METRICS = RpcMetrics("echo_client")
+
+
+def _method_name(client_call_details):
+    method = client_call_details.method
+    return method.decode() if isinstance(method, bytes) else method
+
+
+def _message_size(message):
+    # Calls made without serializers, such as readiness probes, pass raw bytes
+    return message.ByteSize() if hasattr(message, "ByteSize") else len(message)
+
+
+def _response_size(call):
+    if call.code() != grpc.StatusCode.OK:
+        return 0
+    response = call.result()
+    return response.ByteSize() if hasattr(response, "ByteSize") else 0
+
+
+class MetricsClientInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.StreamStreamClientInterceptor):
+    """Record count, status, payload size and latency of calls on a sync channel.
+
+    Streaming calls are recorded once, when the stream finishes.
+    """
+
+    def __init__(self, metrics=CLIENT_METRICS):
+        self.metrics = metrics
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        start = time.perf_counter()
+        method = _method_name(client_call_details)
+        request_bytes = _message_size(request)
+        outcome = continuation(client_call_details, request)
+        outcome.add_done_callback(lambda call: self.metrics.observe(
+            method, call.code(), time.perf_counter() - start, request_bytes, _response_size(call)))
+        return outcome
+
+    def intercept_stream_stream(self, continuation, client_call_details, request_iterator):
+        start = time.perf_counter()
+        method = _method_name(client_call_details)
+        call = continuation(client_call_details, request_iterator)
+        call.add_done_callback(lambda done: self.metrics.observe(
+            method, done.code(), time.perf_counter() - start))
+        return call
+
+
+class AioMetricsClientInterceptor(grpc.aio.UnaryUnaryClientInterceptor):
+    """grpc.aio counterpart of MetricsClientInterceptor for unary calls."""
+
+    def __init__(self, metrics=CLIENT_METRICS):
+        self.metrics = metrics
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        start = time.perf_counter()
+        code, response = grpc.StatusCode.UNKNOWN, None
+        call = await continuation(client_call_details, request)
+        try:
+            response = await call
+            code = grpc.StatusCode.OK
+        except grpc.aio.AioRpcError as e:
+            code = e.code()
+            raise
+        except asyncio.CancelledError:
+            # e.g. the slower call of a hedged pair
+            code = grpc.StatusCode.CANCELLED
+            raise
+        finally:
+            self.metrics.observe(
+                _method_name(client_call_details), code, time.perf_counter() - start,
+                _message_size(request), _message_size(response) if response is not None else 0)
+        return call
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+
+import grpc
+
+try:
+    from grpc_health.v1 import health_pb2, health_pb2_grpc
+except ImportError:
+    # grpcio-health-checking is only required by the server; without it, probes just wait for the channel to connect
+    health_pb2 = health_pb2_grpc = None
+
+# How long a successful call or probe vouches for an endpoint.
+DEFAULT_TTL = 30.0
+
+# How long a probe waits for the channel to connect before giving up.
+DEFAULT_PROBE_TIMEOUT = 2.0
+
+# How long the call made to find out why a channel did not connect may take.
+CONNECT_ERROR_TIMEOUT = 0.5
+
+HEALTH_CHECK_METHOD = "/grpc.health.v1.Health/Check"
+
+
+class EndpointNotReady(Exception):
+    """Raised when a channel could not reach READY or the server is not serving."""
+
+
+def _is_serving(response_or_error):
+    if isinstance(response_or_error, grpc.RpcError):
+        # Servers predating the health service are assumed to be serving
+        return response_or_error.code() == grpc.StatusCode.UNIMPLEMENTED
+    return response_or_error.status == health_pb2.HealthCheckResponse.SERVING
+
+
+def check_health(channel, timeout=DEFAULT_PROBE_TIMEOUT):
+    """Ask the server's grpc.health.v1 service whether it is serving."""
+    if health_pb2_grpc is None:
+        return True
+    try:
+        response = health_pb2_grpc.HealthStub(channel).Check(health_pb2.HealthCheckRequest(), timeout=timeout)
+    except grpc.RpcError as e:
+        return _is_serving(e)
+    return _is_serving(response)
+
+
+async def check_health_async(channel, timeout=DEFAULT_PROBE_TIMEOUT):
+    if health_pb2_grpc is None:
+        return True
+    try:
+        response = await health_pb2_grpc.HealthStub(channel).Check(health_pb2.HealthCheckRequest(), timeout=timeout)
+    except grpc.RpcError as e:
+        return _is_serving(e)
+    return _is_serving(response)
+
+
+def _not_reachable(endpoint, timeout, error):
+    message = f"Server at {endpoint} not reachable within {timeout}s"
+    return EndpointNotReady(f"{message}: {error}" if error else message)
+
+
+def connect_error(channel):
+    """Why channel could not connect, e.g. a refused connection or a TLS name mismatch, or None.
+
+    A call made without wait_for_ready fails at once on a channel in
+    TRANSIENT_FAILURE, with gRPC's last connection error in its details.
+    The request is sent as raw bytes, so this works without grpc_health.
+    """
+    try:
+        channel.unary_unary(HEALTH_CHECK_METHOD)(b"", timeout=CONNECT_ERROR_TIMEOUT)
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.UNAVAILABLE:
+            return e.details()
+    return None
+
+
+async def connect_error_async(channel):
+    try:
+        await channel.unary_unary(HEALTH_CHECK_METHOD)(b"", timeout=CONNECT_ERROR_TIMEOUT)
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.UNAVAILABLE:
+            return e.details()
+    return None
+
+
+class ReadinessCache:
+    """Per-endpoint health with a TTL, so the hot path does not ping first.
+
+    An endpoint is considered ready after a successful call or probe until
+    ``ttl`` elapses or a call against it fails. Only then is it probed
+    again: the channel must connect and the server's health service must
+    report SERVING, so a draining server is not picked.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._ready_until = {}
+
+    def is_ready(self, endpoint):
+        with self._lock:
+            return self._ready_until.get(endpoint, 0.0) > time.monotonic()
+
+    def mark_ready(self, endpoint):
+        with self._lock:
+            self._ready_until[endpoint] = time.monotonic() + self.ttl
+
+    def mark_failed(self, endpoint):
+        with self._lock:
+            self._ready_until.pop(endpoint, None)
+
+    def ensure_ready(self, endpoint, channel, timeout=DEFAULT_PROBE_TIMEOUT):
+        """Wait for channel to connect unless endpoint is already known to be ready."""
+        if self.is_ready(endpoint):
+            return
+        future = grpc.channel_ready_future(channel)
+        try:
+            future.result(timeout=timeout)
+        except grpc.FutureTimeoutError:
+            future.cancel()
+            self.mark_failed(endpoint)
+            raise _not_reachable(endpoint, timeout, connect_error(channel))
+        if not check_health(channel, timeout):
+            self.mark_failed(endpoint)
+            raise EndpointNotReady(f"Server at {endpoint} is not serving")
+        self.mark_ready(endpoint)
+
+    async def ensure_ready_async(self, endpoint, channel, timeout=DEFAULT_PROBE_TIMEOUT):
+        """Like ensure_ready, for grpc.aio channels, without blocking the event loop."""
+        if self.is_ready(endpoint):
+            return
+        try:
+            await asyncio.wait_for(channel.channel_ready(), timeout)
+        except asyncio.TimeoutError:
+            self.mark_failed(endpoint)
+            raise _not_reachable(endpoint, timeout, await connect_error_async(channel))
+        if not await check_health_async(channel, timeout):
+            self.mark_failed(endpoint)
+            raise EndpointNotReady(f"Server at {endpoint} is not serving")
+        self.mark_ready(endpoint)
+
+    def clear(self):
+        with self._lock:
+            self._ready_until.clear()
+
+
+_readiness = ReadinessCache()
+
+
+def get_readiness_cache():
+    """Return the readiness cache shared by all nodes and HTTP routes in this process."""
+    return _readiness
@@ -0,0 +1,95 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Bounds for the process-wide cache; whichever is hit first evicts the LRU entry.
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class _Entry:
+    __slots__ = ("value", "size", "stored_at", "expires_at")
+
+    def __init__(self, value, size, stored_at, expires_at):
+        self.value = value
+        self.size = size
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """Bounded LRU cache of echo replies with a per-entry TTL.
+
+    Values are tuples of strings (the node outputs); their encoded length
+    counts towards ``max_bytes``.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def make_key(host, message):
+        return hashlib.sha256(f"{host}\0{message}".encode("utf-8")).hexdigest()
+
+    def _fresh_entry(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._remove(key)
+            return None
+        return entry
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._fresh_entry(key, time.monotonic())
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def stamp(self, key):
+        """Return when a still-fresh entry was stored, or None; does not affect LRU order."""
+        with self._lock:
+            entry = self._fresh_entry(key, time.monotonic())
+            return None if entry is None else entry.stored_at
+
+    def put(self, key, value, ttl):
+        size = sum(len(part.encode("utf-8")) for part in value)
+        if size > self.max_bytes:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, size, now, now + ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+_cache = ResponseCache()
+
+
+def get_response_cache():
+    """Return the response cache shared by all echo nodes in this process."""
+    return _cache
@@ -0,0 +1,356 @@
+"""Run the echo server as a supervised child process.
+
+Only the standard library is used, so this can be imported while ComfyUI
+loads the custom node without slowing it down.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import re
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# echo_server.py prints a line starting with this once it accepts RPCs,
+# ending in the port it listens on
+READY_PREFIX = "Server: Ready"
+READY_PORT = re.compile(r" on port (\d+)$")
+
+# The port the nodes' host input defaults to. With port 0 the server picks a
+# free port, and nodes addressing localhost on this one reach it there.
+NODE_DEFAULT_PORT = 50051
+
+# uv may have to resolve the server environment before the first start
+DEFAULT_READY_TIMEOUT = 60
+INITIAL_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+# A server that stayed up this long counts as healthy again and resets the backoff
+STABLE_AFTER = 60.0
+# Longer than the server's default 5 s drain grace, so SIGTERM lets in-flight
+# calls finish before the server is killed
+STOP_TIMEOUT = 10
+
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "[::1]", "0.0.0.0"}
+
+STARTING = "starting"
+READY = "ready"
+BACKOFF = "backoff"
+EXTERNAL = "external"
+# The server command could not be run at all (e.g. uv is not installed); not retried
+FAILED = "failed"
+STOPPED = "stopped"
+
+
+def is_port_in_use(port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        # Use 127.0.0.1 instead of localhost for consistency
+        return s.connect_ex(('127.0.0.1', port)) == 0
+
+
+def private_socket_dir():
+    """Return a directory for the server's Unix socket that only this user can access.
+
+    $XDG_RUNTIME_DIR is such a directory already; otherwise one is created in
+    the temp directory. Returns None if the directory exists but belongs to
+    someone else or is open to others, since whoever controls it could put
+    their own socket in place and receive the plaintext calls.
+    """
+    path = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(), f"comfyui-grpc-{os.getuid()}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    except OSError:
+        return None
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        return None
+    return path
+
+
+def _is_own_socket(path):
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(info.st_mode) and info.st_uid == os.getuid()
+
+
+def _make_logger(log_path):
+    os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+    logger = logging.getLogger(f"comfyui_grpc.server.{os.path.abspath(log_path)}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    handler = logging.handlers.RotatingFileHandler(
+        log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    logger.addHandler(handler)
+    return logger
+
+
+class ServerSupervisor:
+    """Start a server command, wait for its ready line and restart it when it exits.
+
+    The child's stdout and stderr go to a rotating log file. If the port is
+    already taken when the supervisor starts, the existing server is used
+    and nothing is spawned. stop() sends SIGTERM, on which the server
+    drains its in-flight calls, and kills it after STOP_TIMEOUT seconds.
+
+    With port 0 the server picks a free port, so several ComfyUI instances
+    on one host each get a server of their own; port is updated to it
+    from the ready line.
+    """
+
+    def __init__(self, cmd, cwd, port, log_path, ready_timeout=DEFAULT_READY_TIMEOUT,
+                 initial_backoff=INITIAL_BACKOFF, max_backoff=MAX_BACKOFF, uds_path=None):
+        self.cmd = list(cmd)
+        self.cwd = cwd
+        self.port = port
+        self.auto_port = port == 0
+        # Unix domain socket the server also listens on without TLS, if any
+        self.uds_path = uds_path
+        self.log_path = log_path
+        self.ready_timeout = ready_timeout
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.state = STOPPED
+        self.restarts = 0
+        self.last_exit_code = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+        self._process = None
+        self._thread = None
+        self._logger = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=None):
+        """Block until the server accepts RPCs; returns False on timeout."""
+        return self._ready.wait(timeout)
+
+    def serves(self, host):
+        """Whether a host:port target points at the supervised server."""
+        name, _, port = host.rpartition(":")
+        if name.lower() not in LOCAL_HOSTS:
+            return False
+        return port == str(self.port) or self.auto_port and port == str(NODE_DEFAULT_PORT)
+
+    def resolve(self, host):
+        """Return host with the port the supervised server actually listens on, if host points at it."""
+        if not self.serves(host):
+            return host
+        return f"{host.rpartition(':')[0]}:{self.port}"
+
+    def local_target(self, host):
+        """Return the unix: target to use instead of host, or None to connect over TCP.
+
+        A server that was already running on the port may not have the
+        socket, so it is only used once it exists. Calls on it skip TLS, so
+        it is only trusted if it is a socket owned by this user.
+        """
+        if self.uds_path is None or not self.serves(host) or not _is_own_socket(self.uds_path):
+            return None
+        return f"unix:{self.uds_path}"
+
+    def status(self):
+        with self._lock:
+            process = self._process
+        return {
+            "state": self.state,
+            "pid": process.pid if process is not None and process.poll() is None else None,
+            "port": self.port,
+            "uds_path": self.uds_path,
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+            "log_path": self.log_path,
+        }
+
+    def start(self):
+        self._stopping.clear()
+        self.state = STARTING
+        self._thread = threading.Thread(target=self._supervise, name="grpc-echo-supervisor", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def handoff(self):
+        """Replace the running server without refusing or dropping calls.
+
+        A new server is started on the same port, which both share through
+        SO_REUSEPORT. Once it is ready, the old one gets SIGTERM and drains
+        while new connections go to its successor. Returns False, leaving the
+        old server running, if the new one exits or does not get ready within
+        ready_timeout, e.g. on Windows, which cannot share the port. With
+        port 0 the new server picks a port of its own instead.
+        """
+        with self._lock:
+            old = self._process
+        if self.state != READY or old is None or old.poll() is not None:
+            return False
+        process = self._spawn()
+        if process is None:
+            return False
+        ready = threading.Event()
+        threading.Thread(target=self._read_output, args=(process, ready), daemon=True).start()
+        deadline = time.monotonic() + self.ready_timeout
+        while process.poll() is None and not ready.wait(0.1) and time.monotonic() < deadline:
+            pass
+        if not ready.is_set():
+            self._logger.info(f"supervisor: handoff to pid {process.pid} failed, keeping pid {old.pid}")
+            process.kill()
+            process.wait()
+            return False
+        with self._lock:
+            self._process = process
+        self._logger.info(f"supervisor: handed off from pid {old.pid} to pid {process.pid}, draining the old server")
+        old.terminate()
+        if self._stopping.is_set():
+            # stop() ran during the handoff and only saw the old process
+            process.terminate()
+        return True
+
+    def stop(self):
+        self._stopping.set()
+        with self._lock:
+            process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=STOP_TIMEOUT)
+        self._ready.clear()
+        self.state = STOPPED
+
+    def _supervise(self):
+        if not self.auto_port and is_port_in_use(self.port):
+            print(f"gRPC Echo Server: Port {self.port} already in use, using the running server")
+            self.state = EXTERNAL
+            self._ready.set()
+            return
+
+        self._logger = _make_logger(self.log_path)
+        failures = 0
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            code = self._run_once()
+            if self.state == FAILED:
+                print(f"gRPC Echo Server: Could not start the server, not retrying (logs: {self.log_path})")
+                return
+            if self._stopping.is_set():
+                break
+            if time.monotonic() - started >= STABLE_AFTER:
+                failures = 0
+            delay = min(self.initial_backoff * 2 ** failures, self.max_backoff)
+            failures += 1
+            self.restarts += 1
+            self.state = BACKOFF
+            message = f"Exited with code {code}, restarting in {delay:.1f}s"
+            self._logger.info(f"supervisor: {message}")
+            print(f"gRPC Echo Server: {message} (logs: {self.log_path})")
+            self._stopping.wait(delay)
+
+    def _spawn(self):
+        self._logger.info(f"supervisor: starting {' '.join(self.cmd)}")
+        try:
+            process = subprocess.Popen(
+                self.cmd,
+                cwd=self.cwd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                # Line-by-line output so the ready line arrives as soon as it is printed
+                env=dict(os.environ, PYTHONUNBUFFERED="1"),
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0,
+            )
+        except OSError as e:
+            self._logger.info(f"supervisor: failed to start: {e}")
+            return None
+        return process
+
+    def _run_once(self):
+        self.state = STARTING
+        process = self._spawn()
+        if process is None:
+            # Retrying cannot help while the command itself is missing or not executable
+            self.state = FAILED
+            return None
+        with self._lock:
+            self._process = process
+        if self._stopping.is_set():
+            # stop() ran while we were spawning and did not see this process
+            process.terminate()
+
+        reader = threading.Thread(target=self._read_output, args=(process, self._ready), daemon=True)
+        reader.start()
+
+        deadline = time.monotonic() + self.ready_timeout
+        while (process.poll() is None and not self._ready.is_set()
+               and not self._stopping.is_set() and time.monotonic() < deadline):
+            self._ready.wait(0.1)
+        if process.poll() is None and not self._ready.is_set() and not self._stopping.is_set():
+            self._logger.info(f"supervisor: not ready after {self.ready_timeout}s, killing")
+            process.kill()
+
+        code = process.wait()
+        reader.join(timeout=1)
+        while True:
+            with self._lock:
+                successor = self._process
+            if successor is process or self._stopping.is_set():
+                break
+            # handoff() replaced the process; supervise its successor from now on
+            process = successor
+            code = process.wait()
+        self._ready.clear()
+        self.last_exit_code = code
+        return code
+
+    def _read_output(self, process, ready):
+        for line in process.stdout:
+            line = line.rstrip()
+            self._logger.info(line)
+            if line.startswith(READY_PREFIX) and not ready.is_set():
+                port = READY_PORT.search(line)
+                if port is not None:
+                    self.port = int(port.group(1))
+                self.state = READY
+                ready.set()
+                print(f"gRPC Echo Server: Ready on port {self.port} (gRPC)")
+        process.stdout.close()
+
+
+_supervisor = None
+
+
+def start_server_supervisor(cmd, cwd, port, log_path, **kwargs):
+    """Start the process-wide supervisor, or return the one already running."""
+    global _supervisor
+    if _supervisor is None or _supervisor.state in (STOPPED, FAILED):
+        _supervisor = ServerSupervisor(cmd, cwd, port, log_path, **kwargs)
+        _supervisor.start()
+    return _supervisor
+
+
+def get_server_supervisor():
+    """Return the supervisor started by this process, or None if the server is not auto-started."""
+    return _supervisor
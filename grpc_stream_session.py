@@ -0,0 +1,158 @@
+import atexit
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import grpc
+
+# Requests allowed on the wire without a reply before submit() blocks.
+DEFAULT_MAX_IN_FLIGHT = 64
+
+# How long echo() waits for a slot and for the matching reply.
+DEFAULT_REPLY_TIMEOUT = 30.0
+
+# How long a channel whose stream the server turned away goes without one
+# before a new stream is tried.
+REJECTED_RETRY_SECONDS = 10.0
+
+# Sentinel that half-closes the request stream.
+_CLOSE = object()
+
+
+class StreamClosed(Exception):
+    """Raised when a request is submitted to, or pending on, a finished stream."""
+
+
+class StreamRejected(StreamClosed):
+    """Raised when the server has no room for the stream, e.g. over its --max-streams."""
+
+
+class EchoStreamSession:
+    """One long-lived bidirectional EchoStream call shared across node executions.
+
+    Requests are tagged with a ``request_id`` and replies are matched back to
+    the waiting caller by that id, so callers on different threads can share
+    the stream. At most ``max_in_flight`` requests may be awaiting a reply;
+    further submissions block, which keeps the client from outrunning the
+    server's flow-control window.
+    """
+
+    def __init__(self, open_stream, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        self._requests = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._closed = False
+        self._replied = False
+        self._rejected_at = None
+        self._call = open_stream(self._request_iterator())
+        self._reader = threading.Thread(
+            target=self._read_replies, name="grpc-echo-stream", daemon=True
+        )
+        self._reader.start()
+
+    @property
+    def closed(self):
+        with self._lock:
+            return self._closed
+
+    @property
+    def rejected(self):
+        """Whether the server turned this stream away within the last REJECTED_RETRY_SECONDS."""
+        with self._lock:
+            return self._rejected_at is not None and time.monotonic() - self._rejected_at < REJECTED_RETRY_SECONDS
+
+    def _request_iterator(self):
+        while True:
+            request = self._requests.get()
+            if request is _CLOSE:
+                return
+            yield request
+
+    def _read_replies(self):
+        try:
+            for reply in self._call:
+                with self._lock:
+                    self._replied = True
+                    future = self._pending.pop(reply.request_id, None)
+                if future is not None:
+                    self._slots.release()
+                    future.set_result(reply)
+            error = StreamClosed("Stream ended by server")
+        except grpc.RpcError as e:
+            error = e
+            # RESOURCE_EXHAUSTED later on is about a message, not the stream
+            if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED and not self._replied:
+                error = StreamRejected(e.details())
+                with self._lock:
+                    self._rejected_at = time.monotonic()
+        self._fail_pending(error)
+
+    def _fail_pending(self, error):
+        with self._lock:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            self._slots.release()
+            future.set_exception(error)
+
+    def submit(self, request, timeout=None):
+        """Send request on the stream and return a Future for its reply."""
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("Too many stream requests in flight")
+        request.request_id = str(next(self._ids))
+        future = Future()
+        with self._lock:
+            if self._closed:
+                self._slots.release()
+                if self._rejected_at is not None:
+                    raise StreamRejected("Stream was rejected by the server")
+                raise StreamClosed("Stream is closed")
+            self._pending[request.request_id] = future
+        self._requests.put(request)
+        return future
+
+    def echo(self, request, timeout=DEFAULT_REPLY_TIMEOUT):
+        """Send request and block until its reply arrives."""
+        return self.submit(request, timeout=timeout).result(timeout=timeout)
+
+    def close(self):
+        """Half-close the request stream and cancel the call."""
+        self._requests.put(_CLOSE)
+        self._call.cancel()
+
+
+_sessions_lock = threading.Lock()
+_sessions = {}
+
+
+def get_stream_session(channel, open_stream):
+    """Return the open stream session for channel, starting one if needed.
+
+    ``open_stream`` is called with a request iterator to start a new call,
+    typically ``EchoStub(channel).EchoStream``. A session the server just
+    rejected is returned as is, so its requests fail fast with StreamRejected
+    instead of opening a stream per request.
+    """
+    with _sessions_lock:
+        for key in [key for key, session in _sessions.items() if session.closed and not session.rejected]:
+            del _sessions[key]
+        session = _sessions.get(channel)
+        if session is None:
+            session = _sessions[channel] = EchoStreamSession(open_stream)
+    return session
+
+
+def close_stream_sessions():
+    """Close every open stream session."""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+atexit.register(close_stream_sessions)
@@ -0,0 +1,49 @@
+"""Conversion between torch tensors and the raw buffers of Tensor messages.
+
+numpy and torch are imported on use: ComfyUI always provides them, but the
+rest of the client does not need them.
+"""
+import warnings
+
+# numpy has no bfloat16, so its bits travel and are viewed as int16.
+_NUMPY_DTYPES = {"bfloat16": "int16"}
+
+
+def tensor_to_buffer(tensor):
+    """Return (data, dtype, shape) for a torch tensor's elements.
+
+    The tensor is made contiguous on the CPU first; producing the bytes for
+    the request is the only copy of the element data on the way out.
+    """
+    import torch
+
+    tensor = tensor.detach().cpu().contiguous()
+    dtype = str(tensor.dtype).removeprefix("torch.")
+    if tensor.dtype == torch.bfloat16:
+        tensor = tensor.view(torch.int16)
+    return tensor.numpy().tobytes(), dtype, list(tensor.shape)
+
+
+def array_from_buffer(data, dtype, shape):
+    """View data as a numpy array of dtype and shape without copying it.
+
+    The array shares data's memory, so it is read-only when data is bytes.
+    """
+    import numpy as np
+
+    return np.frombuffer(data, dtype=_NUMPY_DTYPES.get(dtype, dtype)).reshape(shape)
+
+
+def tensor_from_buffer(data, dtype, shape):
+    """Return a torch tensor sharing data's memory."""
+    import torch
+
+    array = array_from_buffer(data, dtype, shape)
+    with warnings.catch_warnings():
+        # from_numpy warns that the array is read-only; like any node output,
+        # the tensor is shared downstream and must not be modified in place
+        warnings.simplefilter("ignore", UserWarning)
+        tensor = torch.from_numpy(array)
+    if dtype == "bfloat16":
+        tensor = tensor.view(torch.bfloat16)
+    return tensor
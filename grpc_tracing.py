@@ -0,0 +1,239 @@
+"""Per-call tracing for the echo nodes.
+
+A Trace records how long each phase of a node call took: loading the
+certificate, connecting (TCP, TLS handshake and readiness probe), the RPC
+and, within it, serializing the request and deserializing the reply. Its
+trace id is sent to the server in a W3C traceparent header; the server logs
+it and echoes it back in a trace-id trailer.
+
+Finished traces can be written to a file as OTLP/JSON, one export request
+per line, the format read by the OpenTelemetry Collector's otlpjsonfile
+receiver. Only the standard library is used.
+"""
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+TRACEPARENT_KEY = "traceparent"
+TRACE_ID_KEY = "trace-id"
+
+# Path of the OTLP/JSON file finished traces are appended to; unset disables export.
+TRACE_FILE_ENV = "COMFYUI_GRPC_TRACE_FILE"
+
+SERVICE_NAME = "comfyui-grpc-client"
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_CODE_ERROR = 2
+
+
+class Trace:
+    """Phase timings of one node call, plus attributes such as the endpoint used.
+
+    output is whether the node asked for the trace; an exported trace of a
+    node that did not ask for it is not returned to the node.
+    """
+
+    def __init__(self, name, output=True):
+        self.name = name
+        self.output = output
+        self.trace_id = secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter_ns()
+        self.duration_ns = None
+        # (name, start offset, duration) in ns; a phase may occur more than once
+        self.phases = []
+        self.attributes = {}
+        self.error = None
+
+    def __bool__(self):
+        return True
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            self.phases.append((name, start - self._started, end - start))
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def fail(self, error):
+        self.error = error
+
+    def timed(self, name, fn):
+        """Wrap fn so each call to it is recorded as a phase."""
+        def timed_fn(*args):
+            with self.phase(name):
+                return fn(*args)
+        return timed_fn
+
+    def metadata(self):
+        """Call metadata propagating the trace to the server.
+
+        Only traces the node asked for are flagged as sampled, which the
+        server logs regardless of its sample rate; export-only traces keep
+        the id for correlation but follow the server's sampling.
+        """
+        flags = "01" if self.output else "00"
+        return ((TRACEPARENT_KEY, f"00-{self.trace_id}-{self.span_id}-{flags}"),)
+
+    def record_reply(self, trailing_metadata):
+        """Note the trace id the server echoed back in its trailing metadata."""
+        for key, value in trailing_metadata or ():
+            if key == TRACE_ID_KEY:
+                self.attributes["server_trace_id"] = value
+
+    def finish(self):
+        self.duration_ns = time.perf_counter_ns() - self._started
+
+    def breakdown(self):
+        """Milliseconds spent per phase, summed over repeated phases."""
+        totals = {}
+        for name, _, duration in self.phases:
+            totals[name] = totals.get(name, 0) + duration
+        return {name: round(total / 1e6, 3) for name, total in totals.items()}
+
+    def to_json(self):
+        return json.dumps({
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "total_ms": round((self.duration_ns or 0) / 1e6, 3),
+            "phases_ms": self.breakdown(),
+            **self.attributes,
+            "error": self.error,
+        })
+
+    def otlp_spans(self):
+        """The call as an OTLP span with one child span per phase."""
+        def attributes(values):
+            return [{"key": key, "value": _otlp_value(value)} for key, value in values.items()]
+
+        root = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_CLIENT,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.start_ns + (self.duration_ns or 0)),
+            "attributes": attributes(self.attributes),
+            "status": {"code": STATUS_CODE_ERROR, "message": self.error} if self.error else {},
+        }
+        spans = [root]
+        for name, offset, duration in self.phases:
+            spans.append({
+                "traceId": self.trace_id,
+                "spanId": secrets.token_hex(8),
+                "parentSpanId": self.span_id,
+                "name": name,
+                "kind": SPAN_KIND_INTERNAL,
+                "startTimeUnixNano": str(self.start_ns + offset),
+                "endTimeUnixNano": str(self.start_ns + offset + duration),
+            })
+        return spans
+
+
+class NullTrace:
+    """Stands in for a Trace when the call is not traced; records nothing."""
+
+    def __bool__(self):
+        return False
+
+    def phase(self, name):
+        return nullcontext()
+
+    def set(self, key, value):
+        pass
+
+    def fail(self, error):
+        pass
+
+    def timed(self, name, fn):
+        return fn
+
+    def metadata(self):
+        return None
+
+    def record_reply(self, trailing_metadata):
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class FileSpanExporter:
+    """Append finished traces to a file as OTLP/JSON lines."""
+
+    def __init__(self, path, service_name=SERVICE_NAME):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, trace):
+        line = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "comfyui-grpc"}, "spans": trace.otlp_spans()}],
+        }]})
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_exporter = FileSpanExporter(os.environ[TRACE_FILE_ENV]) if os.environ.get(TRACE_FILE_ENV) else None
+
+
+def get_trace_exporter():
+    """Return the exporter finished traces go to, or None if export is off."""
+    return _exporter
+
+
+def set_trace_exporter(exporter):
+    global _exporter
+    if _exporter is not None and _exporter is not exporter:
+        _exporter.close()
+    _exporter = exporter
+
+
+def start_trace(name, enabled=False):
+    """Return a Trace for a call if it was asked for or traces are exported, else NULL_TRACE."""
+    if enabled or _exporter is not None:
+        return Trace(name, output=enabled)
+    return NULL_TRACE
+
+
+def finish_trace(trace):
+    """End trace and export it; returns its JSON breakdown, or "" if the node did not ask for it."""
+    if not trace:
+        return ""
+    trace.finish()
+    if _exporter is not None:
+        _exporter.export(trace)
+    return trace.to_json() if trace.output else ""
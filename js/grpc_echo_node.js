@@ -4,7 +4,8 @@ import { api } from "/scripts/api.js";
 app.registerExtension({
     name: "Comfy.GrpcEchoNode",
     async beforeRegisterNodeDef(nodeType, nodeData, app) {
-        if (nodeData.name === "GRPCEchoNode") {
+        const grpcNodes = ["GRPCEchoNode", "GRPCEchoBatchNode", "GRPCEchoStreamNode"];
+        if (grpcNodes.includes(nodeData.name)) {
             // Add a "Test Connection" button
             const onNodeCreated = nodeType.prototype.onNodeCreated;
             nodeType.prototype.onNodeCreated = function () {
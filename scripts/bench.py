@@ -0,0 +1,485 @@
+import argparse
+import functools
+import json
+import os
+import random
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import grpc
+
+root_dir = Path(__file__).parent.parent
+server_dir = root_dir / "server"
+sys.path.append(str(root_dir))
+sys.path.append(str(server_dir))
+
+import echo_pb2
+import echo_pb2_grpc
+from grpc_echo_client import COMPRESSION, CallOptions, echo_chunked
+from grpc_stream_session import EchoStreamSession, StreamClosed
+
+MODES = ("unary", "batch", "stream", "chunked")
+TRANSPORTS = ("tls", "plaintext", "uds")
+PAYLOADS = ("repeat", "text", "random")
+
+# Large enough for the multi-megabyte scenarios; the server is started with the same limit.
+MAX_MESSAGE_MB = 64
+
+WORDS = ("prompt", "latent", "sampler", "image", "seed", "steps", "cfg", "scheduler", "model", "vae",
+         "a", "the", "of", "with", "photo", "portrait", "landscape", "detailed", "light", "color")
+
+
+def generate_certs(dest):
+    """Create a throwaway self-signed certificate for localhost in dest."""
+    if shutil.which("openssl") is None:
+        return False
+    subprocess.check_call([
+        "openssl", "req", "-x509", "-newkey", "rsa:2048",
+        "-keyout", str(dest / "private.key"), "-out", str(dest / "certificate.pem"),
+        "-sha256", "-days", "1", "-nodes", "-subj", "/CN=localhost",
+    ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return True
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def socket_path(port):
+    """Unix socket the server listens on for the uds transport."""
+    return Path(tempfile.gettempdir()) / f"echo_bench_{port}.sock"
+
+
+def parse_channel_arg(text):
+    """Parse NAME=VALUE into a gRPC channel option, with integer values as ints."""
+    name, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text!r}")
+    try:
+        return name, int(value)
+    except ValueError:
+        return name, value
+
+
+def make_channel(port, transport, certs_dir, channel_args=()):
+    target = f"localhost:{port}"
+    options = (
+        ("grpc.max_receive_message_length", MAX_MESSAGE_MB * 1024 * 1024),
+        ("grpc.max_send_message_length", MAX_MESSAGE_MB * 1024 * 1024),
+    ) + tuple(channel_args)
+    if transport == "plaintext":
+        return grpc.insecure_channel(target, options)
+    if transport == "uds":
+        return grpc.insecure_channel(f"unix:{socket_path(port)}", options)
+    with open(certs_dir / "certificate.pem", "rb") as f:
+        credentials = grpc.ssl_channel_credentials(root_certificates=f.read())
+    return grpc.secure_channel(target, credentials, options)
+
+
+def make_payload(kind, size):
+    """Return a size-character payload: one repeated letter, word-like text, or random letters."""
+    if kind == "repeat":
+        return "x" * size
+    rng = random.Random(size)
+    if kind == "text":
+        text = " ".join(rng.choices(WORDS, k=size // 4 + 1))
+        return text[:size]
+    return "".join(rng.choices("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789", k=size))
+
+
+class ByteCountingProxy:
+    """TCP forwarder to a local port that counts the bytes passing each way.
+
+    With TLS the counts include record overhead, but they still show what
+    compression saves on the wire. With idle_timeout it also resets
+    connections that carried no traffic for that many seconds, as load
+    balancers and NAT gateways do.
+    """
+
+    def __init__(self, target_port, idle_timeout=None):
+        self.target_port = target_port
+        self.idle_timeout = idle_timeout
+        self.sent = 0
+        self.received = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        # (client, upstream) -> time of the last forwarded data
+        self._last_active = {}
+        self._reset = set()
+        self._listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self._listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+        if idle_timeout:
+            threading.Thread(target=self._reap_idle, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(("127.0.0.1", self.target_port))
+            for sock in (client, upstream):
+                # Forward each write immediately, as the endpoints themselves do
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            pair = (client, upstream)
+            with self._lock:
+                self.connections += 1
+                self._last_active[pair] = time.monotonic()
+            threading.Thread(target=self._pump, args=(client, upstream, "sent", pair), daemon=True).start()
+            threading.Thread(target=self._pump, args=(upstream, client, "received", pair), daemon=True).start()
+
+    def _pump(self, source, dest, counter, pair):
+        try:
+            while data := source.recv(65536):
+                dest.sendall(data)
+                with self._lock:
+                    setattr(self, counter, getattr(self, counter) + len(data))
+                    self._last_active[pair] = time.monotonic()
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._last_active.pop(pair, None)
+                reset = pair in self._reset
+            for sock in (source, dest):
+                try:
+                    if reset:
+                        sock.close()
+                    else:
+                        sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def _reap_idle(self):
+        while True:
+            time.sleep(self.idle_timeout / 10)
+            now = time.monotonic()
+            with self._lock:
+                idle = [pair for pair, last in self._last_active.items() if now - last > self.idle_timeout]
+                self._reset.update(idle)
+                for pair in idle:
+                    del self._last_active[pair]
+            for pair in idle:
+                for sock in pair:
+                    try:
+                        # The pumps wake up and close the sockets, which then
+                        # send RST rather than FIN, like an idle-timeout reset
+                        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                        sock.shutdown(socket.SHUT_RD)
+                    except OSError:
+                        pass
+
+    def counts(self):
+        with self._lock:
+            return self.sent, self.received
+
+    def close(self):
+        self._listener.close()
+
+
+@contextmanager
+def running_server(transport, certs_dir, server_args):
+    """Start echo_server.py on a free port and yield the port once it accepts calls."""
+    port = free_port()
+    cmd = [sys.executable, "echo_server.py", "--port", str(port), "--certs-dir", str(certs_dir),
+           "--max-message-mb", str(MAX_MESSAGE_MB)]
+    if transport == "plaintext":
+        cmd.append("--plaintext")
+    elif transport == "uds":
+        # The TCP port keeps TLS, as for the auto-started server
+        cmd.extend(["--uds", str(socket_path(port))])
+    cmd.extend(server_args)
+
+    process = subprocess.Popen(cmd, cwd=str(server_dir), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        channel = make_channel(port, transport, certs_dir)
+        try:
+            grpc.channel_ready_future(channel).result(timeout=15)
+        except grpc.FutureTimeoutError:
+            process.terminate()
+            raise RuntimeError(f"Server did not start: {process.communicate()[1].decode(errors='replace')}")
+        finally:
+            channel.close()
+        yield port
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def make_sender(mode, channel, payload, batch_size, compression):
+    """Return a function performing one benchmark operation and returning messages echoed."""
+    stub = echo_pb2_grpc.EchoStub(channel)
+    # Chunked calls go through the client helper, which takes the nodes' call options;
+    # no deadline, like the calls the other modes make
+    options = CallOptions(compression=compression, max_message_mb=MAX_MESSAGE_MB, timeout=0)
+    compression = options.compression
+    if mode == "unary":
+        request = echo_pb2.EchoRequest(message=payload)
+
+        def send():
+            stub.EchoOnce(request, compression=compression)
+            return 1
+    elif mode == "batch":
+        request = echo_pb2.EchoBatchRequest(
+            requests=[echo_pb2.EchoRequest(message=payload)] * batch_size
+        )
+
+        def send():
+            return len(stub.EchoMany(request, compression=compression).items)
+    elif mode == "chunked":
+        def send():
+            echo_chunked(channel, payload, options)
+            return 1
+    else:
+        session = EchoStreamSession(functools.partial(stub.EchoStream, compression=compression))
+
+        def send():
+            session.echo(echo_pb2.EchoRequest(message=payload))
+            return 1
+        send.close = session.close
+    return send
+
+
+def run_scenario(mode, channel, concurrency, message_size, duration, warmup, batch_size,
+                 compression="none", payload="repeat", proxy=None, idle_gap=0.0):
+    send = make_sender(mode, channel, make_payload(payload, message_size), batch_size, compression)
+    lock = threading.Lock()
+    latencies, totals = [], {"calls": 0, "messages": 0, "errors": 0, "all_messages": 0}
+    # Exceptions other than failed calls, which are bugs in the benchmark rather than errors to count
+    crashes = []
+    wire_before = proxy.counts() if proxy else None
+    connections_before = proxy.connections if proxy else None
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def worker():
+        local_latencies, calls, messages, errors, all_messages = [], 0, 0, 0, 0
+        while True:
+            t0 = time.perf_counter()
+            if t0 >= stop_at:
+                break
+            try:
+                echoed = send()
+            except (grpc.RpcError, StreamClosed, TimeoutError):
+                echoed = None
+            except Exception as e:
+                with lock:
+                    crashes.append(e)
+                return
+            t1 = time.perf_counter()
+            all_messages += echoed or 0
+            if t0 >= measure_from:
+                if echoed is None:
+                    errors += 1
+                else:
+                    local_latencies.append(t1 - t0)
+                    calls += 1
+                    messages += echoed
+            if idle_gap:
+                # Leave the channel idle between calls, as a workflow does between prompts
+                time.sleep(idle_gap)
+        with lock:
+            latencies.extend(local_latencies)
+            totals["calls"] += calls
+            totals["messages"] += messages
+            totals["errors"] += errors
+            totals["all_messages"] += all_messages
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if hasattr(send, "close"):
+        send.close()
+    if crashes:
+        raise RuntimeError(f"{mode} scenario failed: {crashes[0]!r}") from crashes[0]
+
+    latencies.sort()
+    to_ms = lambda value: None if value is None else round(value * 1000, 3)
+    result = {
+        "mode": mode,
+        "concurrency": concurrency,
+        "message_size": message_size,
+        "compression": compression,
+        "payload": payload,
+        "batch_size": batch_size if mode == "batch" else 1,
+        "idle_gap_s": idle_gap,
+        "duration_s": duration,
+        "calls": totals["calls"],
+        "messages": totals["messages"],
+        "errors": totals["errors"],
+        "calls_per_s": round(totals["calls"] / duration, 1),
+        "messages_per_s": round(totals["messages"] / duration, 1),
+        "latency_ms": {
+            "p50": to_ms(percentile(latencies, 50)),
+            "p95": to_ms(percentile(latencies, 95)),
+            "p99": to_ms(percentile(latencies, 99)),
+            "max": to_ms(latencies[-1] if latencies else None),
+        },
+    }
+    if proxy:
+        # TCP connections opened by the channel during the scenario, i.e. reconnects
+        result["new_connections"] = proxy.connections - connections_before
+    if proxy and totals["all_messages"]:
+        # Covers warmup calls too, so divide by every message echoed
+        sent, received = (after - before for after, before in zip(proxy.counts(), wire_before))
+        result["wire_bytes_per_message"] = {
+            "sent": round(sent / totals["all_messages"]),
+            "received": round(received / totals["all_messages"]),
+        }
+    return result
+
+
+def scenario_key(result):
+    # Reports from before compression, payload kinds and idle gaps were added used the defaults
+    return (result["mode"], result["transport"], result["concurrency"], result["message_size"],
+            result.get("compression", "none"), result.get("payload", "repeat"), result.get("idle_gap_s", 0.0))
+
+
+def find_regressions(results, baseline, max_regression):
+    """Compare against a previous report; returns human-readable regression descriptions."""
+    previous = {scenario_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get(scenario_key(result))
+        if before is None:
+            continue
+        name = "/".join(str(part) for part in scenario_key(result))
+        if result["messages_per_s"] < before["messages_per_s"] * (1 - max_regression):
+            regressions.append(
+                f"{name}: throughput {result['messages_per_s']} msg/s vs {before['messages_per_s']} msg/s"
+            )
+        p99, p99_before = result["latency_ms"]["p99"], before["latency_ms"]["p99"]
+        if p99 is not None and p99_before is not None and p99 > p99_before * (1 + max_regression):
+            regressions.append(f"{name}: p99 {p99} ms vs {p99_before} ms")
+    return regressions
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the gRPC echo client and server.")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--transports", nargs="+", choices=TRANSPORTS, default=list(TRANSPORTS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8],
+                        help="Client threads per scenario (default: 1 8)")
+    parser.add_argument("--message-sizes", nargs="+", type=int, default=[64, 4096],
+                        help="Payload sizes in bytes (default: 64 4096)")
+    parser.add_argument("--compressions", nargs="+", choices=list(COMPRESSION), default=["none"],
+                        help="Per-call compression to compare (default: none)")
+    parser.add_argument("--payload", choices=PAYLOADS, default="repeat",
+                        help="Payload content: one repeated letter, word-like text or random letters "
+                             "(default: repeat)")
+    parser.add_argument("--count-bytes", action="store_true",
+                        help="Route calls through a local proxy and report wire bytes per message")
+    parser.add_argument("--idle-gap", type=float, default=0.0,
+                        help="Seconds each client thread waits between calls (default: 0)")
+    parser.add_argument("--proxy-idle-timeout", type=float,
+                        help="Route calls through a local proxy that resets connections idle this many seconds")
+    parser.add_argument("--channel-arg", action="append", default=[], dest="channel_args", type=parse_channel_arg,
+                        help="Client channel option NAME=VALUE, e.g. --channel-arg=grpc.keepalive_time_ms=1000 "
+                             "(repeatable)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Messages per EchoMany call (default: 64)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Measured seconds per scenario (default: 5)")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Unmeasured seconds per scenario (default: 1)")
+    parser.add_argument("--server-arg", action="append", default=[], dest="server_args",
+                        help="Extra argument for echo_server.py, e.g. --server-arg=--aio (repeatable)")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", type=Path, help="Previous JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed relative throughput/p99 regression vs --baseline (default: 0.2)")
+    return parser
+
+
+def bench(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        certs_dir = Path(tmp)
+        transports = list(args.transports)
+        if {"tls", "uds"} & set(transports) and not generate_certs(certs_dir):
+            print("Warning: openssl not found, skipping TLS and UDS scenarios.", file=sys.stderr)
+            transports = [t for t in transports if t not in ("tls", "uds")]
+        if "uds" in transports and os.name == "nt":
+            print("Warning: Unix domain sockets are not supported here, skipping UDS scenarios.", file=sys.stderr)
+            transports.remove("uds")
+
+        for transport in transports:
+            with running_server(transport, certs_dir, args.server_args) as port:
+                # The proxy forwards TCP, so it cannot sit in front of the socket
+                use_proxy = (args.count_bytes or args.proxy_idle_timeout) and transport != "uds"
+                proxy = ByteCountingProxy(port, args.proxy_idle_timeout) if use_proxy else None
+                channel = make_channel(proxy.port if proxy else port, transport, certs_dir, args.channel_args)
+                # Watch connectivity as grpc_channel_pool does for the node's long-lived
+                # channels; the polling this adds is what answers keepalive pings while idle
+                channel.subscribe(lambda state: None, try_to_connect=True)
+                for mode in args.modes:
+                    for concurrency in args.concurrency:
+                        for message_size in args.message_sizes:
+                            for compression in args.compressions:
+                                print(f"Running {mode}/{transport} concurrency={concurrency} "
+                                      f"size={message_size} compression={compression}...", file=sys.stderr)
+                                result = run_scenario(mode, channel, concurrency, message_size,
+                                                      args.duration, args.warmup, args.batch_size,
+                                                      compression, args.payload, proxy, args.idle_gap)
+                                result["transport"] = transport
+                                results.append(result)
+                channel.close()
+                if proxy:
+                    proxy.close()
+
+    report = {
+        "python": sys.version.split()[0],
+        "grpc": grpc.__version__,
+        "platform": sys.platform,
+        "cpu_count": os.cpu_count(),
+        "server_args": args.server_args,
+        "channel_args": dict(args.channel_args),
+        "proxy_idle_timeout_s": args.proxy_idle_timeout,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+
+    # A scenario whose every call failed has no throughput to compare, but is still a failure
+    failed = [f"{r['mode']}/{r['transport']} concurrency={r['concurrency']} size={r['message_size']} "
+              f"compression={r['compression']}" for r in results if not r["calls"]]
+    for scenario in failed:
+        print(f"No calls completed: {scenario}", file=sys.stderr)
+    regressions = []
+    if args.baseline:
+        regressions = find_regressions(results, json.loads(args.baseline.read_text()), args.max_regression)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    bench()
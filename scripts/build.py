@@ -39,6 +39,17 @@ def build():
     to_copy = [
         "__init__.py",
         "grpc_echo_node.py",
+        "grpc_echo_client.py",
+        "grpc_channel_pool.py",
+        "grpc_balancer.py",
+        "grpc_credentials.py",
+        "grpc_readiness.py",
+        "grpc_stream_session.py",
+        "grpc_metrics.py",
+        "grpc_response_cache.py",
+        "grpc_server_supervisor.py",
+        "grpc_tensor.py",
+        "grpc_tracing.py",
         "LICENSE",
         "README.md",
         "VERSION",
@@ -56,7 +67,10 @@ def build():
         "node_modules", 
         ".git",
         "build",
-        ".pytest_cache"
+        ".pytest_cache",
+        # Local server logs and TLS keys must not ship in a release
+        "logs",
+        "certs"
     )
     
     for item in to_copy:
@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+root_dir = Path(__file__).parent.parent
+
+# Loads the package the way ComfyUI's load_custom_node does, in a fresh interpreter.
+# aiohttp is imported first because ComfyUI has always loaded it by then.
+LOADER = """
+import importlib.util, json, sys, time
+import aiohttp.web
+
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location(
+    "comfyui_grpc_client_node", {init!r}, submodule_search_locations=[{root!r}])
+module = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "nodes": len(module.NODE_CLASS_MAPPINGS),
+    "grpc_loaded": "grpc" in sys.modules,
+}}))
+"""
+
+
+def measure_once(extra_args=()):
+    code = LOADER.format(init=str(root_dir / "__init__.py"), root=str(root_dir))
+    # Never spawn the echo server while measuring
+    env = dict(os.environ, COMFYUI_GRPC_AUTOSTART="0")
+    result = subprocess.run(
+        [sys.executable, *extra_args, "-c", code],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(importtime_output, limit, preloaded="aiohttp.web"):
+    """Parse `-X importtime` output into the slowest imports made by the custom node.
+
+    Modules are reported as they finish loading, so everything up to and
+    including ``preloaded`` was imported before the package itself.
+    """
+    rows = []
+    for line in importtime_output.splitlines():
+        # Lines look like "import time:  <self us> | <cumulative us> | <module>"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if name.strip() == preloaded:
+            rows = []
+            continue
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Measure how long ComfyUI takes to load this custom node.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure (default: 5)")
+    parser.add_argument("--budget-ms", type=float,
+                        help="Exit with status 1 if the median load time exceeds this many milliseconds")
+    parser.add_argument("--top", type=int, default=0,
+                        help="Also list the N slowest imports from one `-X importtime` run")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    samples = [measure_once()[0] for _ in range(args.runs)]
+    times_ms = sorted(sample["seconds"] * 1000 for sample in samples)
+    median_ms = statistics.median(times_ms)
+
+    print(f"Custom node load time over {args.runs} runs: median {median_ms:.1f} ms, "
+          f"min {times_ms[0]:.1f} ms, max {times_ms[-1]:.1f} ms")
+    print(f"Nodes registered: {samples[0]['nodes']}, grpc imported at load: {samples[0]['grpc_loaded']}")
+
+    if args.top:
+        _, stderr = measure_once(("-X", "importtime"))
+        print("Slowest imports (cumulative):")
+        for cumulative_us, name in slowest_imports(stderr, args.top):
+            print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    if args.budget_ms is not None and median_ms > args.budget_ms:
+        print(f"Load time {median_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget.", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""Admission control for the echo server.
+
+Echo calls are rejected with RESOURCE_EXHAUSTED instead of queueing without
+bound when the server is overloaded:
+
+- at most max_queue calls wait for a handler. On the threaded server these
+  are calls waiting for a worker thread (AdmissionThreadPool counts them);
+  on grpc.aio, calls waiting for one of max_in_flight unary handler slots.
+  Calls beyond that are rejected right away;
+- a call that waited longer than max_queue_wait before its handler could
+  start is rejected, since its client is probably about to give up on it;
+- each client gets a token bucket of rate calls per second, keyed on its
+  address or on a metadata value.
+
+Rejections carry a grpc-retry-pushback-ms trailer, the standard gRPC hint for
+how long to wait before retrying, and say the same in their details.
+Health checks and reflection are never rejected. Streams are checked when
+they open but do not hold an in-flight slot, since a stream session stays
+open across many node executions.
+"""
+import asyncio
+import collections
+import inspect
+import threading
+import time
+
+from concurrent import futures
+
+import grpc
+
+from echo_metrics import Counter, MetricsRegistry
+
+# Only calls to the Echo service are admitted; health checks always get through.
+ADMITTED_SERVICE_PREFIX = "/echo.Echo/"
+
+# Retry hint for rejections without a better estimate, in seconds.
+DEFAULT_RETRY_AFTER = 0.1
+
+# Token buckets kept for distinct clients; the least recently seen are dropped.
+MAX_TRACKED_CLIENTS = 10000
+
+RETRY_PUSHBACK_KEY = "grpc-retry-pushback-ms"
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Server overloaded ({reason}), retry after {round(retry_after * 1000)} ms.")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows rate calls per second on average and bursts of up to burst calls."""
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        """Take a token; returns 0 if one was available, else seconds until one is."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def peer_host(peer):
+    """Strip the port from a gRPC peer string, so all connections of a host share a key."""
+    if peer.startswith(("ipv4:", "ipv6:")):
+        return peer.rsplit(":", 1)[0]
+    return peer
+
+
+class AdmissionController:
+    """Admission settings plus the per-client rate limit state.
+
+    client_key is "peer" or "metadata:NAME"; calls without that metadata
+    fall back to their peer address. Rejections are counted by reason in
+    registry, if given.
+    """
+
+    def __init__(self, max_in_flight=None, max_queue=None, max_queue_wait=None, rate=None, burst=None,
+                 client_key="peer", prefix="echo_server", registry=None):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.rate = rate
+        self.burst = burst or max(1.0, rate or 0)
+        self.metadata_key = client_key.split(":", 1)[1].lower() if client_key.startswith("metadata:") else None
+        self.rejected = (registry or MetricsRegistry()).register(Counter(
+            f"{prefix}_admission_rejected_total", "Calls rejected by admission control, by reason.", ("reason",)))
+        self._lock = threading.Lock()
+        self._buckets = collections.OrderedDict()
+
+    @property
+    def retry_after(self):
+        """Retry hint for calls rejected because the server is busy."""
+        return self.max_queue_wait or DEFAULT_RETRY_AFTER
+
+    def client_key(self, context):
+        if self.metadata_key is not None:
+            for key, value in context.invocation_metadata() or ():
+                if key == self.metadata_key:
+                    return value
+        return peer_host(context.peer())
+
+    def check(self, context, waited):
+        """Raise Rejected if the call waited too long or its client is over its rate."""
+        if self.max_queue_wait is not None and waited > self.max_queue_wait:
+            raise self.reject("queue_timeout", self.retry_after)
+        if self.rate is None:
+            return
+        key = self.client_key(context)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+                if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            wait = bucket.take(now)
+        if wait:
+            raise self.reject("rate_limited", wait)
+
+    def queue_timeout(self, waited):
+        """Seconds a call that already waited may still wait for a slot; None waits indefinitely."""
+        if self.max_queue_wait is None:
+            return None
+        return max(0.0, self.max_queue_wait - waited)
+
+    def reject(self, reason, retry_after):
+        self.rejected.inc(reason)
+        return Rejected(reason, retry_after)
+
+
+class AdmissionThreadPool(futures.ThreadPoolExecutor):
+    """Thread pool for the threaded server that counts the work handed to it.
+
+    Every call handed to the pool runs, if only to find it was cancelled,
+    so the counts cannot drift.
+    """
+
+    def __init__(self, max_workers):
+        super().__init__(max_workers)
+        self.max_workers = max_workers
+        self.backlog = 0
+        self.active = 0
+        self._count_lock = threading.Lock()
+
+    def full(self, max_queue):
+        """Whether one more call would find every worker busy and max_queue calls already waiting."""
+        return self.backlog + self.active >= self.max_workers + max_queue
+
+    def submit(self, fn, /, *args, **kwargs):
+        def run():
+            with self._count_lock:
+                self.backlog -= 1
+                self.active += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._count_lock:
+                    self.active -= 1
+
+        with self._count_lock:
+            self.backlog += 1
+        try:
+            return super().submit(run)
+        except BaseException:
+            with self._count_lock:
+                self.backlog -= 1
+            raise
+
+
+class AsyncConcurrencyLimiter:
+    """At most max_in_flight holders at once, with up to max_queue tasks waiting.
+
+    A released slot goes to the longest waiter.
+    """
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.in_flight = 0
+        self._waiters = collections.deque()
+
+    async def acquire(self, timeout):
+        controller = self.controller
+        if self.in_flight < controller.max_in_flight:
+            self.in_flight += 1
+            return
+        if controller.max_queue is not None and len(self._waiters) >= controller.max_queue:
+            raise controller.reject("queue_full", controller.retry_after)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # The slot was handed over just as the wait timed out
+                return
+            waiter.cancel()
+            raise controller.reject("queue_timeout", controller.retry_after)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes to the waiter; in_flight stays the same
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+def _reject_metadata(rejected):
+    return ((RETRY_PUSHBACK_KEY, str(max(1, round(rejected.retry_after * 1000)))),)
+
+
+def _reject(context, rejected):
+    context.set_trailing_metadata(_reject_metadata(rejected))
+    context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(rejected))
+
+
+class AdmissionServerInterceptor(grpc.ServerInterceptor):
+    """Apply an AdmissionController to Echo calls on the threaded server.
+
+    thread_pool is the server's AdmissionThreadPool; at most max_queue calls
+    may wait in it for a worker. Calls rejected for that are answered from a
+    thread of their own instead of waiting behind the others.
+    """
+
+    def __init__(self, controller, thread_pool=None):
+        self.controller = controller
+        self.thread_pool = thread_pool
+        self._reject_pool = futures.ThreadPoolExecutor(1, thread_name_prefix="echo-admission")
+
+    def _rejecting_handler(self, handler, rejected):
+        def reject(request_or_iterator, context):
+            _reject(context, rejected)
+
+        reject.experimental_thread_pool = self._reject_pool
+        method_handler = grpc.unary_unary_rpc_method_handler if handler.unary_unary else grpc.stream_stream_rpc_method_handler
+        return method_handler(
+            reject,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer,
+        )
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or not handler_call_details.method.startswith(ADMITTED_SERVICE_PREFIX):
+            return handler
+        # Runs on the server's polling thread, before the call waits for a worker
+        queued_at = time.monotonic()
+        controller = self.controller
+        if (controller.max_queue is not None and self.thread_pool is not None
+                and self.thread_pool.full(controller.max_queue)):
+            return self._rejecting_handler(handler, controller.reject("queue_full", controller.retry_after))
+
+        if handler.unary_unary:
+            behavior = handler.unary_unary
+
+            def unary_unary(request, context):
+                try:
+                    controller.check(context, time.monotonic() - queued_at)
+                except Rejected as rejected:
+                    _reject(context, rejected)
+                return behavior(request, context)
+
+            return grpc.unary_unary_rpc_method_handler(
+                unary_unary,
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+
+        if handler.stream_stream:
+            behavior = handler.stream_stream
+
+            def stream_stream(request_iterator, context):
+                try:
+                    controller.check(context, time.monotonic() - queued_at)
+                except Rejected as rejected:
+                    _reject(context, rejected)
+                yield from behavior(request_iterator, context)
+
+            return grpc.stream_stream_rpc_method_handler(
+                stream_stream,
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+
+        return handler
+
+
+class AioAdmissionServerInterceptor(grpc.aio.ServerInterceptor):
+    """grpc.aio counterpart of AdmissionServerInterceptor."""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.limiter = AsyncConcurrencyLimiter(controller) if controller.max_in_flight else None
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None or not handler_call_details.method.startswith(ADMITTED_SERVICE_PREFIX):
+            return handler
+        queued_at = time.monotonic()
+        controller, limiter = self.controller, self.limiter
+
+        async def reject(context, rejected):
+            context.set_trailing_metadata(_reject_metadata(rejected))
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(rejected))
+
+        if handler.unary_unary:
+            behavior = handler.unary_unary
+
+            async def unary_unary(request, context):
+                waited = time.monotonic() - queued_at
+                try:
+                    controller.check(context, waited)
+                    if limiter is not None:
+                        await limiter.acquire(controller.queue_timeout(waited))
+                except Rejected as rejected:
+                    await reject(context, rejected)
+                try:
+                    response = behavior(request, context)
+                    if inspect.isawaitable(response):
+                        response = await response
+                    return response
+                finally:
+                    if limiter is not None:
+                        limiter.release()
+
+            return grpc.unary_unary_rpc_method_handler(
+                unary_unary,
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+
+        if handler.stream_stream:
+            behavior = handler.stream_stream
+
+            async def stream_stream(request_iterator, context):
+                try:
+                    controller.check(context, time.monotonic() - queued_at)
+                except Rejected as rejected:
+                    await reject(context, rejected)
+                async for response in behavior(request_iterator, context):
+                    yield response
+
+            return grpc.stream_stream_rpc_method_handler(
+                stream_stream,
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+
+        return handler
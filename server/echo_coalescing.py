@@ -0,0 +1,249 @@
+"""Request coalescing for the echo server.
+
+A Coalescer sits in front of a batch handler, a function taking a list of
+requests and returning one reply per request. Identical requests in flight
+at the same time share one computation (single-flight), and with a batch
+window, requests arriving within it are handed to the handler together
+(micro-batching). Replies handed to coalesced callers are shared and must
+not be modified.
+
+Coalescer is used by the threaded server, AsyncCoalescer by grpc.aio.
+"""
+import asyncio
+import threading
+from concurrent import futures
+
+from echo_metrics import Counter, Histogram, MetricsRegistry
+
+# Longest a request waits for others to join its micro-batch, by default.
+DEFAULT_BATCH_WINDOW = 0.002
+
+DEFAULT_MAX_BATCH_SIZE = 32
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class CoalescingMetrics:
+    """Counts of requests taken in and handler invocations made for them."""
+
+    def __init__(self, prefix="echo_server", registry=None):
+        self.registry = registry or MetricsRegistry()
+        self.requests = self.registry.register(Counter(
+            f"{prefix}_coalescing_requests_total", "Requests passed to the coalescing layer."))
+        self.coalesced = self.registry.register(Counter(
+            f"{prefix}_coalesced_requests_total", "Requests answered by an identical in-flight request."))
+        self.computations = self.registry.register(Counter(
+            f"{prefix}_coalescing_batches_total", "Batch handler invocations."))
+        self.batch_size = self.registry.register(Histogram(
+            f"{prefix}_coalescing_batch_size", "Requests per batch handler invocation.",
+            buckets=BATCH_SIZE_BUCKETS))
+
+    def coalesce_ratio(self):
+        """Requests per handler invocation; 1.0 means nothing was coalesced."""
+        computations = self.computations.value()
+        return self.requests.value() / computations if computations else 1.0
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Return (result of fn(), whether another caller's call was shared)."""
+        with self._lock:
+            future = self._calls.get(key)
+            shared = future is not None
+            if not shared:
+                future = self._calls[key] = futures.Future()
+        if shared:
+            return future.result(), True
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class MicroBatcher:
+    """Groups items submitted within window seconds into one handle_batch call.
+
+    The first caller of a batch waits out the window (or until the batch is
+    full) and then runs handle_batch on its own thread for everyone.
+    """
+
+    def __init__(self, handle_batch, window=DEFAULT_BATCH_WINDOW, max_size=DEFAULT_MAX_BATCH_SIZE):
+        self.handle_batch = handle_batch
+        self.window = window
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._pending = None
+
+    def submit(self, item):
+        future = futures.Future()
+        with self._lock:
+            batch = self._pending
+            leader = batch is None
+            if leader:
+                batch = self._pending = _Batch()
+            batch.add(item, future)
+            if len(batch.items) >= self.max_size:
+                self._pending = None
+                batch.full.set()
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._pending is batch:
+                    self._pending = None
+            batch.run(self.handle_batch)
+        return future.result()
+
+
+class _Batch:
+    def __init__(self):
+        self.items = []
+        self.futures = []
+        self.full = threading.Event()
+
+    def add(self, item, future):
+        self.items.append(item)
+        self.futures.append(future)
+
+    def run(self, handle_batch):
+        try:
+            results = handle_batch(self.items)
+        except Exception as e:
+            results = [e] * len(self.items)
+            failed = True
+        else:
+            failed = False
+        for future, result in zip(self.futures, results):
+            if future.done():
+                # Its asyncio caller was cancelled
+                continue
+            if failed:
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class Coalescer:
+    """Single-flight and optional micro-batching in front of handle_batch.
+
+    key(request) must be equal for requests that get the same reply.
+    batch_window is in seconds; 0 runs each computation on its own.
+    """
+
+    single_flight_class = SingleFlight
+    batcher_class = MicroBatcher
+
+    def __init__(self, handle_batch, key, single_flight=True, batch_window=0.0,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE, metrics=None):
+        self.handle_batch = handle_batch
+        self.key = key
+        self.metrics = metrics or CoalescingMetrics()
+        self._single_flight = self.single_flight_class() if single_flight else None
+        self._batcher = None
+        if batch_window > 0:
+            self._batcher = self.batcher_class(self._handle, batch_window, max_batch_size)
+
+    def _handle(self, requests):
+        self.metrics.computations.inc()
+        self.metrics.batch_size.observe(len(requests))
+        return self.handle_batch(requests)
+
+    def _compute(self, request):
+        if self._batcher is not None:
+            return self._batcher.submit(request)
+        return self._handle([request])[0]
+
+    def submit(self, request):
+        self.metrics.requests.inc()
+        if self._single_flight is None:
+            return self._compute(request)
+        reply, shared = self._single_flight.do(self.key(request), lambda: self._compute(request))
+        if shared:
+            self.metrics.coalesced.inc()
+        return reply
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight.
+
+    The call runs as its own task, so a caller being cancelled does not
+    cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn):
+        """Return (result of await fn(), whether another caller's call was shared)."""
+        task = self._calls.get(key)
+        shared = task is not None
+        if not shared:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key, task):
+        del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved in case every caller was cancelled
+            task.exception()
+
+
+class AsyncMicroBatcher:
+    """asyncio counterpart of MicroBatcher; handle_batch runs on the event loop."""
+
+    def __init__(self, handle_batch, window=DEFAULT_BATCH_WINDOW, max_size=DEFAULT_MAX_BATCH_SIZE):
+        self.handle_batch = handle_batch
+        self.window = window
+        self.max_size = max_size
+        self._pending = None
+        self._timer = None
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        if self._pending is None:
+            self._pending = _Batch()
+            self._timer = loop.call_later(self.window, self._flush)
+        future = loop.create_future()
+        self._pending.add(item, future)
+        if len(self._pending.items) >= self.max_size:
+            self._timer.cancel()
+            self._flush()
+        return await future
+
+    def _flush(self):
+        batch, self._pending = self._pending, None
+        batch.run(self.handle_batch)
+
+
+class AsyncCoalescer(Coalescer):
+    """Coalescer for the grpc.aio server; submit() is a coroutine."""
+
+    single_flight_class = AsyncSingleFlight
+    batcher_class = AsyncMicroBatcher
+
+    async def _compute(self, request):
+        if self._batcher is not None:
+            return await self._batcher.submit(request)
+        return self._handle([request])[0]
+
+    async def submit(self, request):
+        self.metrics.requests.inc()
+        if self._single_flight is None:
+            return await self._compute(request)
+        reply, shared = await self._single_flight.do(self.key(request), lambda: self._compute(request))
+        if shared:
+            self.metrics.coalesced.inc()
+        return reply
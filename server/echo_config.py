@@ -0,0 +1,119 @@
+"""Server settings from a config file and environment variables.
+
+Every echo_server.py flag can also be set as COMFYUI_GRPC_SERVER_<FLAG>
+(e.g. COMFYUI_GRPC_SERVER_MAX_WORKERS=8) or as a key of a JSON or TOML
+config file given by --config or COMFYUI_GRPC_SERVER_CONFIG (e.g.
+max-workers = 8). Command-line flags take precedence over environment
+variables, which take precedence over the file.
+
+Only the standard library is used, so the ComfyUI-side launcher can read
+the same settings, such as the port, without the server's dependencies.
+"""
+import json
+import os
+
+ENV_PREFIX = "COMFYUI_GRPC_SERVER_"
+
+DEFAULT_PORT = 50051
+
+TRUE_VALUES = {"1", "true", "yes", "on"}
+FALSE_VALUES = {"0", "false", "no", "off"}
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def setting_name(key):
+    """Normalize a flag, file key or environment suffix to the argparse dest it sets."""
+    return key.lstrip("-").replace("-", "_").lower()
+
+
+def env_settings(environ=None):
+    """Settings given as COMFYUI_GRPC_SERVER_* environment variables, as strings."""
+    environ = os.environ if environ is None else environ
+    return {
+        setting_name(name[len(ENV_PREFIX):]): value
+        for name, value in environ.items()
+        if name.startswith(ENV_PREFIX) and value != ""
+    }
+
+
+def read_config_file(path):
+    """Read settings from a TOML file (by its .toml suffix) or a JSON file."""
+    try:
+        if str(path).endswith(".toml"):
+            import tomllib  # Python 3.11+
+            with open(path, "rb") as f:
+                values = tomllib.load(f)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                values = json.load(f)
+    except ImportError:
+        raise ConfigError(f"{path}: TOML config files need Python 3.11 or later, use JSON instead")
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"{path}: {e}")
+    if not isinstance(values, dict):
+        raise ConfigError(f"{path}: expected a table of settings")
+    return {setting_name(key): value for key, value in values.items()}
+
+
+def read_settings(config_path=None, environ=None):
+    """Merge the config file's settings with those from the environment, which win.
+
+    config_path defaults to COMFYUI_GRPC_SERVER_CONFIG.
+    """
+    env = env_settings(environ)
+    config_path = config_path or env.pop("config", None)
+    env.pop("config", None)
+    settings = read_config_file(config_path) if config_path else {}
+    settings.update(env)
+    return settings
+
+
+def config_port(settings):
+    """The port the settings ask for; 0 lets the server pick a free one."""
+    try:
+        return int(settings.get("port", DEFAULT_PORT))
+    except (TypeError, ValueError):
+        raise ConfigError(f"port must be a number, got {settings['port']!r}")
+
+
+def config_workers(settings):
+    """The number of server processes the settings ask for."""
+    try:
+        return int(settings.get("workers", 1))
+    except (TypeError, ValueError):
+        raise ConfigError(f"workers must be a number, got {settings['workers']!r}")
+
+
+def _convert(action, value):
+    if action.nargs == 0:
+        # A store_true/store_false flag
+        if isinstance(value, str):
+            if value.lower() not in TRUE_VALUES | FALSE_VALUES:
+                raise ValueError(f"expected true or false, got {value!r}")
+            value = value.lower() in TRUE_VALUES
+        return bool(value) == bool(action.const)
+    if action.type is not None:
+        value = action.type(value)
+    elif not isinstance(value, str):
+        raise ValueError(f"expected a string, got {value!r}")
+    if action.choices is not None and value not in action.choices:
+        raise ValueError(f"{value!r} is not one of {', '.join(map(str, action.choices))}")
+    return value
+
+
+def apply_settings(parser, settings):
+    """Make settings the defaults of parser, so flags given on the command line still win."""
+    actions = {action.dest: action for action in parser._actions if action.option_strings}
+    defaults = {}
+    for key, value in settings.items():
+        action = actions.get(key)
+        if action is None or key in ("help", "config"):
+            raise ConfigError(f"unknown setting {key!r}")
+        try:
+            defaults[key] = _convert(action, value)
+        except (TypeError, ValueError) as e:
+            raise ConfigError(f"setting {key!r}: {e}")
+    parser.set_defaults(**defaults)
@@ -0,0 +1,123 @@
+"""Structured logging for the echo server.
+
+Records are handed to a queue and written as JSON lines by a background
+thread, so an RPC handler never waits on stdout. Per-request logs are
+DEBUG records, sampled by RequestLog; at the default INFO level they cost
+a level check and nothing else.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from datetime import datetime
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+# Fraction of per-request DEBUG records that are written.
+DEFAULT_SAMPLE_RATE = 0.01
+
+# Records waiting to be written; beyond this they are dropped rather than blocking.
+MAX_QUEUED_RECORDS = 10000
+
+logger = logging.getLogger("echo")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `fields` passed as `extra` merged in."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "pid": record.process,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records when the writer falls behind."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The listener runs in this process, so the record need not be made
+        # picklable; formatting is left to the listener thread.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestLog:
+    """Sampled per-request DEBUG logging."""
+
+    def __init__(self, name="echo.requests", sample_rate=DEFAULT_SAMPLE_RATE):
+        self._logger = logging.getLogger(name)
+        self.sample_rate = sample_rate
+
+    def log(self, event, **fields):
+        if not self._logger.isEnabledFor(logging.DEBUG):
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self._logger.debug(event, extra={"fields": fields})
+
+    def traced(self, event, trace_id, **fields):
+        """Log a request the client asked to trace; never sampled out, and at INFO."""
+        self._logger.info(event, extra={"fields": {"trace_id": trace_id, **fields}})
+
+
+request_log = RequestLog()
+
+_listener = None
+
+
+def configure_logging(level="INFO", sample_rate=DEFAULT_SAMPLE_RATE, stream=None):
+    """Send the server's logs as JSON lines to stream (default stdout) through a queue.
+
+    Returns the DroppingQueueHandler, whose `dropped` counts records lost to
+    a full queue.
+    """
+    global _listener
+    stop_logging()
+
+    log_queue = queue.Queue(MAX_QUEUED_RECORDS)
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, writer)
+    _listener.start()
+
+    handler = DroppingQueueHandler(log_queue)
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    request_log.sample_rate = sample_rate
+    return handler
+
+
+def stop_logging():
+    """Write out queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except queue.Full:
+            # No room for the stop sentinel; the daemon writer thread ends with the process
+            pass
+        _listener = None
+
+
+atexit.register(stop_logging)
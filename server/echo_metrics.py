@@ -0,0 +1,295 @@
+"""Prometheus-style metrics for the echo service, shared by server and client.
+
+Only the standard library and grpc are used, so the ComfyUI client can import
+this module from the server directory the same way it imports echo_pb2.
+"""
+import asyncio
+import bisect
+import inspect
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import grpc
+
+# Latency buckets in seconds, tuned for loopback and LAN round trips.
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._values = {}
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *label_values):
+        with self._lock:
+            series = self._values.get(label_values)
+            return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        for label_values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, label_values, (("le", bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class RpcMetrics:
+    """The per-RPC series recorded by both the server and client interceptors."""
+
+    def __init__(self, prefix, registry=None):
+        self.registry = registry or MetricsRegistry()
+        self.requests = self.registry.register(Counter(
+            f"{prefix}_requests_total", "RPCs completed, by method and status code.", ("method", "code")))
+        self.duration = self.registry.register(Histogram(
+            f"{prefix}_request_duration_seconds", "RPC latency in seconds.", ("method",)))
+        self.request_bytes = self.registry.register(Counter(
+            f"{prefix}_request_bytes_total", "Serialized request payload bytes.", ("method",)))
+        self.response_bytes = self.registry.register(Counter(
+            f"{prefix}_response_bytes_total", "Serialized response payload bytes.", ("method",)))
+
+    def observe(self, method, code, seconds, request_bytes=0, response_bytes=0):
+        self.requests.inc(method, code.name)
+        self.duration.observe(seconds, method)
+        if request_bytes:
+            self.request_bytes.inc(method, amount=request_bytes)
+        if response_bytes:
+            self.response_bytes.inc(method, amount=response_bytes)
+
+    def render(self):
+        return self.registry.render()
+
+
+def _message_size(message):
+    byte_size = getattr(message, "ByteSize", None)
+    return byte_size() if byte_size else 0
+
+
+def _final_code(context, default):
+    # Handlers report errors via context.set_code() as well as by raising
+    code = context.code()
+    return code if isinstance(code, grpc.StatusCode) else default
+
+
+class MetricsServerInterceptor(grpc.ServerInterceptor):
+    """Record count, status, payload size and latency for unary and bidi RPCs."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = handler_call_details.method
+        metrics = self.metrics
+
+        if handler.unary_unary:
+            behavior = handler.unary_unary
+
+            def unary_unary(request, context):
+                start = time.perf_counter()
+                default, response = grpc.StatusCode.UNKNOWN, None
+                try:
+                    response = behavior(request, context)
+                    default = grpc.StatusCode.OK
+                    return response
+                finally:
+                    metrics.observe(method, _final_code(context, default), time.perf_counter() - start,
+                                    _message_size(request), _message_size(response))
+
+            return grpc.unary_unary_rpc_method_handler(
+                unary_unary,
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+
+        if handler.stream_stream:
+            behavior = handler.stream_stream
+
+            def stream_stream(request_iterator, context):
+                start = time.perf_counter()
+                default = grpc.StatusCode.UNKNOWN
+                try:
+                    yield from behavior(request_iterator, context)
+                    default = grpc.StatusCode.OK
+                except GeneratorExit:
+                    default = grpc.StatusCode.CANCELLED
+                    raise
+                finally:
+                    metrics.observe(method, _final_code(context, default), time.perf_counter() - start)
+
+            return grpc.stream_stream_rpc_method_handler(
+                stream_stream,
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+
+        return handler
+
+
+class AioMetricsServerInterceptor(grpc.aio.ServerInterceptor):
+    """grpc.aio counterpart of MetricsServerInterceptor."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = handler_call_details.method
+        metrics = self.metrics
+
+        if handler.unary_unary:
+            behavior = handler.unary_unary
+
+            async def unary_unary(request, context):
+                start = time.perf_counter()
+                default, response = grpc.StatusCode.UNKNOWN, None
+                try:
+                    response = behavior(request, context)
+                    if inspect.isawaitable(response):
+                        response = await response
+                    default = grpc.StatusCode.OK
+                    return response
+                finally:
+                    metrics.observe(method, _final_code(context, default), time.perf_counter() - start,
+                                    _message_size(request), _message_size(response))
+
+            return grpc.unary_unary_rpc_method_handler(
+                unary_unary,
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+
+        if handler.stream_stream and inspect.isasyncgenfunction(handler.stream_stream):
+            behavior = handler.stream_stream
+
+            async def stream_stream(request_iterator, context):
+                start = time.perf_counter()
+                default = grpc.StatusCode.UNKNOWN
+                try:
+                    async for response in behavior(request_iterator, context):
+                        yield response
+                    default = grpc.StatusCode.OK
+                except (GeneratorExit, asyncio.CancelledError):
+                    default = grpc.StatusCode.CANCELLED
+                    raise
+                finally:
+                    metrics.observe(method, _final_code(context, default), time.perf_counter() - start)
+
+            return grpc.stream_stream_rpc_method_handler(
+                stream_stream,
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+
+        return handler
+
+
+class _ThreadingHTTPServerV6(ThreadingHTTPServer):
+    address_family = socket.AF_INET6
+
+
+def start_metrics_http_server(metrics, port, host="0.0.0.0"):
+    """Serve metrics.render() at http://host:port/metrics from a daemon thread.
+
+    host may be an IPv6 address, with or without brackets.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes are periodic; keep them out of the server output
+            pass
+
+    host = host.strip("[]")
+    server_class = _ThreadingHTTPServerV6 if ":" in host else ThreadingHTTPServer
+    httpd = server_class((host, port), MetricsHandler)
+    threading.Thread(target=httpd.serve_forever, name="echo-metrics", daemon=True).start()
+    return httpd
@@ -14,7 +14,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\necho.proto\x12\x04\x65\x63ho\"\x1e\n\x0b\x45\x63hoRequest\x12\x0f\n\x07message\x18\x01 \x01(\t\"1\n\tEchoReply\x12\x0f\n\x07message\x18\x01 \x01(\t\x12\x13\n\x0breceived_at\x18\x02 \x01(\t28\n\x04\x45\x63ho\x12\x30\n\x08\x45\x63hoOnce\x12\x11.echo.EchoRequest\x1a\x0f.echo.EchoReply\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\necho.proto\x12\x04\x65\x63ho\"P\n\x0b\x45\x63hoRequest\x12\x0f\n\x07message\x18\x01 \x01(\t\x12\x12\n\nrequest_id\x18\x02 \x01(\t\x12\x1c\n\x06tensor\x18\x03 \x01(\x0b\x32\x0c.echo.Tensor\"O\n\tEchoReply\x12\x0f\n\x07message\x18\x01 \x01(\t\x12\x13\n\x0breceived_at\x18\x02 \x01(\t\x12\x1c\n\x06tensor\x18\x03 \x01(\x0b\x32\x0c.echo.Tensor\"4\n\x06Tensor\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\r\n\x05\x64type\x18\x02 \x01(\t\x12\r\n\x05shape\x18\x03 \x03(\x03\"7\n\x10\x45\x63hoBatchRequest\x12#\n\x08requests\x18\x01 \x03(\x0b\x32\x11.echo.EchoRequest\"N\n\rEchoBatchItem\x12\x1e\n\x05reply\x18\x01 \x01(\x0b\x32\x0f.echo.EchoReply\x12\x0c\n\x04\x63ode\x18\x02 \x01(\x05\x12\x0f\n\x07\x64\x65tails\x18\x03 \x01(\t\"4\n\x0e\x45\x63hoBatchReply\x12\"\n\x05items\x18\x01 \x03(\x0b\x32\x13.echo.EchoBatchItem\"d\n\x0f\x45\x63hoStreamReply\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x1e\n\x05reply\x18\x02 \x01(\x0b\x32\x0f.echo.EchoReply\x12\x0c\n\x04\x63ode\x18\x03 \x01(\x05\x12\x0f\n\x07\x64\x65tails\x18\x04 \x01(\t\"<\n\tEchoChunk\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\x0c\n\x04last\x18\x02 \x01(\x08\x12\x13\n\x0breceived_at\x18\x03 \x01(\t2\xe9\x01\n\x04\x45\x63ho\x12\x30\n\x08\x45\x63hoOnce\x12\x11.echo.EchoRequest\x1a\x0f.echo.EchoReply\"\x00\x12:\n\x08\x45\x63hoMany\x12\x16.echo.EchoBatchRequest\x1a\x14.echo.EchoBatchReply\"\x00\x12<\n\nEchoStream\x12\x11.echo.EchoRequest\x1a\x15.echo.EchoStreamReply\"\x00(\x01\x30\x01\x12\x35\n\x0b\x45\x63hoChunked\x12\x0f.echo.EchoChunk\x1a\x0f.echo.EchoChunk\"\x00(\x01\x30\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -22,9 +22,21 @@ _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'echo_pb2', _globals)
 if _descriptor._USE_C_DESCRIPTORS == False:
   DESCRIPTOR._options = None
   _globals['_ECHOREQUEST']._serialized_start=20
-  _globals['_ECHOREQUEST']._serialized_end=50
-  _globals['_ECHOREPLY']._serialized_start=52
-  _globals['_ECHOREPLY']._serialized_end=101
-  _globals['_ECHO']._serialized_start=103
-  _globals['_ECHO']._serialized_end=159
+  _globals['_ECHOREQUEST']._serialized_end=100
+  _globals['_ECHOREPLY']._serialized_start=102
+  _globals['_ECHOREPLY']._serialized_end=181
+  _globals['_TENSOR']._serialized_start=183
+  _globals['_TENSOR']._serialized_end=235
+  _globals['_ECHOBATCHREQUEST']._serialized_start=237
+  _globals['_ECHOBATCHREQUEST']._serialized_end=292
+  _globals['_ECHOBATCHITEM']._serialized_start=294
+  _globals['_ECHOBATCHITEM']._serialized_end=372
+  _globals['_ECHOBATCHREPLY']._serialized_start=374
+  _globals['_ECHOBATCHREPLY']._serialized_end=426
+  _globals['_ECHOSTREAMREPLY']._serialized_start=428
+  _globals['_ECHOSTREAMREPLY']._serialized_end=528
+  _globals['_ECHOCHUNK']._serialized_start=530
+  _globals['_ECHOCHUNK']._serialized_end=590
+  _globals['_ECHO']._serialized_start=593
+  _globals['_ECHO']._serialized_end=826
 # @@protoc_insertion_point(module_scope)
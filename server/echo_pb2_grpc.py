@@ -20,6 +20,21 @@ class EchoStub(object):
                 request_serializer=echo__pb2.EchoRequest.SerializeToString,
                 response_deserializer=echo__pb2.EchoReply.FromString,
                 )
+        self.EchoMany = channel.unary_unary(
+                '/echo.Echo/EchoMany',
+                request_serializer=echo__pb2.EchoBatchRequest.SerializeToString,
+                response_deserializer=echo__pb2.EchoBatchReply.FromString,
+                )
+        self.EchoStream = channel.stream_stream(
+                '/echo.Echo/EchoStream',
+                request_serializer=echo__pb2.EchoRequest.SerializeToString,
+                response_deserializer=echo__pb2.EchoStreamReply.FromString,
+                )
+        self.EchoChunked = channel.stream_stream(
+                '/echo.Echo/EchoChunked',
+                request_serializer=echo__pb2.EchoChunk.SerializeToString,
+                response_deserializer=echo__pb2.EchoChunk.FromString,
+                )
 
 
 class EchoServicer(object):
@@ -33,6 +48,28 @@ class EchoServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def EchoMany(self, request, context):
+        """Batched call: send many messages in one round trip, get one result per message.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def EchoStream(self, request_iterator, context):
+        """Bidirectional stream: one reply per request, correlated by request_id.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def EchoChunked(self, request_iterator, context):
+        """Chunked transfer for one message larger than the message size limit:
+        the client streams its parts, the server streams the echo back.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_EchoServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -41,6 +78,21 @@ def add_EchoServicer_to_server(servicer, server):
                     request_deserializer=echo__pb2.EchoRequest.FromString,
                     response_serializer=echo__pb2.EchoReply.SerializeToString,
             ),
+            'EchoMany': grpc.unary_unary_rpc_method_handler(
+                    servicer.EchoMany,
+                    request_deserializer=echo__pb2.EchoBatchRequest.FromString,
+                    response_serializer=echo__pb2.EchoBatchReply.SerializeToString,
+            ),
+            'EchoStream': grpc.stream_stream_rpc_method_handler(
+                    servicer.EchoStream,
+                    request_deserializer=echo__pb2.EchoRequest.FromString,
+                    response_serializer=echo__pb2.EchoStreamReply.SerializeToString,
+            ),
+            'EchoChunked': grpc.stream_stream_rpc_method_handler(
+                    servicer.EchoChunked,
+                    request_deserializer=echo__pb2.EchoChunk.FromString,
+                    response_serializer=echo__pb2.EchoChunk.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'echo.Echo', rpc_method_handlers)
@@ -68,3 +120,54 @@ class Echo(object):
             echo__pb2.EchoReply.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def EchoMany(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/echo.Echo/EchoMany',
+            echo__pb2.EchoBatchRequest.SerializeToString,
+            echo__pb2.EchoBatchReply.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def EchoStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/echo.Echo/EchoStream',
+            echo__pb2.EchoRequest.SerializeToString,
+            echo__pb2.EchoStreamReply.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def EchoChunked(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/echo.Echo/EchoChunked',
+            echo__pb2.EchoChunk.SerializeToString,
+            echo__pb2.EchoChunk.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -1,36 +1,334 @@
 import argparse
+import asyncio
+import multiprocessing
 import os
+import signal
+import socket
 import time
 import threading
 import json
 from datetime import datetime
-from concurrent import futures
 from pathlib import Path
 import grpc
 import echo_pb2
 import echo_pb2_grpc
+from echo_admission import (
+    AdmissionController,
+    AdmissionServerInterceptor,
+    AdmissionThreadPool,
+    AioAdmissionServerInterceptor,
+)
+from echo_coalescing import DEFAULT_MAX_BATCH_SIZE, AsyncCoalescer, Coalescer, CoalescingMetrics
+from echo_config import DEFAULT_PORT, ConfigError, apply_settings, read_settings
+from echo_logging import LOG_LEVELS, DEFAULT_SAMPLE_RATE, configure_logging, logger, request_log, stop_logging
+from echo_metrics import (
+    AioMetricsServerInterceptor,
+    MetricsServerInterceptor,
+    RpcMetrics,
+    start_metrics_http_server,
+)
+from grpc_health.v1 import health, health_pb2, health_pb2_grpc
 from grpc_reflection.v1alpha import reflection
 
 
+# Upper bound on requests accepted in a single EchoMany call.
+MAX_BATCH_SIZE = 1000
+
+EMPTY_MESSAGE_DETAILS = "The 'message' field is required and cannot be empty."
+
+# Bytes per element of the dtypes accepted in a Tensor payload.
+TENSOR_ITEM_SIZES = {
+    "bool": 1, "uint8": 1, "int8": 1,
+    "int16": 2, "float16": 2, "bfloat16": 2,
+    "int32": 4, "float32": 4,
+    "int64": 8, "float64": 8,
+}
+
+# Seconds in-flight RPCs get to finish after SIGTERM before being cancelled.
+DRAIN_GRACE_SECONDS = 5.0
+
+# Extra time a draining server gets to exit before monitor_parent forces it.
+FORCED_EXIT_MARGIN_SECONDS = 5.0
+
+# Default limit for a single gRPC message in either direction; gRPC's own is 4 MB.
+DEFAULT_MAX_MESSAGE_MB = 64
+
+# Largest message EchoChunked reassembles before rejecting it.
+DEFAULT_MAX_CHUNKED_MB = 256
+
+# Largest EchoChunk the server sends back; smaller under a lower --max-message-mb.
+CHUNK_BYTES = 1024 * 1024
+
+# Room left under the message limit for an EchoChunk's own fields.
+MESSAGE_OVERHEAD_BYTES = 64 * 1024
+
+# Shortest ping interval accepted from clients on idle connections, which
+# covers the client's default keepalive of one ping a minute.
+DEFAULT_MIN_PING_INTERVAL_MS = 10000
+
+# Printed once the server accepts RPCs, followed by " on port N"; the ComfyUI-side
+# supervisor waits for it and learns the port from it when the server picked one.
+# A plain stdout line rather than a log record, so it does not depend on --log-level.
+READY_MESSAGE = "Server: Ready"
+
+# Mirror grpc_tracing.TRACEPARENT_KEY and TRACE_ID_KEY on the client side.
+TRACEPARENT_KEY = "traceparent"
+TRACE_ID_KEY = "trace-id"
+
+
+class MessageTooLarge(Exception):
+    pass
+
+
+class ChunkAssembler:
+    """Collects the EchoChunk parts of one message, up to max_bytes in total."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._parts = []
+        self._size = 0
+
+    def add(self, chunk):
+        """Add a chunk; returns True once the last chunk was added."""
+        self._size += len(chunk.data)
+        if self._size > self.max_bytes:
+            raise MessageTooLarge(f"Chunked message exceeds limit of {self.max_bytes} bytes.")
+        self._parts.append(chunk.data)
+        return chunk.last
+
+    @property
+    def data(self):
+        return b"".join(self._parts)
+
+
+def reply_chunks(data, chunk_bytes=CHUNK_BYTES):
+    """Split an echoed message into EchoChunks, timestamping the last one."""
+    received_at = datetime.now().isoformat()
+    for start in range(0, len(data), chunk_bytes):
+        last = start + chunk_bytes >= len(data)
+        yield echo_pb2.EchoChunk(
+            data=data[start:start + chunk_bytes],
+            last=last,
+            received_at=received_at if last else "",
+        )
+
+
+def request_error(request):
+    """Return why request cannot be echoed, or None if it is valid."""
+    if not request.HasField("tensor"):
+        return None if request.message else EMPTY_MESSAGE_DETAILS
+    tensor = request.tensor
+    item_size = TENSOR_ITEM_SIZES.get(tensor.dtype)
+    if item_size is None:
+        return f"Unsupported tensor dtype {tensor.dtype!r}."
+    elements = 1
+    for dim in tensor.shape:
+        elements *= dim
+    if min(tensor.shape, default=0) < 0 or len(tensor.data) != elements * item_size:
+        return f"Tensor data is {len(tensor.data)} bytes, expected {elements * item_size} for shape {list(tensor.shape)}."
+    return None
+
+
+def make_reply(request, received_at):
+    # The tensor is echoed as received, so its data is never decoded here
+    return echo_pb2.EchoReply(
+        message=request.message,
+        received_at=received_at,
+        tensor=request.tensor if request.HasField("tensor") else None,
+    )
+
+
+def echo_batch(requests):
+    """Reply to validated requests in one go; the batch handler behind a Coalescer."""
+    received_at = datetime.now().isoformat()
+    return [make_reply(request, received_at) for request in requests]
+
+
+def trace_context(context):
+    """Return (trace id, sampled flag) of a W3C traceparent header sent with the call, or None."""
+    for key, value in context.invocation_metadata() or ():
+        if key == TRACEPARENT_KEY:
+            parts = value.split("-")
+            if len(parts) == 4 and len(parts[1]) == 32 and len(parts[3]) == 2:
+                try:
+                    return parts[1], bool(int(parts[3], 16) & 1)
+                except ValueError:
+                    return None
+    return None
+
+
+def log_request(context, event, **fields):
+    """Log a request; a traced one gets its trace id echoed in a trailer.
+
+    Requests whose trace is flagged as sampled are always logged; others
+    follow the request log's level and sample rate.
+    """
+    traced = trace_context(context)
+    if traced is None:
+        request_log.log(event, **fields)
+        return
+    trace_id, sampled = traced
+    if sampled:
+        request_log.traced(event, trace_id, **fields)
+    else:
+        request_log.log(event, trace_id=trace_id, **fields)
+    context.set_trailing_metadata(((TRACE_ID_KEY, trace_id),))
+
+
+def request_key(request):
+    """Coalescing key: requests with the same message and tensor get the same reply."""
+    return request.SerializeToString(deterministic=True)
+
+
 class EchoService(echo_pb2_grpc.EchoServicer):
+    def __init__(self, max_chunked_bytes=DEFAULT_MAX_CHUNKED_MB * 1024 * 1024, coalescer=None, chunk_bytes=CHUNK_BYTES,
+                 max_streams=None):
+        self.max_chunked_bytes = max_chunked_bytes
+        # Coalescer taking valid EchoOnce requests; None handles each on its own
+        self.coalescer = coalescer
+        # Size of the EchoChunks sent back, which must fit the server's message limit
+        self.chunk_bytes = chunk_bytes
+        # EchoStream calls open at once; each holds a worker thread for as long as it is open
+        self.max_streams = max_streams
+        self._stream_slots = threading.BoundedSemaphore(max_streams) if max_streams is not None else None
+
     def EchoOnce(self, request, context):
-        print(f"Server got: {request.message!r}")
-        if not request.message:
+        log_request(context, "EchoOnce", chars=len(request.message), tensor_bytes=len(request.tensor.data))
+        error = request_error(request)
+        if error:
             context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-            context.set_details("The 'message' field is required and cannot be empty.")
+            context.set_details(error)
             return echo_pb2.EchoReply()
 
+        if self.coalescer is not None:
+            return self.coalescer.submit(request)
         # Just echo back the message with timestamp
-        return echo_pb2.EchoReply(
-            message=request.message,
-            received_at=datetime.now().isoformat()
+        return make_reply(request, datetime.now().isoformat())
+
+    def EchoMany(self, request, context):
+        log_request(context, "EchoMany", items=len(request.requests))
+        if len(request.requests) > MAX_BATCH_SIZE:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"Batch size {len(request.requests)} exceeds limit of {MAX_BATCH_SIZE}.")
+            return echo_pb2.EchoBatchReply()
+
+        # One timestamp per batch: every item was received together
+        received_at = datetime.now().isoformat()
+        items = []
+        for item in request.requests:
+            error = request_error(item)
+            if error:
+                items.append(echo_pb2.EchoBatchItem(
+                    code=grpc.StatusCode.INVALID_ARGUMENT.value[0],
+                    details=error,
+                ))
+            else:
+                items.append(echo_pb2.EchoBatchItem(reply=make_reply(item, received_at)))
+        return echo_pb2.EchoBatchReply(items=items)
+
+    def EchoStream(self, request_iterator, context):
+        slots = self._stream_slots
+        if slots is not None and not slots.acquire(blocking=False):
+            # Clients fall back to EchoOnce, which the remaining workers are kept for
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, f"Stream limit of {self.max_streams} reached.")
+        try:
+            # Replies are yielded one per request; gRPC flow control pauses this
+            # generator when the client stops reading, so no unbounded buffering.
+            for request in request_iterator:
+                yield self.stream_reply(request)
+        finally:
+            if slots is not None:
+                slots.release()
+
+    def EchoChunked(self, request_iterator, context):
+        assembler = ChunkAssembler(self.max_chunked_bytes)
+        try:
+            for chunk in request_iterator:
+                if assembler.add(chunk):
+                    break
+        except MessageTooLarge as e:
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(e))
+        data = assembler.data
+        if not data:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, EMPTY_MESSAGE_DETAILS)
+        log_request(context, "EchoChunked", bytes=len(data))
+        yield from reply_chunks(data, self.chunk_bytes)
+
+    @staticmethod
+    def stream_reply(request):
+        error = request_error(request)
+        if error:
+            return echo_pb2.EchoStreamReply(
+                request_id=request.request_id,
+                code=grpc.StatusCode.INVALID_ARGUMENT.value[0],
+                details=error,
+            )
+        return echo_pb2.EchoStreamReply(
+            request_id=request.request_id,
+            reply=make_reply(request, datetime.now().isoformat()),
         )
 
 
+class AsyncEchoService(echo_pb2_grpc.EchoServicer):
+    """asyncio variant of EchoService for the grpc.aio server.
+
+    The echo logic never blocks, so the handlers run it inline on the event
+    loop instead of occupying a worker thread per in-flight RPC.
+    """
+
+    def __init__(self, max_chunked_bytes=DEFAULT_MAX_CHUNKED_MB * 1024 * 1024, coalescer=None, chunk_bytes=CHUNK_BYTES):
+        self._echo = EchoService(max_chunked_bytes, chunk_bytes=chunk_bytes)
+        # AsyncCoalescer taking valid EchoOnce requests
+        self.coalescer = coalescer
+
+    async def EchoOnce(self, request, context):
+        if self.coalescer is None:
+            return self._echo.EchoOnce(request, context)
+        log_request(context, "EchoOnce", chars=len(request.message), tensor_bytes=len(request.tensor.data))
+        error = request_error(request)
+        if error:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(error)
+            return echo_pb2.EchoReply()
+        return await self.coalescer.submit(request)
+
+    async def EchoMany(self, request, context):
+        return self._echo.EchoMany(request, context)
+
+    async def EchoStream(self, request_iterator, context):
+        async for request in request_iterator:
+            yield EchoService.stream_reply(request)
+
+    async def EchoChunked(self, request_iterator, context):
+        assembler = ChunkAssembler(self._echo.max_chunked_bytes)
+        try:
+            async for chunk in request_iterator:
+                if assembler.add(chunk):
+                    break
+        except MessageTooLarge as e:
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(e))
+        data = assembler.data
+        if not data:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, EMPTY_MESSAGE_DETAILS)
+        log_request(context, "EchoChunked", bytes=len(data))
+        for chunk in reply_chunks(data, self._echo.chunk_bytes):
+            yield chunk
+
+
+
+def shut_down(grace):
+    """Drain through the SIGTERM handler, and exit outright if that does not finish in time."""
+    signal.raise_signal(signal.SIGTERM)
+    time.sleep(grace + FORCED_EXIT_MARGIN_SECONDS)
+    logger.warning("Server did not stop within %.1fs of SIGTERM, exiting", grace + FORCED_EXIT_MARGIN_SECONDS)
+    # os._exit skips atexit, so write out queued logs first
+    stop_logging()
+    os._exit(0)
+
 
-def monitor_parent(pid):
-    """Monitor the parent process and exit if it's no longer running."""
-    print(f"Server: Monitoring parent PID {pid}")
+def monitor_parent(pid, grace=DRAIN_GRACE_SECONDS):
+    """Monitor the parent process and drain the server if it's no longer running."""
+    logger.info("Monitoring parent PID %d", pid)
     
     if os.name == 'nt':
         # Windows-specific robust monitoring using ctypes
@@ -42,60 +340,210 @@ def monitor_parent(pid):
         # Open process handle
         process_handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
         if not process_handle:
-            print("Server: Could not open parent process handle. Shutting down...")
-            os._exit(0)
+            logger.warning("Could not open parent process handle. Shutting down...")
+            shut_down(grace)
 
         try:
             while True:
                 exit_code = ctypes.c_ulong()
                 if not kernel32.GetExitCodeProcess(process_handle, ctypes.byref(exit_code)):
-                    print("Server: Failed to get parent exit code. Shutting down...")
+                    logger.warning("Failed to get parent exit code. Shutting down...")
                     break
                 
                 if exit_code.value != STILL_ACTIVE:
-                    print("Server: Parent process terminated. Shutting down...")
+                    logger.info("Parent process terminated. Shutting down...")
                     break
                 time.sleep(2)
         finally:
             kernel32.CloseHandle(process_handle)
-        os._exit(0)
+        shut_down(grace)
     else:
         # Unix/Linux monitoring
         while True:
             try:
                 os.kill(pid, 0)
             except OSError:
-                print("Server: Parent process terminated. Shutting down...")
-                os._exit(0)
+                logger.info("Parent process terminated. Shutting down...")
+                shut_down(grace)
             time.sleep(2)
 
-def serve():
-    parser = argparse.ArgumentParser()
+COMPRESSION_CHOICES = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        epilog="Every flag can also be set as a COMFYUI_GRPC_SERVER_<FLAG> environment variable "
+               "or a key of the --config file; flags given here take precedence.",
+    )
+    parser.add_argument("--config", type=Path, default=None,
+                        help="JSON or TOML file of settings, keyed by flag name (env: COMFYUI_GRPC_SERVER_CONFIG)")
     parser.add_argument("--parent-pid", type=int, help="PID of the parent process to monitor")
-    args = parser.parse_args()
+    parser.add_argument("--aio", action="store_true", help="Serve with the asyncio (grpc.aio) server")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"Port to listen on; 0 picks a free one (default: {DEFAULT_PORT})")
+    parser.add_argument("--bind", default="0.0.0.0",
+                        help="Address to listen on, e.g. 127.0.0.1 for local clients only (default: 0.0.0.0)")
+    parser.add_argument("--plaintext", action="store_true",
+                        help="Listen without TLS (for local benchmarking only)")
+    parser.add_argument("--uds", type=Path, default=None,
+                        help="Also listen without TLS on this Unix domain socket, for clients on the same host")
+    parser.add_argument("--certs-dir", type=Path, default=Path(__file__).parent / "certs",
+                        help="Directory containing private.key and certificate.pem (default: server/certs)")
+    parser.add_argument("--cert-file", type=Path, default=None,
+                        help="Server certificate chain (default: certificate.pem in --certs-dir)")
+    parser.add_argument("--key-file", type=Path, default=None,
+                        help="Server private key (default: private.key in --certs-dir)")
+    parser.add_argument("--max-workers", type=int, default=4,
+                        help="Thread pool size for the threaded server (default: 4)")
+    parser.add_argument("--max-streams", type=int, default=None,
+                        help="EchoStream sessions open at once on the threaded server, each holding a worker; "
+                             "more are rejected and their clients use EchoOnce (default: half of --max-workers)")
+    parser.add_argument("--max-concurrent-rpcs", type=int, default=None,
+                        help="Reject RPCs beyond this many in flight with RESOURCE_EXHAUSTED (default: unlimited)")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="With --aio, unary Echo calls handled at once; more wait in a queue "
+                             "(default: unlimited). The threaded server handles --max-workers at once")
+    parser.add_argument("--max-queue", type=int, default=None,
+                        help="Echo calls allowed to wait for a handler before new ones are rejected "
+                             "(default: unlimited)")
+    parser.add_argument("--max-queue-ms", type=float, default=None,
+                        help="Reject calls that waited this long before their handler could start (default: off)")
+    parser.add_argument("--rate-limit", type=float, default=None,
+                        help="Echo calls per second allowed per client (default: unlimited)")
+    parser.add_argument("--rate-burst", type=int, default=None,
+                        help="Calls a client may make at once above --rate-limit (default: one second's worth)")
+    parser.add_argument("--rate-limit-key", default="peer",
+                        help="What identifies a client for --rate-limit: 'peer' (its address) or 'metadata:NAME' "
+                             "(default: peer)")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION_CHOICES), default="none",
+                        help="Default compression for responses (default: none)")
+    parser.add_argument("--max-message-mb", type=int, default=DEFAULT_MAX_MESSAGE_MB,
+                        help=f"Largest message sent or received in one piece, in MiB (default: {DEFAULT_MAX_MESSAGE_MB})")
+    parser.add_argument("--max-chunked-mb", type=int, default=DEFAULT_MAX_CHUNKED_MB,
+                        help=f"Largest message accepted by EchoChunked, in MiB (default: {DEFAULT_MAX_CHUNKED_MB})")
+    parser.add_argument("--keepalive-time-ms", type=int, default=None,
+                        help="Interval between keepalive pings on idle connections")
+    parser.add_argument("--keepalive-timeout-ms", type=int, default=None,
+                        help="How long to wait for a keepalive ping ack before closing the connection")
+    parser.add_argument("--min-ping-interval-ms", type=int, default=DEFAULT_MIN_PING_INTERVAL_MS,
+                        help="Shortest interval allowed between client pings on a connection without calls "
+                             f"(default: {DEFAULT_MIN_PING_INTERVAL_MS})")
+    parser.add_argument("--permit-pings-without-calls", type=int, choices=(0, 1), default=1,
+                        help="Whether clients may ping connections with no calls in flight (default: 1)")
+    parser.add_argument("--max-ping-strikes", type=int, default=None,
+                        help="Pings too early before the connection is closed with GOAWAY (default: gRPC's, 2)")
+    parser.add_argument("--max-concurrent-streams", type=int, default=None,
+                        help="Concurrent calls allowed on one client connection (default: unlimited)")
+    parser.add_argument("--http2-lookahead-kb", type=int, default=None,
+                        help="Per-stream HTTP/2 flow control window in KiB (default: gRPC's, tuned by BDP probing)")
+    parser.add_argument("--no-bdp-probe", action="store_true",
+                        help="Disable gRPC's automatic flow control window sizing")
+    parser.add_argument("--coalesce", action="store_true",
+                        help="Answer identical EchoOnce requests in flight together with one computation")
+    parser.add_argument("--batch-window-ms", type=float, default=0.0,
+                        help="Group EchoOnce requests arriving within this many ms into one batch (default: 0, off)")
+    parser.add_argument("--max-micro-batch", type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help=f"Largest micro-batch; a full batch does not wait out the window "
+                             f"(default: {DEFAULT_MAX_BATCH_SIZE})")
+    parser.add_argument("--drain-grace-s", type=float, default=DRAIN_GRACE_SECONDS,
+                        help=f"Seconds in-flight RPCs get to finish on SIGTERM before being cancelled "
+                             f"(default: {DRAIN_GRACE_SECONDS:g})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of server processes sharing the port via SO_REUSEPORT (default: 1)")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="INFO",
+                        help="Least severe level logged; DEBUG adds per-request logs (default: INFO)")
+    parser.add_argument("--log-sample-rate", type=float, default=DEFAULT_SAMPLE_RATE,
+                        help=f"Fraction of per-request DEBUG logs written (default: {DEFAULT_SAMPLE_RATE})")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Record RPC metrics and serve them at http://0.0.0.0:PORT/metrics "
+                             "(worker N of --workers uses PORT+N)")
+    return parser
 
-    if args.parent_pid:
-        monitor_thread = threading.Thread(
-            target=monitor_parent, 
-            args=(args.parent_pid,), 
-            daemon=True
-        )
-        monitor_thread.start()
 
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
-    echo_pb2_grpc.add_EchoServicer_to_server(EchoService(), server)
+def parse_args(argv=None, environ=None):
+    """Parse flags over the settings from the environment and config file (see echo_config)."""
+    parser = build_arg_parser()
+    config_path = parser.parse_known_args(argv)[0].config
+    try:
+        apply_settings(parser, read_settings(config_path, environ))
+    except ConfigError as e:
+        parser.error(str(e))
+    args = parser.parse_args(argv)
+    if not 0 <= args.port <= 65535:
+        parser.error("--port must be between 0 and 65535")
+    if args.port == 0 and args.workers > 1:
+        parser.error("--port 0 cannot be combined with --workers: each worker would pick a different port")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    # gRPC stores message limits as signed 32-bit byte counts
+    if not 1 <= args.max_message_mb <= 2047:
+        parser.error("--max-message-mb must be between 1 and 2047")
+    if args.workers > 1 and os.name == "nt":
+        parser.error("--workers > 1 requires SO_REUSEPORT, which is not available on Windows")
+    if not 0.0 <= args.log_sample_rate <= 1.0:
+        parser.error("--log-sample-rate must be between 0 and 1")
+    if args.max_streams is None:
+        args.max_streams = args.max_workers // 2
+    if not args.aio and not 0 <= args.max_streams < args.max_workers:
+        parser.error("--max-streams must be below --max-workers, so unary calls always get a worker")
+    if args.max_in_flight is not None and not args.aio:
+        parser.error("--max-in-flight requires --aio; the threaded server handles --max-workers calls at once")
+    if args.max_in_flight is not None and args.max_in_flight < 1 or args.max_queue is not None and args.max_queue < 0:
+        parser.error("--max-in-flight must be at least 1 and --max-queue must not be negative")
+    if args.rate_limit is not None and args.rate_limit <= 0:
+        parser.error("--rate-limit must be positive")
+    if args.rate_limit_key != "peer" and not args.rate_limit_key.startswith("metadata:"):
+        parser.error("--rate-limit-key must be 'peer' or 'metadata:NAME'")
+    if args.drain_grace_s < 0:
+        parser.error("--drain-grace-s must not be negative")
+    if args.batch_window_ms < 0 or args.max_micro_batch < 1:
+        parser.error("--batch-window-ms must not be negative and --max-micro-batch must be at least 1")
+    if args.uds is not None and args.workers > 1:
+        parser.error("--uds cannot be combined with --workers: only one process can own the socket")
+    return args
+
+
+def reply_chunk_bytes(args):
+    """Size of the EchoChunks sent back, leaving room under --max-message-mb for their framing."""
+    return min(CHUNK_BYTES, args.max_message_mb * 1024 * 1024 - MESSAGE_OVERHEAD_BYTES)
 
-    # Enable reflection
-    SERVICE_NAMES = (
-        echo_pb2.DESCRIPTOR.services_by_name['Echo'].full_name,
-        reflection.SERVICE_NAME,
-    )
-    reflection.enable_server_reflection(SERVICE_NAMES, server)
 
-    # Read server credentials (paths resolved relative to this file)
-    base_dir = Path(__file__).parent
-    key_path = base_dir / "certs" / "private.key"
-    cert_path = base_dir / "certs" / "certificate.pem"
+def server_options(args):
+    """Translate CLI flags into gRPC channel arguments."""
+    max_message_bytes = args.max_message_mb * 1024 * 1024
+    options = [
+        ("grpc.max_receive_message_length", max_message_bytes),
+        ("grpc.max_send_message_length", max_message_bytes),
+    ]
+    if args.keepalive_time_ms is not None:
+        options.append(("grpc.keepalive_time_ms", args.keepalive_time_ms))
+    if args.keepalive_timeout_ms is not None:
+        options.append(("grpc.keepalive_timeout_ms", args.keepalive_timeout_ms))
+    # Accept client keepalive pings on idle pooled connections; gRPC's default
+    # policy answers pings more often than every 5 minutes with GOAWAY
+    options.append(("grpc.http2.min_recv_ping_interval_without_data_ms", args.min_ping_interval_ms))
+    options.append(("grpc.keepalive_permit_without_calls", args.permit_pings_without_calls))
+    if args.max_ping_strikes is not None:
+        options.append(("grpc.http2.max_ping_strikes", args.max_ping_strikes))
+    if args.max_concurrent_streams is not None:
+        options.append(("grpc.max_concurrent_streams", args.max_concurrent_streams))
+    if args.http2_lookahead_kb is not None:
+        options.append(("grpc.http2.lookahead_bytes", args.http2_lookahead_kb * 1024))
+    if args.no_bdp_probe:
+        options.append(("grpc.http2.bdp_probe", 0))
+    if args.workers > 1:
+        # Let every worker process bind the same port; the kernel spreads connections
+        options.append(("grpc.so_reuseport", 1))
+    return options
+
+
+def load_server_credentials(args):
+    key_path = args.key_file or Path(args.certs_dir) / "private.key"
+    cert_path = args.cert_file or Path(args.certs_dir) / "certificate.pem"
 
     with open(key_path, "rb") as f:
         private_key = f.read()
@@ -103,16 +551,289 @@ def serve():
         certificate_chain = f.read()
 
     # Create server credentials
-    server_credentials = grpc.ssl_server_credentials(
+    return grpc.ssl_server_credentials(
         ((private_key, certificate_chain),)
     )
 
-    # Add secure port - use 0.0.0.0 for better IPv4 compatibility on Windows
-    server.add_secure_port("0.0.0.0:50051", server_credentials)
-    
-    print("Echo gRPC server listening on 0.0.0.0:50051 (secure)")
+
+def listen_address(args):
+    # 0.0.0.0 by default for better IPv4 compatibility on Windows; IPv6 addresses need brackets
+    host = f"[{args.bind}]" if ":" in args.bind and not args.bind.startswith("[") else args.bind
+    return f"{host}:{args.port}"
+
+
+ECHO_SERVICE_NAME = echo_pb2.DESCRIPTOR.services_by_name['Echo'].full_name
+
+
+def bind_unix_socket(server, path):
+    """Listen on a Unix socket at path, taking it over from any server listening there.
+
+    gRPC removes its socket file when the server stops, which would remove
+    the socket of a server taking over from this one. So the socket is
+    bound under a name of its own and renamed into place.
+    """
+    staging = path.with_name(f"{path.name}.{os.getpid()}")
+    staging.unlink(missing_ok=True)
+    server.add_insecure_port(f"unix:{staging}")
+    os.replace(staging, path)
+
+
+def remove_stale_unix_socket(path):
+    """Remove the socket file at path once nothing listens on it."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(str(path))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            path.unlink(missing_ok=True)
+
+
+def configure_server(server, servicer, health_servicer, args):
+    """Register services and bind the listening port; returns a description for logging.
+
+    With --port 0, args.port is set to the port the server picked.
+    """
+    echo_pb2_grpc.add_EchoServicer_to_server(servicer, server)
+    # Standard grpc.health.v1 service, used by clients to skip unhealthy servers
+    health_pb2_grpc.add_HealthServicer_to_server(health_servicer, server)
+
+    # Enable reflection
+    SERVICE_NAMES = (
+        ECHO_SERVICE_NAME,
+        health.SERVICE_NAME,
+        reflection.SERVICE_NAME,
+    )
+    reflection.enable_server_reflection(SERVICE_NAMES, server)
+
+    listeners = []
+    if args.uds is not None:
+        bind_unix_socket(server, args.uds)
+        listeners.append(f"unix:{args.uds} (plaintext)")
+
+    if args.plaintext:
+        args.port = server.add_insecure_port(listen_address(args))
+        listeners.append(f"{listen_address(args)} (plaintext)")
+    else:
+        args.port = server.add_secure_port(listen_address(args), load_server_credentials(args))
+        listeners.append(f"{listen_address(args)} (secure)")
+    return ", ".join(listeners)
+
+
+def start_metrics(args):
+    """Start the /metrics endpoint if requested and return the RpcMetrics to record into."""
+    if args.metrics_port is None:
+        return None
+    metrics = RpcMetrics("echo_server")
+    # Same interface as the gRPC port, so a server bound to localhost does not expose /metrics
+    httpd = start_metrics_http_server(metrics, args.metrics_port, args.bind)
+    # The bound port, which differs from --metrics-port 0
+    logger.info("Metrics available at http://%s:%d/metrics", listen_address(args).rsplit(":", 1)[0],
+                httpd.server_address[1])
+    return metrics
+
+
+def make_admission_controller(args, metrics):
+    """Return the AdmissionController configured by the flags, or None if none are set."""
+    if args.max_queue is None and args.max_queue_ms is None and args.rate_limit is None and args.max_in_flight is None:
+        return None
+    return AdmissionController(
+        max_in_flight=args.max_in_flight,
+        max_queue=args.max_queue,
+        max_queue_wait=args.max_queue_ms / 1000 if args.max_queue_ms is not None else None,
+        rate=args.rate_limit,
+        burst=args.rate_burst,
+        client_key=args.rate_limit_key,
+        registry=metrics.registry if metrics else None,
+    )
+
+
+def server_interceptors(args, metrics, thread_pool=None):
+    """Metrics first, so rejected calls are recorded too; thread_pool is None for grpc.aio."""
+    aio = thread_pool is None
+    interceptors = []
+    if metrics:
+        interceptors.append(AioMetricsServerInterceptor(metrics) if aio else MetricsServerInterceptor(metrics))
+    admission = make_admission_controller(args, metrics)
+    if admission:
+        interceptors.append(
+            AioAdmissionServerInterceptor(admission) if aio else AdmissionServerInterceptor(admission, thread_pool)
+        )
+    return interceptors or None
+
+
+def make_coalescer(args, metrics, coalescer_class=Coalescer):
+    """Return the coalescer requested by --coalesce/--batch-window-ms, or None."""
+    if not args.coalesce and not args.batch_window_ms:
+        return None
+    return coalescer_class(
+        echo_batch, request_key,
+        single_flight=args.coalesce,
+        batch_window=args.batch_window_ms / 1000,
+        max_batch_size=args.max_micro_batch,
+        metrics=CoalescingMetrics("echo_server", metrics.registry if metrics else None),
+    )
+
+
+def log_coalescing(coalescer):
+    if coalescer is not None:
+        metrics = coalescer.metrics
+        logger.info("Coalesced %d EchoOnce requests into %d batches (ratio %.2f)",
+                    metrics.requests.value(), metrics.computations.value(), metrics.coalesce_ratio())
+
+
+def stopped(args, servicer):
+    """Clean up after the server stopped."""
+    if args.uds is not None:
+        remove_stale_unix_socket(args.uds)
+    log_coalescing(servicer.coalescer)
+    logger.info("Server stopped")
+
+
+def serve_threaded(args):
+    metrics = start_metrics(args)
+    thread_pool = AdmissionThreadPool(args.max_workers)
+    server = grpc.server(
+        thread_pool,
+        interceptors=server_interceptors(args, metrics, thread_pool),
+        options=server_options(args),
+        maximum_concurrent_rpcs=args.max_concurrent_rpcs,
+        compression=COMPRESSION_CHOICES[args.compression],
+    )
+    health_servicer = health.HealthServicer()
+    servicer = EchoService(
+        args.max_chunked_mb * 1024 * 1024, make_coalescer(args, metrics), reply_chunk_bytes(args), args.max_streams
+    )
+    listener = configure_server(server, servicer, health_servicer, args)
+
+    def drain(signum, frame):
+        # Report NOT_SERVING first so balancing clients move away, then stop
+        # accepting calls, send GOAWAY and let in-flight RPCs finish
+        logger.info("Draining in-flight RPCs for up to %.1fs", args.drain_grace_s)
+        health_servicer.enter_graceful_shutdown()
+        server.stop(args.drain_grace_s)
+
+    signal.signal(signal.SIGTERM, drain)
+
+    logger.info("Echo gRPC server listening on %s", listener)
     server.start()
+    health_servicer.set(ECHO_SERVICE_NAME, health_pb2.HealthCheckResponse.SERVING)
+    print(f"{READY_MESSAGE} on port {args.port}", flush=True)
     server.wait_for_termination()
+    stopped(args, servicer)
+
+
+async def serve_aio(args):
+    metrics = start_metrics(args)
+    server = grpc.aio.server(
+        interceptors=server_interceptors(args, metrics),
+        options=server_options(args),
+        maximum_concurrent_rpcs=args.max_concurrent_rpcs,
+        compression=COMPRESSION_CHOICES[args.compression],
+    )
+    health_servicer = health.aio.HealthServicer()
+    servicer = AsyncEchoService(
+        args.max_chunked_mb * 1024 * 1024, make_coalescer(args, metrics, AsyncCoalescer), reply_chunk_bytes(args)
+    )
+    listener = configure_server(server, servicer, health_servicer, args)
+
+    async def graceful_stop():
+        logger.info("Draining in-flight RPCs for up to %.1fs", args.drain_grace_s)
+        await health_servicer.enter_graceful_shutdown()
+        await server.stop(args.drain_grace_s)
+
+    loop = asyncio.get_running_loop()
+    drain = lambda: loop.create_task(graceful_stop())
+    try:
+        loop.add_signal_handler(signal.SIGTERM, drain)
+    except NotImplementedError:
+        # Windows event loops do not support add_signal_handler
+        signal.signal(signal.SIGTERM, lambda signum, frame: loop.call_soon_threadsafe(drain))
+
+    logger.info("Echo gRPC server listening on %s, asyncio", listener)
+    await server.start()
+    await health_servicer.set(ECHO_SERVICE_NAME, health_pb2.HealthCheckResponse.SERVING)
+    print(f"{READY_MESSAGE} on port {args.port}", flush=True)
+    await server.wait_for_termination()
+    stopped(args, servicer)
+
+
+def run_server(args):
+    if args.aio:
+        asyncio.run(serve_aio(args))
+    else:
+        serve_threaded(args)
+
+
+def run_worker(args, supervisor_pid, index):
+    """Entry point of a worker process started by serve_workers."""
+    if args.metrics_port is not None:
+        # Each worker records its own metrics, so each needs its own endpoint
+        args.metrics_port += index
+    # Exit together with the supervisor, same as a single server does with ComfyUI
+    threading.Thread(target=monitor_parent, args=(supervisor_pid, args.drain_grace_s), daemon=True).start()
+    # Ctrl+C reaches the whole process group; let the supervisor coordinate shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Spawned workers start with fresh logging configuration
+    configure_logging(args.log_level, args.log_sample_rate)
+    run_server(args)
+
+
+def serve_workers(args):
+    """Run args.workers server processes bound to the same port and keep them alive.
+
+    Worker processes are restarted if they die. On SIGTERM or Ctrl+C each
+    worker is sent SIGTERM so it drains its in-flight RPCs before exiting.
+    """
+    # spawn, not fork: gRPC does not support forking a process that uses it
+    context = multiprocessing.get_context("spawn")
+    stopping = threading.Event()
+
+    def start_worker(index):
+        worker = context.Process(target=run_worker, args=(args, os.getpid(), index))
+        worker.start()
+        return worker
+
+    def request_stop(signum, frame):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    workers = [start_worker(index) for index in range(args.workers)]
+    logger.info("Supervising %d workers on %s", args.workers, listen_address(args))
+
+    while not stopping.wait(1):
+        for i, worker in enumerate(workers):
+            if not worker.is_alive():
+                logger.warning("Worker %d exited with code %s, restarting...", worker.pid, worker.exitcode)
+                workers[i] = start_worker(i)
+
+    logger.info("Draining workers...")
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        worker.join(args.drain_grace_s + FORCED_EXIT_MARGIN_SECONDS)
+        if worker.is_alive():
+            worker.kill()
+
+
+def serve():
+    args = parse_args()
+    configure_logging(args.log_level, args.log_sample_rate)
+
+    if args.parent_pid:
+        monitor_thread = threading.Thread(
+            target=monitor_parent, 
+            args=(args.parent_pid, args.drain_grace_s), 
+            daemon=True
+        )
+        monitor_thread.start()
+
+    if args.workers > 1:
+        serve_workers(args)
+    else:
+        run_server(args)
 
 
 if __name__ == "__main__":
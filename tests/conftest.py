@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+# Add root directory to path to import the client modules
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from grpc_balancer import get_balancer
+from grpc_channel_pool import get_channel_pool
+from grpc_credentials import get_credentials_cache
+from grpc_readiness import get_readiness_cache
+from grpc_response_cache import get_response_cache
+from grpc_tracing import set_trace_exporter
+
+
+@pytest.fixture
+def cert_path(tmp_path):
+    cert = tmp_path / "cert.pem"
+    cert.write_bytes(b"mock_cert")
+    return str(cert)
+
+
+@pytest.fixture
+def clean_pool():
+    """Start and end with empty process-wide client state: channels, caches, balancer and trace exporter."""
+    get_channel_pool().close()
+    get_readiness_cache().clear()
+    get_credentials_cache().clear()
+    get_response_cache().clear()
+    get_balancer().clear()
+    yield
+    get_channel_pool().close()
+    get_readiness_cache().clear()
+    get_credentials_cache().clear()
+    set_trace_exporter(None)
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import socket
+import sys
+import threading
+
+import pytest
+from unittest.mock import MagicMock
+import grpc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "server"))
+
+import echo_pb2
+import echo_pb2_grpc
+from echo_admission import (
+    AdmissionController,
+    AdmissionServerInterceptor,
+    AsyncConcurrencyLimiter,
+    AdmissionThreadPool,
+    Rejected,
+    TokenBucket,
+    peer_host,
+)
+from echo_server import EchoService, configure_server, make_admission_controller, parse_args
+from grpc_health.v1 import health, health_pb2, health_pb2_grpc
+
+
+def make_context(peer="ipv4:10.0.0.1:5000", metadata=()):
+    context = MagicMock(spec=grpc.ServicerContext)
+    context.peer.return_value = peer
+    context.invocation_metadata.return_value = metadata
+    return context
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=10, burst=2, now=0.0)
+
+    assert bucket.take(0.0) == 0 and bucket.take(0.0) == 0
+    assert bucket.take(0.0) == pytest.approx(0.1)
+    assert bucket.take(0.1) == 0
+
+def test_rate_limit_is_per_client():
+    controller = AdmissionController(rate=1, client_key="metadata:x-client-id")
+    alice = make_context(metadata=(("x-client-id", "alice"),))
+
+    controller.check(alice, 0)
+    with pytest.raises(Rejected) as rejected:
+        controller.check(alice, 0)
+    assert rejected.value.reason == "rate_limited" and 0 < rejected.value.retry_after <= 1
+    # Another client, and one without the metadata keyed on its address
+    controller.check(make_context(metadata=(("x-client-id", "bob"),)), 0)
+    controller.check(make_context(), 0)
+    assert controller.rejected.value("rate_limited") == 1
+
+def test_peer_host_ignores_port():
+    assert peer_host("ipv4:127.0.0.1:51234") == "ipv4:127.0.0.1"
+    assert peer_host("ipv6:[::1]:51234") == "ipv6:[::1]"
+    assert peer_host("unix:/tmp/echo.sock") == "unix:/tmp/echo.sock"
+
+def test_queue_wait_limit():
+    controller = AdmissionController(max_queue_wait=0.05)
+
+    controller.check(make_context(), 0.01)
+    with pytest.raises(Rejected, match="queue_timeout"):
+        controller.check(make_context(), 0.06)
+
+def test_thread_pool_counts_waiting_work():
+    release = threading.Event()
+    with AdmissionThreadPool(1) as pool:
+        assert not pool.full(0)
+        running = pool.submit(release.wait, 5)
+        queued = pool.submit(lambda: "done")
+        assert pool.full(1) and not pool.full(2)
+        release.set()
+        running.result(5)
+        assert queued.result(5) == "done"
+    assert (pool.backlog, pool.active) == (0, 0)
+
+def test_async_concurrency_limiter_hands_slot_to_waiter():
+    async def run():
+        limiter = AsyncConcurrencyLimiter(AdmissionController(max_in_flight=1, max_queue=1))
+        await limiter.acquire(None)
+        waiting = asyncio.ensure_future(limiter.acquire(5))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected, match="queue_full"):
+            await limiter.acquire(None)
+        limiter.release()
+        await waiting
+        with pytest.raises(Rejected, match="queue_timeout"):
+            await limiter.acquire(0.01)
+        return limiter.in_flight
+
+    assert asyncio.run(run()) == 1
+
+def test_admission_flags():
+    assert make_admission_controller(parse_args([]), None) is None
+    controller = make_admission_controller(parse_args(["--max-queue", "8", "--max-queue-ms", "250"]), None)
+    assert (controller.max_in_flight, controller.max_queue, controller.max_queue_wait) == (None, 8, 0.25)
+    controller = make_admission_controller(parse_args(["--aio", "--max-in-flight", "2"]), None)
+    assert (controller.max_in_flight, controller.max_queue) == (2, None)
+    for argv in (["--rate-limit-key", "cookie"], ["--aio", "--max-in-flight", "0"], ["--rate-limit", "0"],
+                 ["--max-in-flight", "2"]):
+        with pytest.raises(SystemExit):
+            parse_args(argv)
+
+
+class BlockingEchoService(EchoService):
+    def __init__(self):
+        super().__init__()
+        self.started, self.release = threading.Semaphore(0), threading.Event()
+
+    def EchoOnce(self, request, context):
+        self.started.release()
+        self.release.wait(5)
+        return super().EchoOnce(request, context)
+
+def test_overloaded_server_rejects_with_retry_hint():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    args = parse_args(["--plaintext", "--port", str(port), "--max-queue", "0"])
+    servicer = BlockingEchoService()
+    thread_pool = AdmissionThreadPool(2)
+    server = grpc.server(thread_pool, interceptors=[
+        AdmissionServerInterceptor(make_admission_controller(args, None), thread_pool)])
+    health_servicer = health.HealthServicer()
+    configure_server(server, servicer, health_servicer, args)
+    server.start()
+    try:
+        with grpc.insecure_channel(f"localhost:{port}") as channel:
+            stub = echo_pb2_grpc.EchoStub(channel)
+            slow = [stub.EchoOnce.future(echo_pb2.EchoRequest(message="slow"), timeout=5) for _ in range(2)]
+            assert servicer.started.acquire(timeout=5) and servicer.started.acquire(timeout=5)
+
+            with pytest.raises(grpc.RpcError) as error:
+                stub.EchoOnce(echo_pb2.EchoRequest(message="rejected"), timeout=5)
+            assert error.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+            assert ("grpc-retry-pushback-ms", "100") in error.value.trailing_metadata()
+
+            servicer.release.set()
+            assert [call.result().message for call in slow] == ["slow", "slow"]
+            # Health checks are never shed
+            health_stub = health_pb2_grpc.HealthStub(channel)
+            assert health_stub.Check(health_pb2.HealthCheckRequest(), timeout=5).status == \
+                health_pb2.HealthCheckResponse.SERVING
+    finally:
+        server.stop(None)
@@ -0,0 +1,44 @@
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from grpc_balancer import LEAST_OUTSTANDING, EndpointBalancer, parse_endpoints
+
+ENDPOINTS = ["a:1", "b:2", "c:3"]
+
+
+def test_parse_endpoints():
+    assert parse_endpoints("localhost:50051 (gRPC)") == ["localhost:50051"]
+    assert parse_endpoints("a:1, b:2 (gRPC)\nc:3,a:1,") == ENDPOINTS
+
+
+def test_round_robin_rotates_and_skips_ejected():
+    balancer = EndpointBalancer()
+    assert [balancer.candidates(ENDPOINTS)[0] for _ in range(4)] == ["a:1", "b:2", "c:3", "a:1"]
+
+    balancer.mark_unhealthy("b:2")
+    # Ejected endpoints are only kept as a last resort
+    assert [balancer.candidates(ENDPOINTS) for _ in range(3)] == [
+        ["a:1", "c:3", "b:2"],
+        ["c:3", "a:1", "b:2"],
+        ["a:1", "c:3", "b:2"],
+    ]
+
+
+def test_ejection_expires():
+    balancer = EndpointBalancer(ejection_time=10)
+    with patch("grpc_balancer.time.monotonic", return_value=100.0):
+        balancer.mark_unhealthy("a:1")
+        assert not balancer.is_healthy("a:1")
+    with patch("grpc_balancer.time.monotonic", return_value=110.0):
+        assert balancer.is_healthy("a:1")
+
+
+def test_least_outstanding_prefers_idle_endpoints():
+    balancer = EndpointBalancer()
+    with balancer.track("a:1"), balancer.track("a:1"), balancer.track("b:2"):
+        assert balancer.candidates(ENDPOINTS, LEAST_OUTSTANDING)[0] == "c:3"
+        assert balancer.outstanding("a:1") == 2
+    assert balancer.outstanding("a:1") == 0
@@ -0,0 +1,100 @@
+import os
+import sys
+import pytest
+from unittest.mock import MagicMock, patch
+import grpc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from grpc_channel_pool import ChannelPool
+from grpc_credentials import CredentialsCache, ServerCertificate
+
+CERT = ServerCertificate(b"cert")
+OTHER_CERT = ServerCertificate(b"other")
+
+@pytest.fixture
+def pool():
+    pool = ChannelPool(idle_timeout=60)
+    yield pool
+    pool.close()
+
+@patch("grpc.secure_channel")
+def test_same_key_reuses_channel(mock_secure_channel, pool):
+    mock_secure_channel.side_effect = lambda *args, **kwargs: MagicMock()
+
+    first = pool.get_secure_channel("localhost:50051", CERT)
+    second = pool.get_secure_channel("localhost:50051", CERT)
+
+    assert first is second
+    assert mock_secure_channel.call_count == 1
+
+@patch("grpc.secure_channel")
+def test_different_cert_or_options_get_separate_channels(mock_secure_channel, pool):
+    mock_secure_channel.side_effect = lambda *args, **kwargs: MagicMock()
+
+    base = pool.get_secure_channel("localhost:50051", CERT)
+    other_cert = pool.get_secure_channel("localhost:50051", OTHER_CERT)
+    other_options = pool.get_secure_channel(
+        "localhost:50051", CERT, options=[("grpc.enable_retries", 0)]
+    )
+
+    assert len({id(base), id(other_cert), id(other_options)}) == 3
+    assert len(pool) == 3
+
+@patch("grpc.secure_channel")
+def test_unhealthy_channel_is_replaced(mock_secure_channel, pool):
+    mock_secure_channel.side_effect = lambda *args, **kwargs: MagicMock()
+
+    first = pool.get_secure_channel("localhost:50051", CERT)
+    # Simulate the connectivity callback reporting a failure
+    callback = first.subscribe.call_args[0][0]
+    callback(grpc.ChannelConnectivity.TRANSIENT_FAILURE)
+
+    second = pool.get_secure_channel("localhost:50051", CERT)
+
+    assert second is not first
+    first.close.assert_called_once()
+
+@patch("grpc.secure_channel")
+def test_idle_channels_are_evicted(mock_secure_channel, pool):
+    mock_secure_channel.side_effect = lambda *args, **kwargs: MagicMock()
+
+    with patch("time.monotonic", return_value=0):
+        idle = pool.get_secure_channel("host-a:50051", CERT)
+    with patch("time.monotonic", return_value=1000):
+        pool.get_secure_channel("host-b:50051", CERT)
+
+    idle.close.assert_called_once()
+    assert len(pool) == 1
+
+def test_credentials_cache_reloads_only_when_file_changes(tmp_path):
+    cert = tmp_path / "cert.pem"
+    cert.write_bytes(b"first")
+    cache = CredentialsCache(revalidate_interval=0)
+
+    first = cache.get(str(cert))
+    assert cache.get(str(cert)) is first
+
+    # Rotate the certificate: new content and a different mtime
+    cert.write_bytes(b"second-cert")
+    os.utime(cert, ns=(0, 0))
+    rotated = cache.get(str(cert))
+
+    assert rotated is not first
+    assert rotated.pem == b"second-cert"
+
+def test_credentials_cache_skips_disk_within_interval(tmp_path):
+    cert = tmp_path / "cert.pem"
+    cert.write_bytes(b"cert")
+    cache = CredentialsCache(revalidate_interval=60)
+    first = cache.get(str(cert))
+
+    with patch("pathlib.Path.stat") as mock_stat, patch("builtins.open") as mock_open:
+        assert cache.get(str(cert)) is first
+    mock_stat.assert_not_called()
+    mock_open.assert_not_called()
+
+    cert.unlink()
+    cache.clear()
+    with pytest.raises(FileNotFoundError):
+        cache.get(str(cert))
@@ -1,28 +1,40 @@
+import asyncio
+import json
 import os
+import subprocess
 import sys
+from concurrent import futures
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 import grpc
 
 # Add root directory to path to import generated files and the node
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", "server"))
 
-from grpc_echo_node import GRPCEchoNode
+from grpc_echo_node import GRPCEchoNode, GRPCEchoBatchNode
+from grpc_echo_client import chunk_messages, run_grpc_test_async
+from grpc_balancer import get_balancer
+from grpc_readiness import get_readiness_cache
 import echo_pb2
 
+pytestmark = pytest.mark.usefixtures("clean_pool")
+
 @pytest.fixture
 def node():
     return GRPCEchoNode()
 
+@pytest.fixture(autouse=True)
+def mock_channel_ready():
+    # Probes also ask the server's health service; report every mock server as serving
+    with patch("grpc.channel_ready_future") as mock_ready_future, \
+         patch("grpc_readiness.connect_error", return_value=None), \
+         patch("grpc_readiness.check_health", return_value=True), \
+         patch("grpc_readiness.check_health_async", AsyncMock(return_value=True)):
+        yield mock_ready_future
+
 @patch("grpc.secure_channel")
-@patch("pathlib.Path.exists")
-@patch("builtins.open")
-def test_node_call_success(mock_open, mock_path_exists, mock_secure_channel, node):
-    # Mock certificate file
-    mock_path_exists.return_value = True
-    mock_open.return_value.__enter__.return_value.read.return_value = b"mock_cert"
-    
+def test_node_call_success(mock_secure_channel, node, cert_path):
     # Mock gRPC channel and stub
     mock_stub = MagicMock()
     mock_stub.EchoOnce.return_value = echo_pb2.EchoReply(
@@ -31,15 +43,94 @@ def test_node_call_success(mock_open, mock_path_exists, mock_secure_channel, nod
     )
     
     # Setup the sequence of events
-    # mock_secure_channel() -> context manager -> channel -> stub
+    # mock_secure_channel() -> pooled channel -> stub
     mock_channel = MagicMock()
-    mock_secure_channel.return_value.__enter__.return_value = mock_channel
+    mock_secure_channel.return_value = mock_channel
     
     with patch("echo_pb2_grpc.EchoStub", return_value=mock_stub):
-        result = node.call(host="localhost:50051", message="hello", cert_path="cert.pem")
+        result = node.call(host="localhost:50051", message="hello", cert_path=cert_path)
     
-    assert result == ("Echoing: hello", "2024-01-01T12:00:00")
+    assert result == ("Echoing: hello", "2024-01-01T12:00:00", "")
+    # No pre-flight ping: the hot path is a single RPC
+    assert mock_stub.EchoOnce.call_count == 1
+    assert mock_secure_channel.call_count == 1
+
+@patch("grpc.secure_channel")
+def test_node_call_serves_repeats_from_cache(mock_secure_channel, node, cert_path):
+    mock_stub = MagicMock()
+    mock_stub.EchoOnce.return_value = echo_pb2.EchoReply(message="Echoing: hello", received_at="now")
+
+    with patch("echo_pb2_grpc.EchoStub", return_value=mock_stub):
+        assert GRPCEchoNode.IS_CHANGED("localhost:50051", "hello", cert_path, cache_ttl=60) != \
+            GRPCEchoNode.IS_CHANGED("localhost:50051", "hello", cert_path, cache_ttl=60)
+        first = node.call(host="localhost:50051", message="hello", cert_path=cert_path, cache_ttl=60)
+        second = node.call(host="localhost:50051 (gRPC)", message="hello", cert_path=cert_path, cache_ttl=60)
+        node.call(host="localhost:50051", message="other", cert_path=cert_path, cache_ttl=60)
+
+    assert first == second == ("Echoing: hello", "now", "")
     assert mock_stub.EchoOnce.call_count == 2
+    # Stable while fresh, so ComfyUI can keep its own cached output
+    assert GRPCEchoNode.IS_CHANGED("localhost:50051", "hello", cert_path, cache_ttl=60) == \
+        GRPCEchoNode.IS_CHANGED("localhost:50051", "hello", cert_path, cache_ttl=60)
+
+@patch("grpc.secure_channel")
+def test_node_call_does_not_cache_errors(mock_secure_channel, node, cert_path):
+    error = grpc.RpcError()
+    error.details = lambda: "unavailable"
+    mock_stub = MagicMock()
+    mock_stub.EchoOnce.side_effect = [error, echo_pb2.EchoReply(message="hello", received_at="now")]
+
+    with patch("echo_pb2_grpc.EchoStub", return_value=mock_stub):
+        assert node.call(host="localhost:50051", message="hello", cert_path=cert_path, cache_ttl=60)[1] == "Error"
+        assert node.call(host="localhost:50051", message="hello", cert_path=cert_path, cache_ttl=60) == ("hello", "now", "")
+
+def test_node_call_skips_endpoints_that_are_not_serving(node, cert_path):
+    channels = {"a:1": MagicMock(name="a"), "b:2": MagicMock(name="b")}
+    stubs = {}
+
+    def make_stub(channel):
+        stub = stubs[channel] = MagicMock()
+        stub.EchoOnce.return_value = echo_pb2.EchoReply(message="hello", received_at="now")
+        return stub
+
+    with patch("grpc.secure_channel", side_effect=lambda target, *args, **kwargs: channels[target]), \
+         patch("grpc.intercept_channel", side_effect=lambda channel, *interceptors: channel), \
+         patch("grpc_readiness.check_health", side_effect=lambda channel, timeout: channel is channels["b:2"]), \
+         patch("echo_pb2_grpc.EchoStub", side_effect=make_stub):
+        results = [node.call(host="a:1, b:2", message="hello", cert_path=cert_path) for _ in range(3)]
+
+    assert results == [("hello", "now", "")] * 3
+    # a:1 reported NOT_SERVING once and was then left out of the rotation
+    assert list(stubs) == [channels["b:2"]] * len(stubs)
+    assert not get_balancer().is_healthy("a:1")
+
+@patch("grpc.secure_channel")
+def test_node_call_skips_probe_while_ready(mock_secure_channel, mock_channel_ready, node, cert_path):
+    mock_stub = MagicMock()
+    mock_stub.EchoOnce.return_value = echo_pb2.EchoReply(message="hello", received_at="now")
+
+    with patch("echo_pb2_grpc.EchoStub", return_value=mock_stub):
+        node.call(host="localhost:50051", message="hello", cert_path=cert_path)
+        node.call(host="localhost:50051", message="hello", cert_path=cert_path)
+
+    # Only the first call had to wait on channel connectivity
+    assert mock_channel_ready.call_count == 1
+    assert mock_stub.EchoOnce.call_count == 2
+
+@patch("grpc.secure_channel")
+def test_node_call_unreachable_server(mock_secure_channel, mock_channel_ready, node, cert_path):
+    mock_channel_ready.return_value.result.side_effect = grpc.FutureTimeoutError()
+    connect_error = "failed to connect to all addresses; last error: Connection refused"
+
+    mock_stub = MagicMock()
+    with patch("echo_pb2_grpc.EchoStub", return_value=mock_stub), \
+         patch("grpc_readiness.connect_error", return_value=connect_error):
+        result = node.call(host="localhost:50051", message="hello", cert_path=cert_path)
+
+    assert "not reachable" in result[0]
+    assert result[0].endswith(connect_error)
+    assert result[1] == "Error"
+    mock_stub.EchoOnce.assert_not_called()
 
 def test_node_call_missing_cert(node):
     with patch("pathlib.Path.exists", return_value=False):
@@ -48,14 +139,9 @@ def test_node_call_missing_cert(node):
     assert "Certificate file not found at nonexistent.pem" in result[0]
 
 @patch("grpc.secure_channel")
-@patch("pathlib.Path.exists")
-@patch("builtins.open")
-def test_node_call_grpc_error(mock_open, mock_path_exists, mock_secure_channel, node):
-    mock_path_exists.return_value = True
-    mock_open.return_value.__enter__.return_value.read.return_value = b"mock_cert"
-    
+def test_node_call_grpc_error(mock_secure_channel, node, cert_path):
     mock_channel = MagicMock()
-    mock_secure_channel.return_value.__enter__.return_value = mock_channel
+    mock_secure_channel.return_value = mock_channel
     
     mock_stub = MagicMock()
     mock_stub.EchoOnce.side_effect = grpc.RpcError("Connection failed")
@@ -63,6 +149,314 @@ def test_node_call_grpc_error(mock_open, mock_path_exists, mock_secure_channel,
     mock_stub.EchoOnce.side_effect.details = lambda: "Connection failed"
     
     with patch("echo_pb2_grpc.EchoStub", return_value=mock_stub):
-        result = node.call(host="localhost:50051", message="hello", cert_path="cert.pem")
+        result = node.call(host="localhost:50051", message="hello", cert_path=cert_path)
     
     assert "gRPC Error: Connection failed" in result[0]
+    # A failed call forces a fresh readiness probe next time
+    assert not get_readiness_cache().is_ready("localhost:50051")
+
+def test_chunk_messages_bounds_items_and_bytes():
+    assert list(chunk_messages(["a", "b", "c"], max_items=2)) == [["a", "b"], ["c"]]
+    assert list(chunk_messages(["aaaa", "bb", "cc"], max_items=10, max_bytes=5)) == [["aaaa"], ["bb", "cc"]]
+    # A single oversized message still goes out on its own
+    assert list(chunk_messages(["toolong"], max_items=10, max_bytes=3)) == [["toolong"]]
+
+@patch("grpc.secure_channel")
+def test_batch_node_sends_chunks(mock_secure_channel, cert_path):
+    def echo_many(req, **kwargs):
+        items = []
+        for r in req.requests:
+            if r.message:
+                items.append(echo_pb2.EchoBatchItem(reply=echo_pb2.EchoReply(message=r.message, received_at="now")))
+            else:
+                items.append(echo_pb2.EchoBatchItem(code=3, details="empty"))
+        return echo_pb2.EchoBatchReply(items=items)
+
+    mock_stub = MagicMock()
+    mock_stub.EchoMany.side_effect = echo_many
+
+    with patch("echo_pb2_grpc.EchoStub", return_value=mock_stub):
+        messages, received = GRPCEchoBatchNode().call_many(
+            host=["localhost:50051"],
+            message=["one", "two", "", "four", "five"],
+            cert_path=[cert_path],
+            batch_size=[2],
+        )
+
+    assert mock_stub.EchoMany.call_count == 3
+    mock_stub.EchoOnce.assert_not_called()
+    assert messages == ["one", "two", "gRPC Error: empty", "four", "five"]
+    assert received == ["now", "now", "Error", "now", "now"]
+
+@patch("grpc.secure_channel")
+def test_batch_node_keeps_answered_batches_when_one_fails(mock_secure_channel, cert_path):
+    error = grpc.RpcError()
+    error.details = lambda: "unavailable"
+    first = echo_pb2.EchoBatchReply(items=[
+        echo_pb2.EchoBatchItem(reply=echo_pb2.EchoReply(message=m, received_at="now")) for m in ("one", "two")
+    ])
+    mock_stub = MagicMock()
+    mock_stub.EchoMany.side_effect = [first, error]
+
+    with patch("echo_pb2_grpc.EchoStub", return_value=mock_stub):
+        messages, received = GRPCEchoBatchNode().call_many(
+            host=["localhost:50051"],
+            message=["one", "two", "three", "four", "five"],
+            cert_path=[cert_path],
+            batch_size=[2],
+        )
+
+    # The third batch is not sent once the second failed, but every output stays aligned
+    assert mock_stub.EchoMany.call_count == 2
+    assert messages == ["one", "two"] + ["gRPC Error: unavailable"] * 3
+    assert received == ["now", "now", "Error", "Error", "Error"]
+
+@patch("grpc.secure_channel")
+def test_batch_node_only_sends_cache_misses(mock_secure_channel, cert_path):
+    mock_stub = MagicMock()
+    mock_stub.EchoMany.side_effect = lambda req, **kwargs: echo_pb2.EchoBatchReply(items=[
+        echo_pb2.EchoBatchItem(reply=echo_pb2.EchoReply(message=r.message, received_at="now"))
+        for r in req.requests
+    ])
+    node = GRPCEchoBatchNode()
+    call = lambda messages: node.call_many(
+        host=["localhost:50051"], message=messages, cert_path=[cert_path], batch_size=[64], cache_ttl=[60])
+
+    with patch("echo_pb2_grpc.EchoStub", return_value=mock_stub):
+        call(["one", "two"])
+        messages, _ = call(["two", "three", "one"])
+        call(["one", "three"])
+
+    assert messages == ["two", "three", "one"]
+    sent = [[r.message for r in c.args[0].requests] for c in mock_stub.EchoMany.call_args_list]
+    assert sent == [["one", "two"], ["three"]]
+
+@patch("grpc.secure_channel")
+def test_node_call_compresses_and_chunks_large_messages(mock_secure_channel, node, cert_path):
+    def echo_chunked(chunks, **kwargs):
+        chunks = list(chunks)
+        assert [c.last for c in chunks] == [False, False, True]
+        data = b"".join(c.data for c in chunks)
+        return iter([echo_pb2.EchoChunk(data=data[:10]), echo_pb2.EchoChunk(data=data[10:], last=True, received_at="now")])
+
+    mock_stub = MagicMock()
+    mock_stub.EchoOnce.return_value = echo_pb2.EchoReply(message="small", received_at="now")
+    mock_stub.EchoChunked.side_effect = echo_chunked
+    large = "x" * (2 * 1024 * 1024 + 1)
+
+    with patch("echo_pb2_grpc.EchoStub", return_value=mock_stub):
+        assert node.call(host="localhost:50051", message="small", cert_path=cert_path, compression="gzip") == ("small", "now", "")
+        assert node.call(host="localhost:50051", message=large, cert_path=cert_path, max_message_mb=1) == (large, "now", "")
+
+    assert mock_stub.EchoOnce.call_args.kwargs["compression"] == grpc.Compression.Gzip
+    assert mock_stub.EchoChunked.call_count == 1
+    # The size limit is applied to the channel as well
+    options = dict(mock_secure_channel.call_args_list[-1].kwargs["options"])
+    assert options["grpc.max_send_message_length"] == 1024 * 1024
+
+@pytest.fixture
+def mock_aio_channel():
+    channel = MagicMock()
+    channel.channel_ready = AsyncMock()
+    channel.get_state.return_value = grpc.ChannelConnectivity.READY
+    with patch("grpc.aio.secure_channel", return_value=channel) as mock_secure_channel:
+        yield mock_secure_channel
+
+def test_node_call_async_success(mock_aio_channel, node, cert_path):
+    mock_stub = MagicMock()
+    mock_stub.EchoOnce = AsyncMock(return_value=echo_pb2.EchoReply(message="hello", received_at="now"))
+
+    async def call_twice():
+        first = await node.call_async(host="localhost:50051", message="hello", cert_path=cert_path)
+        second = await node.call_async(host="localhost:50051", message="hello", cert_path=cert_path)
+        return first, second
+
+    with patch("echo_pb2_grpc.EchoStub", return_value=mock_stub):
+        first, second = asyncio.run(call_twice())
+
+    assert first == second == ("hello", "now", "")
+    # Both calls on the same event loop share one pooled aio channel
+    assert mock_aio_channel.call_count == 1
+
+def test_run_grpc_test_async_error(mock_aio_channel, cert_path):
+    error = grpc.RpcError("Connection failed")
+    error.details = lambda: "Connection failed"
+    mock_stub = MagicMock()
+    mock_stub.EchoOnce = AsyncMock(side_effect=error)
+
+    with patch("echo_pb2_grpc.EchoStub", return_value=mock_stub):
+        result = asyncio.run(run_grpc_test_async("localhost:50051", cert_path))
+
+    assert result == {"success": False, "message": "gRPC Error: Connection failed"}
+
+def test_node_module_does_not_import_grpc():
+    # Registering the nodes must stay cheap; grpc is loaded on first execution
+    root = os.path.join(os.path.dirname(__file__), "..")
+    code = (
+        f"import sys; sys.path.insert(0, {root!r}); import grpc_echo_node; "
+        "assert 'grpc' not in sys.modules and 'echo_pb2' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+def test_readiness_works_without_the_health_checking_package():
+    # grpcio-health-checking is a server dependency; probes then only check connectivity
+    root = os.path.join(os.path.dirname(__file__), "..")
+    code = (
+        f"import sys; sys.path.insert(0, {root!r}); sys.modules['grpc_health'] = None; "
+        "from unittest.mock import MagicMock; import grpc_readiness; "
+        "channel = MagicMock(); assert grpc_readiness.check_health(channel); channel.unary_unary.assert_not_called()"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+@patch("grpc.secure_channel")
+def test_latent_node_echoes_samples_as_raw_buffer(mock_secure_channel, cert_path):
+    torch = pytest.importorskip("torch")
+    from grpc_echo_node import GRPCEchoLatentNode
+
+    mock_stub = MagicMock()
+    mock_stub.EchoOnce.side_effect = lambda req, **kwargs: echo_pb2.EchoReply(tensor=req.tensor, received_at="now")
+    latent = {"samples": torch.rand(1, 4, 8, 8), "batch_index": [0]}
+
+    with patch("echo_pb2_grpc.EchoStub", return_value=mock_stub):
+        result, received_at = GRPCEchoLatentNode().call_tensor("localhost:50051", latent, cert_path)
+
+    sent = mock_stub.EchoOnce.call_args.args[0]
+    assert (sent.message, sent.tensor.dtype, list(sent.tensor.shape)) == ("", "float32", [1, 4, 8, 8])
+    assert torch.equal(result["samples"], latent["samples"])
+    assert result["batch_index"] == [0]
+    assert received_at == "now"
+
+def test_call_options_configure_deadline_and_retries():
+    from grpc_echo_client import CallOptions
+
+    options = dict(CallOptions(timeout=5, max_attempts=9).channel_options())
+    retry_policy = json.loads(options["grpc.service_config"])["methodConfig"][0]["retryPolicy"]
+    assert options["grpc.enable_retries"] == 1
+    assert retry_policy["maxAttempts"] == 5
+    assert retry_policy["retryableStatusCodes"] == ["UNAVAILABLE"]
+    assert CallOptions(timeout=5).probe_timeout == 2.0
+    assert CallOptions(timeout=0.5).probe_timeout == 0.5
+
+    assert dict(CallOptions(max_attempts=1).channel_options())["grpc.enable_retries"] == 0
+    assert CallOptions(timeout=0).timeout is None
+
+def test_call_options_keepalive_and_channel_args():
+    from grpc_echo_client import CallOptions, parse_channel_args
+
+    # Off unless asked for, so servers on gRPC's default ping policy do not GOAWAY pooled channels
+    options = dict(CallOptions().channel_options())
+    assert "grpc.keepalive_time_ms" not in options
+    assert "grpc.keepalive_permit_without_calls" not in options
+
+    options = dict(CallOptions(keepalive_ms=60000).channel_options())
+    assert options["grpc.keepalive_time_ms"] == 60000
+    assert options["grpc.keepalive_permit_without_calls"] == 1
+    assert options["grpc.http2.max_pings_without_data"] == 0
+
+    args = parse_channel_args('{"grpc.http2.lookahead_bytes": 1048576, "grpc.keepalive_time_ms": 15000}')
+    options = dict(CallOptions(channel_args=args).channel_options())
+    assert options["grpc.http2.lookahead_bytes"] == 1048576
+    assert options["grpc.keepalive_time_ms"] == 15000
+    assert parse_channel_args("  ") == {}
+    for text in ("[1]", "{not json", '{"grpc.x": 1.5}'):
+        with pytest.raises(ValueError):
+            parse_channel_args(text)
+
+def test_node_call_hedges_slow_calls_to_another_endpoint(node, cert_path):
+    channels = {"a:1": MagicMock(name="a"), "b:2": MagicMock(name="b")}
+    calls = {}
+
+    def make_stub(channel):
+        def future(req, **kwargs):
+            assert kwargs["timeout"] == 30.0
+            call = calls[channel] = futures.Future()
+            if channel is channels["b:2"]:
+                call.set_result(echo_pb2.EchoReply(message=req.message, received_at="from b"))
+            return call
+        stub = MagicMock()
+        stub.EchoOnce.future.side_effect = future
+        return stub
+
+    with patch("grpc.secure_channel", side_effect=lambda target, *args, **kwargs: channels[target]), \
+         patch("grpc.intercept_channel", side_effect=lambda channel, *interceptors: channel), \
+         patch("echo_pb2_grpc.EchoStub", side_effect=make_stub):
+        result = node.call(host="a:1, b:2", message="hello", cert_path=cert_path, hedge_delay_ms=10)
+
+    assert result == ("hello", "from b", "")
+    # The slow call on a:1 was cancelled once b:2 answered
+    assert calls[channels["a:1"]].cancelled()
+    assert get_balancer().outstanding("a:1") == get_balancer().outstanding("b:2") == 0
+
+@pytest.mark.parametrize("state", ["backoff", "failed"])
+def test_calls_do_not_wait_for_a_server_that_is_not_starting(node, state):
+    supervisor = MagicMock(ready=False, state=state)
+    supervisor.local_target.return_value = None
+    supervisor.resolve.side_effect = lambda host: host
+
+    with patch("grpc_echo_client.get_server_supervisor", return_value=supervisor):
+        result = node.call(host="localhost:50051", message="hello", cert_path="/missing/cert.pem")
+
+    assert result[1] == "Error"
+    supervisor.wait_ready.assert_not_called()
+
+def test_local_server_is_reached_over_its_socket(node, cert_path):
+    supervisor = MagicMock(ready=True)
+    supervisor.local_target.side_effect = lambda host: "unix:/tmp/echo.sock" if host == "localhost:50051" else None
+    supervisor.resolve.side_effect = lambda host: host
+    mock_stub = MagicMock()
+    mock_stub.EchoOnce.return_value = echo_pb2.EchoReply(message="hello", received_at="now")
+
+    with patch("grpc_echo_client.get_server_supervisor", return_value=supervisor), \
+         patch("grpc.insecure_channel") as mock_insecure_channel, \
+         patch("grpc.secure_channel") as mock_secure_channel, \
+         patch("echo_pb2_grpc.EchoStub", return_value=mock_stub):
+        node.call(host="localhost:50051 (gRPC)", message="hello", cert_path="/missing/cert.pem")
+        node.call(host="remote:50051", message="hello", cert_path=cert_path)
+
+    # No certificate needed for the socket; remote hosts keep TLS
+    assert mock_insecure_channel.call_args.args[0] == "unix:/tmp/echo.sock"
+    assert mock_secure_channel.call_args.args[0] == "remote:50051"
+
+def test_chunked_calls_fit_a_one_megabyte_message_limit(cert_path):
+    from echo_server import EchoService, parse_args, reply_chunk_bytes, server_options
+    import echo_pb2_grpc
+
+    args = parse_args(["--plaintext", "--port", "0", "--max-message-mb", "1"])
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2), options=server_options(args))
+    echo_pb2_grpc.add_EchoServicer_to_server(EchoService(chunk_bytes=reply_chunk_bytes(args)), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    message = "x" * (3 * 1024 * 1024)
+    try:
+        with patch("grpc.secure_channel", lambda target, credentials, options=None: grpc.insecure_channel(target, options)):
+            result, received_at, _ = GRPCEchoNode().call(
+                host=f"127.0.0.1:{port}", message=message, cert_path=cert_path, max_message_mb=1
+            )
+            assert received_at != "Error", result
+            assert result == message
+
+            torch = pytest.importorskip("torch")
+            from grpc_echo_node import GRPCEchoImageNode
+            image = torch.rand(1, 512, 512, 3)
+            echoed, _ = GRPCEchoImageNode().call_tensor(f"127.0.0.1:{port}", image, cert_path, max_message_mb=1)
+            assert torch.equal(echoed, image)
+    finally:
+        server.stop(None)
+
+def test_stream_node_falls_back_to_unary_calls_when_the_server_has_no_room(cert_path):
+    from echo_server import EchoService
+    from grpc_echo_node import GRPCEchoStreamNode
+    import echo_pb2_grpc
+
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    servicer = EchoService(max_streams=0)
+    echo_pb2_grpc.add_EchoServicer_to_server(servicer, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    try:
+        with patch("grpc.secure_channel", lambda target, credentials, options=None: grpc.insecure_channel(target, options)):
+            results = [GRPCEchoStreamNode().call_stream(f"127.0.0.1:{port}", "hello", cert_path)[0] for _ in range(2)]
+    finally:
+        server.stop(None)
+
+    assert results == ["hello", "hello"]
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import sys
+import threading
+from concurrent import futures
+
+import pytest
+from unittest.mock import MagicMock
+import grpc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "server"))
+
+import echo_pb2
+from echo_coalescing import AsyncCoalescer, Coalescer, CoalescingMetrics
+from echo_server import AsyncEchoService, EchoService, echo_batch, make_coalescer, parse_args, request_key
+
+
+def test_single_flight_shares_one_computation():
+    started, release = threading.Event(), threading.Event()
+    batches = []
+
+    def handle_batch(requests):
+        batches.append(requests)
+        started.set()
+        release.wait(5)
+        return [r.upper() for r in requests]
+
+    coalescer = Coalescer(handle_batch, key=lambda r: r)
+    with futures.ThreadPoolExecutor(4) as pool:
+        first = pool.submit(coalescer.submit, "hi")
+        started.wait(5)
+        followers = [pool.submit(coalescer.submit, "hi") for _ in range(3)]
+        while coalescer.metrics.requests.value() < 4:
+            threading.Event().wait(0.001)
+        release.set()
+        replies = [f.result(5) for f in [first] + followers]
+
+    assert replies == ["HI"] * 4
+    assert batches == [["hi"]]
+    assert coalescer.metrics.coalesced.value() == 3
+    assert coalescer.metrics.coalesce_ratio() == 4.0
+    # Done computations are not reused
+    assert coalescer.submit("hi") == "HI" and len(batches) == 2
+
+def test_single_flight_shares_errors():
+    coalescer = Coalescer(MagicMock(side_effect=ValueError("boom")), key=lambda r: r)
+
+    with pytest.raises(ValueError):
+        coalescer.submit("x")
+    with pytest.raises(ValueError):
+        coalescer.submit("x")
+
+def test_micro_batcher_groups_requests_within_window():
+    batches = []
+
+    def handle_batch(requests):
+        batches.append(sorted(requests))
+        return [r * 2 for r in requests]
+
+    coalescer = Coalescer(handle_batch, key=lambda r: r, single_flight=False, batch_window=0.2, max_batch_size=3)
+    with futures.ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(coalescer.submit, [1, 2, 3]))
+
+    # The third request fills the batch, so nobody waits out the window
+    assert results == [2, 4, 6]
+    assert batches == [[1, 2, 3]]
+    assert coalescer.metrics.batch_size.count() == 1
+
+def test_async_coalescer_batches_and_coalesces():
+    batches = []
+
+    def handle_batch(requests):
+        batches.append(requests)
+        return [r + "!" for r in requests]
+
+    async def run():
+        coalescer = AsyncCoalescer(handle_batch, key=lambda r: r, batch_window=0.05)
+        replies = await asyncio.gather(*(coalescer.submit(r) for r in ["a", "b", "a", "a"]))
+        return replies, coalescer.metrics
+
+    replies, metrics = asyncio.run(run())
+    assert replies == ["a!", "b!", "a!", "a!"]
+    assert batches == [["a", "b"]]
+    assert metrics.coalesced.value() == 2
+    assert metrics.coalesce_ratio() == 4.0
+
+def test_async_single_flight_survives_cancelled_caller():
+    async def run():
+        coalescer = AsyncCoalescer(lambda requests: list(requests), key=lambda r: r, batch_window=0.05)
+        first = asyncio.ensure_future(coalescer.submit("x"))
+        second = asyncio.ensure_future(coalescer.submit("x"))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "x"
+
+def test_echo_once_through_coalescer():
+    metrics = CoalescingMetrics()
+    servicer = EchoService(coalescer=Coalescer(echo_batch, request_key, batch_window=0.001, metrics=metrics))
+    context = MagicMock(spec=grpc.ServicerContext)
+
+    reply = servicer.EchoOnce(echo_pb2.EchoRequest(message="hi"), context)
+    servicer.EchoOnce(echo_pb2.EchoRequest(message=""), context)
+
+    assert reply.message == "hi" and reply.received_at
+    context.set_code.assert_called_once_with(grpc.StatusCode.INVALID_ARGUMENT)
+    # Invalid requests are rejected before reaching the coalescer
+    assert metrics.requests.value() == 1
+
+def test_async_echo_once_through_coalescer():
+    coalescer = AsyncCoalescer(echo_batch, request_key, batch_window=0.001)
+    servicer = AsyncEchoService(coalescer=coalescer)
+    context = MagicMock(spec=grpc.ServicerContext)
+
+    reply = asyncio.run(servicer.EchoOnce(echo_pb2.EchoRequest(message="hi"), context))
+
+    assert reply.message == "hi"
+    assert coalescer.metrics.computations.value() == 1
+
+def test_coalescing_flags():
+    assert make_coalescer(parse_args([]), None) is None
+    coalescer = make_coalescer(parse_args(["--coalesce", "--batch-window-ms", "2", "--max-micro-batch", "8"]), None)
+    assert coalescer._single_flight is not None
+    assert (coalescer._batcher.window, coalescer._batcher.max_size) == (0.002, 8)
+    with pytest.raises(SystemExit):
+        parse_args(["--batch-window-ms", "-1"])
@@ -0,0 +1,61 @@
+import os
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "server"))
+
+from echo_config import ConfigError, config_port, config_workers, read_settings
+from echo_server import listen_address, parse_args
+
+
+def test_flags_override_env_which_overrides_the_config_file(tmp_path):
+    config = tmp_path / "echo.toml"
+    config.write_text('port = 50060\nmax-workers = 8\nbind = "127.0.0.1"\naio = true\n')
+    environ = {"COMFYUI_GRPC_SERVER_CONFIG": str(config), "COMFYUI_GRPC_SERVER_MAX_WORKERS": "16"}
+
+    args = parse_args(["--port", "50070"], environ)
+
+    assert (args.port, args.max_workers, args.bind, args.aio) == (50070, 16, "127.0.0.1", True)
+    assert args.drain_grace_s == 5.0
+
+
+def test_json_config_file_and_env_flags(tmp_path):
+    config = tmp_path / "echo.json"
+    config.write_text('{"cert_file": "/certs/echo.pem", "key-file": "/certs/echo.key", "compression": "gzip"}')
+
+    args = parse_args(["--config", str(config)], {"COMFYUI_GRPC_SERVER_PLAINTEXT": "yes"})
+
+    assert (args.cert_file, args.key_file) == (Path("/certs/echo.pem"), Path("/certs/echo.key"))
+    assert (args.compression, args.plaintext) == ("gzip", True)
+    assert not parse_args([], {"COMFYUI_GRPC_SERVER_PLAINTEXT": "0"}).plaintext
+
+
+@pytest.mark.parametrize("environ", [
+    {"COMFYUI_GRPC_SERVER_PORTT": "50052"},
+    {"COMFYUI_GRPC_SERVER_PORT": "fifty"},
+    {"COMFYUI_GRPC_SERVER_COMPRESSION": "brotli"},
+    {"COMFYUI_GRPC_SERVER_AIO": "maybe"},
+    {"COMFYUI_GRPC_SERVER_CONFIG": "/missing/echo.json"},
+])
+def test_invalid_settings_are_rejected(environ):
+    with pytest.raises(SystemExit):
+        parse_args([], environ)
+
+
+def test_launcher_reads_the_same_port(tmp_path):
+    config = tmp_path / "echo.json"
+    config.write_text('{"port": 0}')
+
+    assert config_port(read_settings(environ={})) == 50051
+    assert config_port(read_settings(environ={"COMFYUI_GRPC_SERVER_CONFIG": str(config)})) == 0
+    assert config_port(read_settings(str(config), {"COMFYUI_GRPC_SERVER_PORT": "50061"})) == 50061
+    assert config_workers(read_settings(environ={})) == 1
+    assert config_workers(read_settings(environ={"COMFYUI_GRPC_SERVER_WORKERS": "2"})) == 2
+    with pytest.raises(ConfigError):
+        read_settings(str(tmp_path / "missing.json"), {})
+
+
+def test_listen_address_brackets_ipv6():
+    assert listen_address(parse_args(["--bind", "::", "--port", "50051"], {})) == "[::]:50051"
+    assert listen_address(parse_args([], {})) == "0.0.0.0:50051"
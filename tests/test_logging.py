@@ -0,0 +1,88 @@
+import io
+import json
+import logging
+import os
+import queue
+import sys
+
+import pytest
+from unittest.mock import MagicMock
+import grpc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "server"))
+
+import echo_pb2
+from echo_logging import DroppingQueueHandler, configure_logging, logger, request_log, stop_logging
+from echo_server import EchoService
+
+
+@pytest.fixture
+def log_stream():
+    stream = io.StringIO()
+    yield stream
+    stop_logging()
+    logger.handlers.clear()
+    logger.setLevel(logging.NOTSET)
+
+
+def read_lines(stream):
+    stop_logging()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_logs_are_json_lines_with_fields(log_stream):
+    configure_logging("DEBUG", sample_rate=1.0, stream=log_stream)
+    logger.info("listening on %s", "0.0.0.0:50051")
+    request_log.log("EchoOnce", chars=5)
+
+    info, request = read_lines(log_stream)
+    assert (info["level"], info["logger"], info["msg"]) == ("INFO", "echo", "listening on 0.0.0.0:50051")
+    assert (request["level"], request["msg"], request["chars"]) == ("DEBUG", "EchoOnce", 5)
+    assert request["pid"] == os.getpid()
+
+
+@pytest.mark.parametrize("level, sample_rate", [("INFO", 1.0), ("DEBUG", 0.0)])
+def test_request_logs_follow_level_and_sampling(log_stream, level, sample_rate):
+    configure_logging(level, sample_rate=sample_rate, stream=log_stream)
+    for _ in range(100):
+        request_log.log("EchoOnce", chars=5)
+
+    assert read_lines(log_stream) == []
+
+
+def test_traced_requests_are_always_logged_and_echo_the_trace_id(log_stream):
+    configure_logging("INFO", sample_rate=0.0, stream=log_stream)
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    context = MagicMock(spec=grpc.ServicerContext)
+    context.invocation_metadata.return_value = (("traceparent", f"00-{trace_id}-00f067aa0ba902b7-01"),)
+    EchoService().EchoOnce(echo_pb2.EchoRequest(message="hello"), context)
+
+    (request,) = read_lines(log_stream)
+    assert (request["level"], request["msg"], request["trace_id"]) == ("INFO", "EchoOnce", trace_id)
+    context.set_trailing_metadata.assert_called_once_with((("trace-id", trace_id),))
+
+
+def test_unsampled_traces_follow_the_sample_rate(log_stream):
+    configure_logging("INFO", sample_rate=0.0, stream=log_stream)
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    context = MagicMock(spec=grpc.ServicerContext)
+    context.invocation_metadata.return_value = (("traceparent", f"00-{trace_id}-00f067aa0ba902b7-00"),)
+    EchoService().EchoOnce(echo_pb2.EchoRequest(message="hello"), context)
+
+    assert read_lines(log_stream) == []
+    context.set_trailing_metadata.assert_called_once_with((("trace-id", trace_id),))
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(1))
+    record = logging.LogRecord("echo", logging.INFO, __file__, 1, "msg", None, None)
+    handler.emit(record)
+    handler.emit(record)
+
+    assert handler.dropped == 1
+
+
+def test_echo_once_does_not_print(capsys):
+    EchoService().EchoOnce(echo_pb2.EchoRequest(message="secret prompt"), MagicMock(spec=grpc.ServicerContext))
+
+    assert capsys.readouterr().out == ""
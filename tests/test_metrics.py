@@ -0,0 +1,118 @@
+import asyncio
+import os
+import sys
+import urllib.request
+import pytest
+from unittest.mock import MagicMock, patch
+import grpc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "server"))
+
+import echo_pb2
+from echo_metrics import Histogram, MetricsServerInterceptor, RpcMetrics, start_metrics_http_server
+from echo_server import EchoService, parse_args, start_metrics
+from grpc_metrics import AioMetricsClientInterceptor, MetricsClientInterceptor
+
+@pytest.fixture
+def metrics():
+    return RpcMetrics("test")
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency", "Latency.", ("method",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "a")
+    histogram.observe(0.5, "a")
+    histogram.observe(5.0, "a")
+
+    rendered = "\n".join(histogram.render())
+    assert 'latency_bucket{method="a",le="0.1"} 1' in rendered
+    assert 'latency_bucket{method="a",le="1.0"} 2' in rendered
+    assert 'latency_bucket{method="a",le="+Inf"} 3' in rendered
+    assert 'latency_count{method="a"} 3' in rendered
+
+def test_server_interceptor_records_status_from_context(metrics):
+    servicer = EchoService()
+    handler = grpc.unary_unary_rpc_method_handler(servicer.EchoOnce)
+    details = MagicMock(method="/echo.Echo/EchoOnce")
+    wrapped = MetricsServerInterceptor(metrics).intercept_service(lambda d: handler, details)
+
+    context = MagicMock(spec=grpc.ServicerContext)
+    context.code.return_value = None
+    wrapped.unary_unary(echo_pb2.EchoRequest(message="hi"), context)
+    # EchoOnce reports validation errors via set_code, not by raising
+    context.code.return_value = grpc.StatusCode.INVALID_ARGUMENT
+    wrapped.unary_unary(echo_pb2.EchoRequest(message=""), context)
+
+    assert metrics.requests.value("/echo.Echo/EchoOnce", "OK") == 1
+    assert metrics.requests.value("/echo.Echo/EchoOnce", "INVALID_ARGUMENT") == 1
+    assert metrics.duration.count("/echo.Echo/EchoOnce") == 2
+    assert metrics.request_bytes.value("/echo.Echo/EchoOnce") == echo_pb2.EchoRequest(message="hi").ByteSize()
+
+def test_client_interceptor_records_completed_calls(metrics):
+    response = echo_pb2.EchoReply(message="hi", received_at="now")
+    outcome = MagicMock()
+    outcome.code.return_value = grpc.StatusCode.OK
+    outcome.result.return_value = response
+    outcome.add_done_callback.side_effect = lambda callback: callback(outcome)
+
+    details = MagicMock(method="/echo.Echo/EchoOnce")
+    MetricsClientInterceptor(metrics).intercept_unary_unary(
+        lambda d, r: outcome, details, echo_pb2.EchoRequest(message="hi")
+    )
+
+    assert metrics.requests.value("/echo.Echo/EchoOnce", "OK") == 1
+    assert metrics.response_bytes.value("/echo.Echo/EchoOnce") == response.ByteSize()
+    assert 'test_requests_total{method="/echo.Echo/EchoOnce",code="OK"} 1' in metrics.render()
+
+
+def test_metrics_endpoint_listens_on_the_bind_address():
+    args = parse_args(["--bind", "127.0.0.1", "--metrics-port", "0"], {})
+    with patch("echo_server.start_metrics_http_server") as start_http:
+        start_metrics(args)
+    start_http.assert_called_once()
+    assert start_http.call_args.args[1:] == (0, "127.0.0.1")
+
+    httpd = start_metrics_http_server(RpcMetrics("test"), 0, "127.0.0.1")
+    try:
+        assert httpd.server_address[0] == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{httpd.server_address[1]}/metrics", timeout=5) as response:
+            assert response.status == 200
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_metrics_endpoint_logs_the_port_it_bound():
+    args = parse_args(["--bind", "127.0.0.1", "--metrics-port", "0"], {})
+    servers = []
+
+    def start_http(*args):
+        servers.append(start_metrics_http_server(*args))
+        return servers[-1]
+
+    with patch("echo_server.start_metrics_http_server", side_effect=start_http), \
+         patch("echo_server.logger") as logger:
+        start_metrics(args)
+    try:
+        port = servers[0].server_address[1]
+        assert port != 0
+        assert logger.info.call_args.args[-1] == port
+    finally:
+        servers[0].shutdown()
+        servers[0].server_close()
+
+
+def test_aio_client_interceptor_records_cancelled_calls(metrics):
+    async def cancelled_call():
+        raise asyncio.CancelledError()
+
+    async def continuation(details, request):
+        return cancelled_call()
+
+    details = MagicMock(method="/echo.Echo/EchoOnce")
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(AioMetricsClientInterceptor(metrics).intercept_unary_unary(
+            continuation, details, echo_pb2.EchoRequest(message="hi")))
+
+    assert metrics.requests.value("/echo.Echo/EchoOnce", "CANCELLED") == 1
+    assert metrics.requests.value("/echo.Echo/EchoOnce", "UNKNOWN") == 0
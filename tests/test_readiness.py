@@ -0,0 +1,40 @@
+import asyncio
+import os
+import socket
+import sys
+
+import grpc
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from grpc_readiness import EndpointNotReady, ReadinessCache
+
+
+@pytest.fixture
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_unreachable_endpoint_reports_the_connection_error(closed_port):
+    endpoint = f"127.0.0.1:{closed_port}"
+    with grpc.insecure_channel(endpoint) as channel, pytest.raises(EndpointNotReady) as error:
+        ReadinessCache().ensure_ready(endpoint, channel, timeout=0.5)
+
+    # Nothing listens on the port, and the message says so rather than only timing out
+    assert str(error.value).startswith(f"Server at {endpoint} not reachable within 0.5s: ")
+    assert "connect" in str(error.value).lower()
+
+
+def test_unreachable_endpoint_reports_the_connection_error_async(closed_port):
+    endpoint = f"127.0.0.1:{closed_port}"
+
+    async def ensure_ready():
+        async with grpc.aio.insecure_channel(endpoint) as channel:
+            await ReadinessCache().ensure_ready_async(endpoint, channel, timeout=0.5)
+
+    with pytest.raises(EndpointNotReady) as error:
+        asyncio.run(ensure_ready())
+    assert "connect" in str(error.value).split("0.5s: ", 1)[1].lower()
@@ -0,0 +1,42 @@
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from grpc_response_cache import ResponseCache
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", ("a", "now"), ttl=60)
+    cache.put("b", ("b", "now"), ttl=60)
+    cache.get("a")
+    cache.put("c", ("c", "now"), ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == ("a", "now")
+    assert cache.get("c") == ("c", "now")
+
+
+def test_cache_respects_byte_cap():
+    cache = ResponseCache(max_bytes=8)
+    cache.put("a", ("aaaa", "1"), ttl=60)
+    cache.put("b", ("bbbb", "2"), ttl=60)
+    # Larger than the whole cache: never stored
+    cache.put("c", ("c" * 10, "3"), ttl=60)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == ("bbbb", "2")
+    assert cache.get("c") is None
+
+
+def test_cache_expires_entries():
+    cache = ResponseCache()
+    with patch("grpc_response_cache.time.monotonic", return_value=100.0):
+        cache.put("a", ("a", "now"), ttl=5)
+        assert cache.stamp("a") == 100.0
+    with patch("grpc_response_cache.time.monotonic", return_value=105.0):
+        assert cache.get("a") is None
+        assert cache.stamp("a") is None
+    assert len(cache) == 0
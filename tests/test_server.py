@@ -1,5 +1,8 @@
+import asyncio
 import os
+import socket
 import sys
+from concurrent import futures
 import pytest
 from unittest.mock import MagicMock
 import grpc
@@ -8,7 +11,18 @@ import grpc
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", "server"))
 
 import echo_pb2
-from echo_server import EchoService
+import echo_pb2_grpc
+from echo_server import (
+    ECHO_SERVICE_NAME,
+    AsyncEchoService,
+    EchoService,
+    build_arg_parser,
+    configure_server,
+    parse_args,
+    remove_stale_unix_socket,
+    server_options,
+)
+from grpc_health.v1 import health, health_pb2, health_pb2_grpc
 
 @pytest.fixture
 def servicer():
@@ -35,3 +49,222 @@ def test_echo_once_empty_message(servicer, mock_context):
     mock_context.set_code.assert_called_once_with(grpc.StatusCode.INVALID_ARGUMENT)
     mock_context.set_details.assert_called_once()
     assert response.message == ""
+
+def test_echo_many_per_item_status(servicer, mock_context):
+    request = echo_pb2.EchoBatchRequest(requests=[
+        echo_pb2.EchoRequest(message="first"),
+        echo_pb2.EchoRequest(message=""),
+        echo_pb2.EchoRequest(message="third"),
+    ])
+    response = servicer.EchoMany(request, mock_context)
+
+    assert [item.reply.message for item in response.items] == ["first", "", "third"]
+    assert [item.code for item in response.items] == [0, grpc.StatusCode.INVALID_ARGUMENT.value[0], 0]
+    assert response.items[1].details != ""
+    mock_context.set_code.assert_not_called()
+
+def test_echo_many_rejects_oversized_batch(servicer, mock_context):
+    from echo_server import MAX_BATCH_SIZE
+    request = echo_pb2.EchoBatchRequest(
+        requests=[echo_pb2.EchoRequest(message="x")] * (MAX_BATCH_SIZE + 1)
+    )
+    response = servicer.EchoMany(request, mock_context)
+
+    mock_context.set_code.assert_called_once_with(grpc.StatusCode.INVALID_ARGUMENT)
+    assert len(response.items) == 0
+
+def test_echo_stream_correlates_by_request_id(servicer, mock_context):
+    requests = iter([
+        echo_pb2.EchoRequest(message="a", request_id="1"),
+        echo_pb2.EchoRequest(message="", request_id="2"),
+    ])
+    replies = list(servicer.EchoStream(requests, mock_context))
+
+    assert [r.request_id for r in replies] == ["1", "2"]
+    assert replies[0].reply.message == "a"
+    assert replies[1].code == grpc.StatusCode.INVALID_ARGUMENT.value[0]
+
+def test_echo_chunked_reassembles_message(mock_context):
+    data = "é".encode("utf-8") * 1_500_000
+    chunks = [echo_pb2.EchoChunk(data=data[i:i + 1_000_000]) for i in range(0, len(data), 1_000_000)]
+    chunks[-1].last = True
+
+    replies = list(EchoService().EchoChunked(iter(chunks), mock_context))
+
+    assert b"".join(r.data for r in replies) == data
+    assert [r.last for r in replies] == [False, False, True]
+    assert replies[-1].received_at and not replies[0].received_at
+
+def test_echo_chunked_enforces_limit(mock_context):
+    mock_context.abort.side_effect = grpc.RpcError()
+    chunks = [echo_pb2.EchoChunk(data=b"x" * 10), echo_pb2.EchoChunk(data=b"x" * 10, last=True)]
+
+    with pytest.raises(grpc.RpcError):
+        list(EchoService(max_chunked_bytes=15).EchoChunked(iter(chunks), mock_context))
+    mock_context.abort.assert_called_once_with(grpc.StatusCode.RESOURCE_EXHAUSTED, "Chunked message exceeds limit of 15 bytes.")
+
+def test_async_echo_once_success(mock_context):
+    request = echo_pb2.EchoRequest(message="Hello aio")
+    response = asyncio.run(AsyncEchoService().EchoOnce(request, mock_context))
+
+    assert response.message == "Hello aio"
+    mock_context.set_code.assert_not_called()
+
+def test_async_echo_stream(mock_context):
+    async def requests():
+        yield echo_pb2.EchoRequest(message="a", request_id="1")
+        yield echo_pb2.EchoRequest(message="b", request_id="2")
+
+    async def collect():
+        return [r async for r in AsyncEchoService().EchoStream(requests(), mock_context)]
+
+    replies = asyncio.run(collect())
+    assert [(r.request_id, r.reply.message) for r in replies] == [("1", "a"), ("2", "b")]
+
+def test_server_options_from_flags():
+    args = build_arg_parser().parse_args(["--aio", "--keepalive-time-ms", "30000"])
+
+    assert args.aio
+    assert args.max_workers == 4
+    assert ("grpc.keepalive_time_ms", 30000) in server_options(args)
+    assert ("grpc.max_receive_message_length", 64 * 1024 * 1024) in server_options(args)
+
+def test_connection_tuning_flags():
+    options = server_options(parse_args([
+        "--max-concurrent-streams", "100", "--http2-lookahead-kb", "1024",
+        "--no-bdp-probe", "--max-ping-strikes", "0",
+    ]))
+
+    assert ("grpc.max_concurrent_streams", 100) in options
+    assert ("grpc.http2.lookahead_bytes", 1024 * 1024) in options
+    assert ("grpc.http2.bdp_probe", 0) in options
+    assert ("grpc.http2.max_ping_strikes", 0) in options
+
+def test_idle_client_pings_permitted_by_default():
+    options = server_options(parse_args([]))
+
+    assert ("grpc.http2.min_recv_ping_interval_without_data_ms", 10000) in options
+    assert ("grpc.keepalive_permit_without_calls", 1) in options
+    assert not any(name == "grpc.max_concurrent_streams" for name, _ in options)
+
+def test_message_size_limit_flag():
+    options = server_options(parse_args(["--max-message-mb", "8"]))
+
+    assert ("grpc.max_receive_message_length", 8 * 1024 * 1024) in options
+    assert ("grpc.max_send_message_length", 8 * 1024 * 1024) in options
+    with pytest.raises(SystemExit):
+        parse_args(["--max-message-mb", "4096"])
+
+def test_workers_share_port_with_so_reuseport():
+    if os.name == "nt":
+        pytest.skip("SO_REUSEPORT is not available on Windows")
+    args = parse_args(["--workers", "4"])
+
+    assert ("grpc.so_reuseport", 1) in server_options(args)
+    assert ("grpc.so_reuseport", 1) not in server_options(parse_args([]))
+
+def test_workers_must_be_positive():
+    with pytest.raises(SystemExit):
+        parse_args(["--workers", "0"])
+
+def test_health_service_reports_serving_until_shutdown():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    health_servicer = health.HealthServicer()
+    configure_server(server, EchoService(), health_servicer, parse_args(["--plaintext", "--port", str(port)]))
+    server.start()
+    health_servicer.set(ECHO_SERVICE_NAME, health_pb2.HealthCheckResponse.SERVING)
+    try:
+        with grpc.insecure_channel(f"localhost:{port}") as channel:
+            stub = health_pb2_grpc.HealthStub(channel)
+            check = lambda service: stub.Check(health_pb2.HealthCheckRequest(service=service), timeout=5).status
+
+            assert check("") == health_pb2.HealthCheckResponse.SERVING
+            assert check(ECHO_SERVICE_NAME) == health_pb2.HealthCheckResponse.SERVING
+            health_servicer.enter_graceful_shutdown()
+            assert check(ECHO_SERVICE_NAME) == health_pb2.HealthCheckResponse.NOT_SERVING
+    finally:
+        server.stop(None)
+
+@pytest.mark.skipif(os.name == "nt", reason="Unix domain sockets")
+def test_server_also_listens_on_unix_socket(tmp_path):
+    socket_path = tmp_path / "echo.sock"
+    # Left behind by a killed server
+    socket_path.write_text("")
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    args = parse_args(["--plaintext", "--port", "0", "--uds", str(socket_path)])
+    listener = configure_server(server, EchoService(), health.HealthServicer(), args)
+    server.start()
+    try:
+        with grpc.insecure_channel(f"unix:{socket_path}") as channel:
+            reply = echo_pb2_grpc.EchoStub(channel).EchoOnce(echo_pb2.EchoRequest(message="hi"), timeout=5)
+        assert reply.message == "hi"
+        assert f"unix:{socket_path}" in listener
+    finally:
+        server.stop(None)
+
+@pytest.mark.skipif(os.name == "nt", reason="Unix domain sockets")
+def test_new_server_takes_over_unix_socket(tmp_path):
+    socket_path = tmp_path / "echo.sock"
+    args = parse_args(["--plaintext", "--port", "0", "--uds", str(socket_path)])
+    old, new = (grpc.server(futures.ThreadPoolExecutor(max_workers=2)) for _ in range(2))
+    for server in (old, new):
+        configure_server(server, EchoService(), health.HealthServicer(), args)
+        server.start()
+    try:
+        # The old server stopping must not remove the socket its successor listens on
+        old.stop(None).wait()
+        remove_stale_unix_socket(socket_path)
+        with grpc.insecure_channel(f"unix:{socket_path}") as channel:
+            reply = echo_pb2_grpc.EchoStub(channel).EchoOnce(echo_pb2.EchoRequest(message="hi"), timeout=5)
+        assert reply.message == "hi"
+    finally:
+        new.stop(None).wait()
+    remove_stale_unix_socket(socket_path)
+    assert not socket_path.exists()
+
+def test_port_zero_binds_a_free_port():
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    args = parse_args(["--plaintext", "--port", "0", "--bind", "127.0.0.1"])
+    listener = configure_server(server, EchoService(), health.HealthServicer(), args)
+    server.start()
+    try:
+        assert args.port != 0
+        assert listener == f"127.0.0.1:{args.port} (plaintext)"
+        with grpc.insecure_channel(f"127.0.0.1:{args.port}") as channel:
+            reply = echo_pb2_grpc.EchoStub(channel).EchoOnce(echo_pb2.EchoRequest(message="hi"), timeout=5)
+        assert reply.message == "hi"
+    finally:
+        server.stop(None)
+    with pytest.raises(SystemExit):
+        parse_args(["--port", "0", "--workers", "2"])
+
+def test_drain_grace_flag():
+    assert parse_args([]).drain_grace_s == 5.0
+    assert parse_args(["--drain-grace-s", "30"]).drain_grace_s == 30.0
+    with pytest.raises(SystemExit):
+        parse_args(["--drain-grace-s", "-1"])
+
+def test_unix_socket_needs_single_process():
+    with pytest.raises(SystemExit):
+        parse_args(["--uds", "/tmp/echo.sock", "--workers", "2"])
+
+
+def test_echo_once_tensor_payload(servicer, mock_context):
+    tensor = echo_pb2.Tensor(data=bytes(24), dtype="float32", shape=[2, 3])
+    response = servicer.EchoOnce(echo_pb2.EchoRequest(tensor=tensor), mock_context)
+
+    mock_context.set_code.assert_not_called()
+    assert response.tensor == tensor
+    assert response.received_at != ""
+
+@pytest.mark.parametrize("tensor", [
+    echo_pb2.Tensor(data=bytes(20), dtype="float32", shape=[2, 3]),
+    echo_pb2.Tensor(data=bytes(6), dtype="complex64", shape=[6]),
+])
+def test_echo_once_rejects_inconsistent_tensor(servicer, mock_context, tensor):
+    servicer.EchoOnce(echo_pb2.EchoRequest(tensor=tensor), mock_context)
+
+    mock_context.set_code.assert_called_once_with(grpc.StatusCode.INVALID_ARGUMENT)
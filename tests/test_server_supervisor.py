@@ -0,0 +1,274 @@
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import sys
+import textwrap
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from grpc_server_supervisor import BACKOFF, EXTERNAL, FAILED, READY, STOPPED, ServerSupervisor, private_socket_dir
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def fake_server(tmp_path):
+    """A stand-in for echo_server.py that crashes on its first `crashes` starts."""
+    def make(crashes=0):
+        script = tmp_path / "fake_server.py"
+        script.write_text(textwrap.dedent(f"""
+            import pathlib, sys, time
+            starts = pathlib.Path({str(tmp_path / "starts")!r})
+            count = int(starts.read_text()) + 1 if starts.exists() else 1
+            starts.write_text(str(count))
+            print(f"start {{count}}")
+            if count <= {crashes}:
+                sys.exit(3)
+            print("Server: Ready on test")
+            time.sleep(60)
+        """))
+        return [sys.executable, str(script)]
+    return make
+
+
+@pytest.fixture
+def make_supervisor(tmp_path):
+    supervisors = []
+
+    def make(cmd, port=None, **kwargs):
+        supervisor = ServerSupervisor(cmd, cwd=str(tmp_path), port=free_port() if port is None else port,
+                                      log_path=str(tmp_path / "logs" / "server.log"), **kwargs)
+        supervisors.append(supervisor)
+        return supervisor
+
+    yield make
+    for supervisor in supervisors:
+        supervisor.stop()
+
+
+def test_supervisor_waits_for_ready_line(fake_server, make_supervisor, tmp_path):
+    supervisor = make_supervisor(fake_server())
+    supervisor.start()
+
+    assert supervisor.wait_ready(timeout=10)
+    status = supervisor.status()
+    assert status["state"] == READY
+    assert status["pid"] is not None
+    assert status["restarts"] == 0
+
+    supervisor.stop()
+    assert supervisor.status()["state"] == STOPPED
+    assert supervisor.status()["pid"] is None
+    log = (tmp_path / "logs" / "server.log").read_text()
+    assert "start 1" in log and "Server: Ready on test" in log
+
+
+def test_supervisor_restarts_with_backoff(fake_server, make_supervisor, tmp_path):
+    supervisor = make_supervisor(fake_server(crashes=2), initial_backoff=0.05)
+    start = time.monotonic()
+    supervisor.start()
+
+    assert supervisor.wait_ready(timeout=10)
+    # Two crashes: waits of 0.05s then 0.1s before the third start
+    assert time.monotonic() - start >= 0.15
+    assert supervisor.restarts == 2
+    assert supervisor.last_exit_code == 3
+    assert "Exited with code 3, restarting in 0.1s" in (tmp_path / "logs" / "server.log").read_text()
+
+
+def test_supervisor_kills_server_that_never_gets_ready(make_supervisor):
+    supervisor = make_supervisor([sys.executable, "-c", "import time; time.sleep(60)"],
+                                 ready_timeout=0.2, initial_backoff=30)
+    supervisor.start()
+
+    deadline = time.monotonic() + 10
+    while supervisor.state != BACKOFF and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert supervisor.state == BACKOFF
+    assert not supervisor.ready
+
+
+def test_supervisor_gives_up_when_the_command_cannot_run(make_supervisor, tmp_path):
+    supervisor = make_supervisor([str(tmp_path / "missing" / "uv"), "run", "echo_server.py"], initial_backoff=0.01)
+    supervisor.start()
+    supervisor._thread.join(timeout=10)
+
+    assert not supervisor._thread.is_alive()
+    assert supervisor.state == FAILED
+    assert supervisor.restarts == 0
+    assert (tmp_path / "logs" / "server.log").read_text().count("failed to start") == 1
+
+
+def test_supervisor_uses_server_already_on_port(make_supervisor):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        supervisor = make_supervisor([sys.executable, "-c", "raise SystemExit(1)"])
+        supervisor.port = listener.getsockname()[1]
+        supervisor.start()
+
+        assert supervisor.wait_ready(timeout=5)
+        assert supervisor.status()["state"] == EXTERNAL
+        assert supervisor.status()["pid"] is None
+
+
+def test_supervisor_serves_local_targets_only(make_supervisor):
+    supervisor = make_supervisor([sys.executable])
+    port = supervisor.port
+
+    assert supervisor.serves(f"localhost:{port}")
+    assert supervisor.serves(f"127.0.0.1:{port}")
+    assert not supervisor.serves(f"example.com:{port}")
+    assert not supervisor.serves("localhost:1")
+
+
+def test_supervisor_learns_the_port_the_server_picked(make_supervisor):
+    supervisor = make_supervisor(
+        [sys.executable, "-c", "import time; print('Server: Ready on port 43210', flush=True); time.sleep(60)"],
+        port=0,
+    )
+    supervisor.start()
+
+    assert supervisor.wait_ready(timeout=10)
+    assert supervisor.status()["port"] == 43210
+    # Nodes keep their default host and are sent to the picked port
+    assert supervisor.resolve("localhost:50051") == "localhost:43210"
+    assert supervisor.resolve("127.0.0.1:43210") == "127.0.0.1:43210"
+    assert supervisor.resolve("example.com:50051") == "example.com:50051"
+
+
+def test_supervisor_routes_local_targets_to_its_socket(make_supervisor, tmp_path):
+    supervisor = make_supervisor([sys.executable])
+    supervisor.uds_path = str(tmp_path / "echo.sock")
+    port = supervisor.port
+
+    # Not until the server has created the socket
+    assert supervisor.local_target(f"localhost:{port}") is None
+    with socket.socket(socket.AF_UNIX) as listener:
+        listener.bind(supervisor.uds_path)
+        assert supervisor.local_target(f"localhost:{port}") == f"unix:{tmp_path / 'echo.sock'}"
+        assert supervisor.local_target(f"example.com:{port}") is None
+
+        if os.getuid() == 0:
+            # A socket someone else put there would receive the calls unencrypted
+            os.chown(supervisor.uds_path, 1, -1)
+            assert supervisor.local_target(f"localhost:{port}") is None
+
+
+def test_supervisor_ignores_a_file_that_is_not_a_socket(make_supervisor, tmp_path):
+    supervisor = make_supervisor([sys.executable])
+    supervisor.uds_path = str(tmp_path / "echo.sock")
+    (tmp_path / "echo.sock").write_text("")
+
+    assert supervisor.local_target(f"localhost:{supervisor.port}") is None
+
+
+def test_socket_dir_is_private_to_the_user(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+
+    path = private_socket_dir()
+
+    assert path == str(tmp_path / f"comfyui-grpc-{os.getuid()}")
+    assert os.stat(path).st_mode & 0o777 == 0o700
+    assert private_socket_dir() == path
+
+
+def test_socket_dir_is_refused_when_others_can_write_to_it(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    shared = tmp_path / f"comfyui-grpc-{os.getuid()}"
+    shared.mkdir()
+    shared.chmod(0o777)
+
+    assert private_socket_dir() is None
+
+
+def test_supervisor_hands_off_to_a_new_server(fake_server, make_supervisor, tmp_path):
+    supervisor = make_supervisor(fake_server())
+    supervisor.start()
+    assert supervisor.wait_ready(timeout=10)
+    old_process = supervisor._process
+
+    assert supervisor.handoff()
+    # The old server is only stopped once its successor is ready
+    assert old_process.wait(timeout=10) is not None
+    status = supervisor.status()
+    assert status["state"] == READY
+    assert status["pid"] not in (None, old_process.pid)
+    assert status["restarts"] == 0
+    log = (tmp_path / "logs" / "server.log").read_text()
+    assert "start 2" in log and f"handed off from pid {old_process.pid}" in log
+
+
+def test_supervisor_keeps_server_when_handoff_fails(fake_server, make_supervisor):
+    # The replacement exits before it gets ready, e.g. because it cannot bind the port
+    supervisor = make_supervisor(fake_server())
+    supervisor.start()
+    assert supervisor.wait_ready(timeout=10)
+    pid = supervisor.status()["pid"]
+    supervisor.cmd = [sys.executable, "-c", "raise SystemExit(1)"]
+
+    assert not supervisor.handoff()
+    assert supervisor.status()["pid"] == pid
+    assert supervisor.status()["state"] == READY
+
+
+@pytest.fixture
+def launcher(monkeypatch):
+    """The package's __init__.py, with start_server handing its command to a mock supervisor."""
+    for name in [name for name in os.environ if name.startswith("COMFYUI_GRPC_")]:
+        monkeypatch.delenv(name)
+    path = os.path.join(os.path.dirname(__file__), "..", "__init__.py")
+    spec = importlib.util.spec_from_file_location("comfyui_grpc_launcher", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, "start_server_supervisor", MagicMock())
+    monkeypatch.setattr(module, "private_socket_dir", lambda: "/run/user/1000/comfyui-grpc-1000")
+    return module
+
+
+@pytest.mark.skipif(os.name == "nt", reason="Unix domain sockets")
+def test_launcher_only_adds_a_socket_for_a_single_server_process(launcher, monkeypatch):
+    launcher.start_server()
+    cmd = launcher.start_server_supervisor.call_args.args[0]
+    assert cmd[cmd.index("--uds") + 1] == "/run/user/1000/comfyui-grpc-1000/comfyui_grpc_echo_50051.sock"
+
+    # echo_server.py refuses --uds with --workers, and would be restarted forever
+    monkeypatch.setenv("COMFYUI_GRPC_SERVER_WORKERS", "2")
+    launcher.start_server()
+    assert "--uds" not in launcher.start_server_supervisor.call_args.args[0]
+    assert launcher.start_server_supervisor.call_args.kwargs["uds_path"] is None
+
+
+def test_launcher_does_not_start_a_server_that_would_refuse_its_settings(launcher, monkeypatch):
+    monkeypatch.setenv("COMFYUI_GRPC_SERVER_WORKERS", "2")
+    monkeypatch.setenv("COMFYUI_GRPC_SERVER_PORT", "0")
+
+    assert launcher.start_server() is None
+    launcher.start_server_supervisor.assert_not_called()
+
+
+def test_restart_route_hands_off_and_reports_the_new_status():
+    from grpc_echo_node import restart_server_api
+
+    supervisor = MagicMock()
+    supervisor.handoff.return_value = True
+    supervisor.status.return_value = {"state": READY, "pid": 4321}
+    with patch("grpc_echo_node.get_server_supervisor", return_value=supervisor):
+        response = asyncio.run(restart_server_api(MagicMock()))
+
+    supervisor.handoff.assert_called_once_with()
+    assert json.loads(response.text) == {"state": READY, "pid": 4321, "restarted": True}
+
+    with patch("grpc_echo_node.get_server_supervisor", return_value=None):
+        response = asyncio.run(restart_server_api(MagicMock()))
+    assert json.loads(response.text) == {"state": "disabled", "restarted": False}
@@ -0,0 +1,121 @@
+import os
+import sys
+import threading
+from concurrent import futures
+import grpc
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "server"))
+
+import echo_pb2
+import echo_pb2_grpc
+from echo_server import EchoService, parse_args
+from grpc_stream_session import EchoStreamSession, StreamClosed, StreamRejected, get_stream_session
+
+class FakeCall:
+    """Stand-in for a bidi call: wraps a reply generator and supports cancel()."""
+
+    def __init__(self, replies):
+        self._replies = replies
+
+    def __iter__(self):
+        return iter(self._replies)
+
+    def cancel(self):
+        pass
+
+def reversing_server(batch):
+    """Reply to each group of `batch` requests in reverse order."""
+    def open_stream(requests):
+        def replies():
+            received = []
+            for request in requests:
+                received.append(request)
+                if len(received) == batch:
+                    for r in reversed(received):
+                        yield echo_pb2.EchoStreamReply(
+                            request_id=r.request_id,
+                            reply=echo_pb2.EchoReply(message=r.message),
+                        )
+                    received = []
+        return FakeCall(replies())
+    return open_stream
+
+def test_replies_are_correlated_by_request_id():
+    session = EchoStreamSession(reversing_server(batch=3))
+    futures = [session.submit(echo_pb2.EchoRequest(message=m)) for m in ("a", "b", "c")]
+
+    assert [f.result(timeout=5).reply.message for f in futures] == ["a", "b", "c"]
+    session.close()
+
+def test_submit_blocks_when_in_flight_limit_reached():
+    release = threading.Event()
+
+    def stalled_server(requests):
+        def replies():
+            for request in requests:
+                release.wait()
+                yield echo_pb2.EchoStreamReply(request_id=request.request_id)
+        return FakeCall(replies())
+
+    session = EchoStreamSession(stalled_server, max_in_flight=2)
+    first = session.submit(echo_pb2.EchoRequest(message="1"))
+    session.submit(echo_pb2.EchoRequest(message="2"))
+
+    with pytest.raises(TimeoutError):
+        session.submit(echo_pb2.EchoRequest(message="3"), timeout=0.1)
+
+    release.set()
+    first.result(timeout=5)
+    # A slot was freed by the reply, so the next submit goes through
+    session.submit(echo_pb2.EchoRequest(message="3"), timeout=5).result(timeout=5)
+    session.close()
+
+def test_pending_requests_fail_when_stream_ends():
+    def closing_server(requests):
+        def replies():
+            next(iter(requests))
+            return
+            yield
+        return FakeCall(replies())
+
+    session = EchoStreamSession(closing_server)
+    future = session.submit(echo_pb2.EchoRequest(message="lost"))
+
+    with pytest.raises(StreamClosed):
+        future.result(timeout=5)
+    assert session.closed
+    with pytest.raises(StreamClosed):
+        session.submit(echo_pb2.EchoRequest(message="late"))
+
+def test_streams_beyond_the_limit_leave_workers_for_unary_calls():
+    args = parse_args(["--plaintext", "--port", "0"])
+    server = grpc.server(futures.ThreadPoolExecutor(args.max_workers))
+    echo_pb2_grpc.add_EchoServicer_to_server(EchoService(max_streams=args.max_streams), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    channels = [grpc.insecure_channel(f"127.0.0.1:{port}") for _ in range(args.max_workers + 1)]
+    try:
+        sessions = [get_stream_session(channel, echo_pb2_grpc.EchoStub(channel).EchoStream) for channel in channels]
+        outcomes = []
+        for session in sessions:
+            try:
+                outcomes.append(session.echo(echo_pb2.EchoRequest(message="hi"), timeout=5).reply.message)
+            except StreamRejected:
+                outcomes.append("rejected")
+
+        assert outcomes.count("hi") == args.max_streams
+        assert outcomes.count("rejected") == len(sessions) - args.max_streams
+        # With every allowed stream open, unary calls still get a worker
+        reply = echo_pb2_grpc.EchoStub(channels[0]).EchoOnce(echo_pb2.EchoRequest(message="once"), timeout=5)
+        assert reply.message == "once"
+        # A rejected session is kept for a while, so requests fail fast instead of opening new streams
+        rejected = outcomes.index("rejected")
+        assert get_stream_session(channels[rejected], None) is sessions[rejected]
+        with pytest.raises(StreamRejected):
+            sessions[rejected].submit(echo_pb2.EchoRequest(message="again"))
+    finally:
+        for channel in channels:
+            channel.close()
+        server.stop(None)
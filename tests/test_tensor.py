@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from grpc_tensor import array_from_buffer, tensor_from_buffer, tensor_to_buffer
+
+np = pytest.importorskip("numpy")
+
+
+def test_array_from_buffer_is_a_view():
+    data = np.arange(6, dtype=np.float32).tobytes()
+    array = array_from_buffer(data, "float32", [2, 3])
+
+    assert array.shape == (2, 3)
+    assert array[1, 2] == 5.0
+    # A reshaped view of the frombuffer array, which wraps the bytes themselves
+    assert array.base.base is data
+    assert not array.flags.writeable
+
+
+def test_torch_round_trip():
+    torch = pytest.importorskip("torch")
+    for tensor in (torch.rand(1, 4, 4, 3), torch.rand(2, 4, 8, 8).to(torch.bfloat16)):
+        data, dtype, shape = tensor_to_buffer(tensor.permute(0, 1, 3, 2))
+        result = tensor_from_buffer(data, dtype, shape)
+
+        assert result.dtype == tensor.dtype
+        assert torch.equal(result, tensor.permute(0, 1, 3, 2))
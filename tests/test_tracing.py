@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+import sys
+from concurrent import futures
+import pytest
+from unittest.mock import patch
+import grpc
+
+# Add root directory to path to import generated files and the node
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "server"))
+
+from grpc_echo_node import GRPCEchoNode
+from grpc_tracing import NULL_TRACE, FileSpanExporter, Trace, finish_trace, set_trace_exporter, start_trace
+import echo_pb2_grpc
+from echo_server import EchoService
+
+
+pytestmark = pytest.mark.usefixtures("clean_pool")
+
+
+@pytest.fixture
+def host():
+    """A real echo server; the client's TLS channels are swapped for plaintext ones to reach it."""
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=2))
+    echo_pb2_grpc.add_EchoServicer_to_server(EchoService(), server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    with patch("grpc.secure_channel", lambda target, credentials, options=None: grpc.insecure_channel(target, options)), \
+         patch("grpc.aio.secure_channel", lambda target, credentials, options=None, **kwargs: grpc.aio.insecure_channel(target, options, **kwargs)), \
+         patch("grpc_readiness.check_health", return_value=True):
+        yield f"127.0.0.1:{port}"
+    server.stop(None)
+
+
+def test_untraced_calls_output_no_trace(host, cert_path):
+    assert start_trace("EchoOnce") is NULL_TRACE
+    assert finish_trace(NULL_TRACE) == ""
+
+    message, received_at, trace = GRPCEchoNode().call(host=host, message="hello", cert_path=cert_path)
+
+    assert (message, trace) == ("hello", "")
+
+
+def test_traced_call_reports_phases_and_server_trace_id(host, cert_path):
+    _, _, output = GRPCEchoNode().call(host=host, message="hello", cert_path=cert_path, trace=True)
+    trace = json.loads(output)
+
+    assert set(trace["phases_ms"]) == {"credentials", "connect", "rpc", "serialize", "deserialize"}
+    assert trace["server_trace_id"] == trace["trace_id"]
+    assert (trace["endpoint"], trace["error"]) == (host, None)
+
+
+def test_traced_async_call_gets_server_trace_id(host, cert_path):
+    _, _, output = asyncio.run(GRPCEchoNode().call_async(host=host, message="hello", cert_path=cert_path, trace=True))
+    trace = json.loads(output)
+
+    assert trace["server_trace_id"] == trace["trace_id"]
+    assert {"rpc", "serialize", "deserialize"} <= set(trace["phases_ms"])
+
+
+def test_traced_call_records_errors(cert_path):
+    _, received_at, output = GRPCEchoNode().call(
+        host="localhost:50051", message="hello", cert_path="/missing/cert.pem", trace=True
+    )
+
+    assert received_at == "Error"
+    assert "not found" in json.loads(output)["error"].lower()
+
+
+def test_exported_traces_are_otlp_json_lines(host, cert_path, tmp_path):
+    path = tmp_path / "traces" / "spans.jsonl"
+    set_trace_exporter(FileSpanExporter(str(path)))
+
+    # With an exporter set every call is traced, but only nodes asking for it get the trace
+    _, _, output = GRPCEchoNode().call(host=host, message="hello", cert_path=cert_path)
+    _, _, traced_output = GRPCEchoNode().call(host=host, message="hello", cert_path=cert_path, trace=True)
+    set_trace_exporter(None)
+
+    assert output == ""
+    # Only the trace the node asked for is flagged for the server to log regardless of sampling
+    assert Trace("EchoOnce", output=False).metadata()[0][1].endswith("-00")
+    assert Trace("EchoOnce").metadata()[0][1].endswith("-01")
+    first, second = path.read_text().splitlines()
+    assert json.loads(second)["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["traceId"] == json.loads(traced_output)["trace_id"]
+    (resource_spans,) = json.loads(first)["resourceSpans"]
+    root, *phases = resource_spans["scopeSpans"][0]["spans"]
+    assert root["name"] == "EchoOnce"
+    assert {span["name"] for span in phases} == {"credentials", "connect", "rpc", "serialize", "deserialize"}
+    assert all(span["parentSpanId"] == root["spanId"] for span in phases)
+
+
+def test_trace_sums_repeated_phases():
+    trace = Trace("EchoOnce")
+    for _ in range(2):
+        with trace.phase("rpc"):
+            pass
+    trace.finish()
+
+    assert list(trace.breakdown()) == ["rpc"]
+    assert trace.metadata()[0][1].split("-")[1] == trace.trace_id